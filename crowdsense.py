@@ -2,22 +2,25 @@
 
 import sys
 import os
+import threading
 import cv2
 import torch
 import numpy as np
 import urllib.request
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QComboBox, QPushButton, 
-                            QFrame, QSizePolicy, QFileDialog, QProgressBar, QSlider, QCheckBox, QDialog, QSplitter, QScrollArea, QGridLayout)
-from PyQt6.QtCore import Qt, QTimer, pyqtSlot, QSize, QThread, pyqtSignal, pyqtProperty, QRect, QPropertyAnimation, QEasingCurve
+                            QFrame, QSizePolicy, QFileDialog, QProgressBar, QSlider, QCheckBox, QDialog, QSplitter, QScrollArea, QGridLayout, QLineEdit)
+from PyQt6.QtCore import Qt, QObject, QTimer, pyqtSlot, QSize, QThread, pyqtSignal, pyqtProperty, QRect, QRectF, QPropertyAnimation, QEasingCurve
 from PyQt6.QtGui import QPixmap, QImage, QFont, QDragEnterEvent, QDropEvent, QPainter, QPainterPath, QColor, QPen, QFontMetrics
 from PyQt6.QtSvg import QSvgRenderer
 
-# Import YOLO from ultralytics
-from ultralytics import YOLO
+
+from crowdsense_core import (detect_people, RegionOfInterest, Tiling, StridedDetector, PersonTracker, CountSmoother, PeakTracker, BoundedQueue, FramePool, ReadAheadDecoder, DetectionOverlay, GrowableSeries, OccupancyRollups, DetectionCache, filter_detections, threshold_sweep,
+                             SeekIndex, parse_timestamp,
+                             HeatmapAccumulator, HeatmapOverlayRenderer, render_aggregate_heatmap, fit_display_size, resize_for_display,
+                             load_model, quantized_model_path, FIXED_SHAPE_BACKENDS, analyze_main, quantize_main)
 
 import pyqtgraph as pg
-from collections import deque
 import time
 
 # Constants for styling
@@ -40,6 +43,26 @@ SUBHEADER_FONT_STYLE = f"{DEFAULT_FONT} font-size: 14px; color: {TEXT_COLOR}; bo
 VALUE_FONT_STYLE = f"{DEFAULT_FONT} font-size: 14px; font-weight: bold; color: {ACCENT_COLOR}; border: none;"
 LARGE_VALUE_FONT_STYLE = f"{DEFAULT_FONT} font-size: 48px; font-weight: bold; color: {ACCENT_COLOR}; border: none;"
 
+# Analysis range field style; the border turns red while the entered range is invalid
+RANGE_EDIT_STYLE = f"background-color: {WIDGET_BG_COLOR}; color: {TEXT_COLOR}; border: 1px solid {{border}}; {DEFAULT_FONT} padding: 2px 4px;"
+INVALID_BORDER_COLOR = "#cc3232"
+
+# Crowd alert indicator styles: (container, icon, text, people count) for active and normal status
+ALERT_STYLES = {
+    True: (
+        "background-color: #4e1c1c; border-radius: 4px; border: 1px solid #cc3232;",  # Light red border
+        "font-family: Arial; font-size: 16px; color: #ff5555; border: none;",
+        "font-family: Arial; font-size: 12px; color: #ff9999; border: none;",
+        "color: #ff5555; font-size: 32px; font-weight: bold; border: none;",
+    ),
+    False: (
+        f"background-color: #2A2A2A; border-radius: 4px; border: 1px solid {BORDER_COLOR};",  # Grey border
+        "font-family: Arial; font-size: 16px; color: #555555; border: none;",
+        "font-family: Arial; font-size: 12px; color: #AAAAAA; border: none;",
+        f"color: {ACCENT_COLOR}; font-size: 32px; font-weight: bold; border: none;",
+    ),
+}
+
 # Button style templates
 BUTTON_STYLE = f"""
     QPushButton {{
@@ -390,68 +413,477 @@ class ModelDownloadThread(QThread):
         self.progress_update.emit(0, f"Starting download of {self.model_name}...")
         urllib.request.urlretrieve(url, save_path, progress_callback)
 
+class SeekIndexThread(QThread):
+    """Builds (or loads from cache_dir) the SeekIndex of a video in the background"""
+    index_ready = pyqtSignal(str, object)  # Video path, SeekIndex
+    
+    def __init__(self, video_path, cache_dir):
+        super().__init__()
+        self.video_path = video_path
+        self.cache_dir = cache_dir
+    
+    def run(self):
+        try:
+            index = SeekIndex.load_or_build(self.cache_dir, self.video_path)
+        except (IOError, OSError) as e:
+            print(f"Could not index {self.video_path}: {e}")
+            return
+        self.index_ready.emit(self.video_path, index)
+
+class UiRefreshCoalescer(QObject):
+    """Collects UI state changes and applies them together at a fixed refresh rate
+
+    Code that changes state calls mark(name) instead of touching widgets; the handler
+    registered under that name then runs once on the next refresh, however often it
+    was marked. The timer only runs while something is marked, so an idle UI gets no
+    wakeups.
+    """
+    
+    def __init__(self, rate_hz=15, parent=None):
+        super().__init__(parent)
+        self.handlers = {}  # Name -> handler, applied in registration order
+        self.dirty = set()
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(1000 / rate_hz))
+        self.timer.timeout.connect(self.refresh)
+    
+    def register(self, name, handler):
+        """Run handler on the refresh after name is marked"""
+        self.handlers[name] = handler
+    
+    def mark(self, name):
+        """Schedule the handler registered under name for the next refresh"""
+        self.dirty.add(name)
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    def refresh(self):
+        """Apply every marked handler now"""
+        dirty, self.dirty = self.dirty, set()
+        for name, handler in self.handlers.items():
+            if name in dirty:
+                handler()
+
 class VideoFrameThread(QThread):
-    """Separate thread for handling video frames to prevent UI slowdowns"""
-    frame_ready = pyqtSignal(object)
+    """Decode stage: paces frames to the presentation clock while a ReadAheadDecoder decodes ahead
+
+    Every frame goes to the UI through frame_ready and, when an output queue is set,
+    straight into the detection stage without a round trip through the UI thread.
+    Frames are decoded into buffers from frame_pool; the receiver of frame_ready owns
+    one reference and the detection stage another, each releasing it when done.
+    Above 1x in live mode, frames beyond what the display can show are only grabbed.
+    """
+    frame_ready = pyqtSignal(object, int, int, object)  # Frame, frame index, presentation time (ms), display-size frame
     video_ended = pyqtSignal()  # Signal when video reaches end - at class level
     
-    def __init__(self):
+    def __init__(self, frame_pool=None):
         super().__init__()
         self.cap = None
+        self.frame_pool = frame_pool if frame_pool is not None else FramePool()
         self.running = False
         self.paused = False
         self.loop_detected = False  # Flag to indicate video has looped
+        
+        # Index of the next frame cap will return, and the frame playback ends before (None for the video's end)
+        self.next_frame_index = 0
+        self.end_frame = None
+        
+        # Presentation clock: frames are released when the wall clock reaches their
+        # container timestamp divided by the playback speed (0 = as fast as possible)
+        self.playback_speed = 1.0
+        self.reset_clock = True
+        
+        # Decoded frames kept ready ahead of the clock, and the most frames per second of
+        # wall time worth decoding when playback runs faster than real time
+        self.read_ahead = 8
+        self.max_display_fps = 60
+        self.decoder = None
+        self.source_fps = 0.0
+        self.next_kept_index = None  # Frame index (fractional) the next kept frame is due at
+        
+        # Frames emitted but not yet handled by the receiver
+        self.frames_in_flight = 0
+        self.max_frames_in_flight = 2
+        self.flight_condition = threading.Condition()
+        
+        # Set while playing, so a paused thread sleeps until it is resumed
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        
+        # BoundedQueue of the next pipeline stage (None while no model is ready)
+        self.output_queue = None
+        
+        # Surface whose display_bounds frames are scaled down to, and for the dual-rate display,
+        # the stage whose latest_overlay is drawn over every frame
+        self.display_surface = None
+        self.overlay_source = None
 
-    def set_capture(self, cap):
+    def set_capture(self, cap, frame_index=0):
+        """Read from cap, whose next frame is frame_index"""
         self.cap = cap
+        self.next_frame_index = frame_index
+    
+    def set_output_queue(self, output_queue):
+        """Feed decoded frames to the detection stage's queue, or stop feeding them with None"""
+        self.output_queue = output_queue
+    
+    def set_display_surface(self, surface):
+        """Scale frames down to surface.display_bounds before emitting them"""
+        self.display_surface = surface
+    
+    def set_overlay_source(self, source):
+        """Draw source.latest_overlay over every emitted frame (dual-rate display), or stop with None"""
+        self.overlay_source = source
     
     def stop(self):
         self.running = False
+        
+        # Wake the thread wherever it is waiting
+        decoder = self.decoder
+        if decoder is not None:
+            decoder.stop()
+        self.resume_event.set()
+        with self.flight_condition:
+            self.flight_condition.notify_all()
+        output_queue = self.output_queue
+        if output_queue is not None:
+            output_queue.clear()  # Unblock a put under the block policy
         self.wait()
     
     def pause(self, paused):
         self.paused = paused
+        self.reset_clock = True  # Re-anchor the clock when playback resumes
+        if paused:
+            self.resume_event.clear()
+        else:
+            self.resume_event.set()
+    
+    def set_playback_speed(self, speed):
+        """Set the playback speed multiplier, or 0 to decode as fast as possible"""
+        self.playback_speed = speed
+        self.reset_clock = True
+    
+    def wants_frame(self, frame_index, time_ms):
+        """Whether the decoder should retrieve a frame, or just grab it because nothing will use it
+
+        Faster than real time the display can't show every frame, and live detection
+        (the "latest" queue policy) only ever takes the newest one, so only about
+        max_display_fps frames per second of wall time are kept. Decided on frame
+        indices, as timestamps are truncated to whole milliseconds. Blocking and
+        batched detection analyze every frame.
+        """
+        speed = self.playback_speed
+        output_queue = self.output_queue
+        if speed <= 1 or self.source_fps <= 0 or (output_queue is not None and output_queue.policy != "latest"):
+            return True
+        
+        # Source frames per displayed frame; fractional steps keep the average rate exact
+        step = self.source_fps * speed / self.max_display_fps
+        next_kept_index = self.next_kept_index
+        if next_kept_index is not None and frame_index < next_kept_index:
+            return False
+        if next_kept_index is None or frame_index - next_kept_index >= step:
+            next_kept_index = frame_index  # First frame, or the speed changed
+        self.next_kept_index = next_kept_index + step
+        return True
+    
+    def frame_consumed(self):
+        """Called by the receiver once it has handled a frame_ready signal"""
+        with self.flight_condition:
+            self.frames_in_flight = max(0, self.frames_in_flight - 1)
+            self.flight_condition.notify_all()
     
     def run(self):
         self.running = True
+        self.reset_clock = True
+        self.frames_in_flight = 0
+        
+        if self.cap is None or not self.cap.isOpened():
+            return
+        
+        # The decoder owns the capture until stop(), decoding on its own thread so a slow
+        # frame doesn't stall the clock
+        self.source_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.next_kept_index = None
+        self.decoder = ReadAheadDecoder(self.cap, self.read_ahead, self.frame_pool, self.next_frame_index,
+                                        self.end_frame, keep=self.wants_frame)
+        self.decoder.start()
+        clock_start = 0.0
+        clock_start_ms = 0
         
         # For local videos or webcams
-        while self.running and self.cap is not None and self.cap.isOpened():
-            if not self.paused:
-                ret, frame = self.cap.read()
-                if ret:
-                    self.frame_ready.emit(frame)
-                else:
-                    # Video ended - don't automatically restart
-                    # Just emit the end-of-video signal
-                    self.video_ended.emit()
+        while self.running:
+            if self.paused:
+                self.resume_event.wait()
+                continue
+            
+            # Don't queue more frames while the receiver is still busy with earlier ones
+            with self.flight_condition:
+                self.flight_condition.wait_for(
+                    lambda: self.frames_in_flight < self.max_frames_in_flight or not self.running)
+            if not self.running:
+                break
+            
+            # Take the next decoded frame, holding the decoder's reference to its pooled buffer
+            item = self.decoder.read()
+            if item is None:
+                if not self.running:
+                    break
+                
+                # Video ended (or reached the end of the range) - don't automatically restart,
+                # pause until the receiver restarts or stops playback
+                self.pause(True)
+                self.video_ended.emit()
+                continue
+            frame, frame_index, time_ms = item
+            self.next_frame_index = frame_index + 1
+            
+            speed = self.playback_speed
+            if speed > 0:
+                if self.reset_clock:
+                    clock_start = time.perf_counter()
+                    clock_start_ms = time_ms
+                    self.reset_clock = False
+                
+                # Sleep until the frame is due; decode time is already part of the elapsed wall time
+                delay = clock_start + (time_ms - clock_start_ms) / (1000.0 * speed) - time.perf_counter()
+                if delay > 0:
+                    self.msleep(int(delay * 1000))
+                elif delay < -0.5:
+                    # Fell far behind - re-anchor instead of rushing to catch up
+                    self.reset_clock = True
             
-            # Sleep to control frame rate
-            self.msleep(30)  # ~33 fps
+            # Scale the frame for display unless only annotated frames will be shown, drawing the
+            # latest detections over it when the display runs at the source frame rate. This happens
+            # before the detection stage gets the frame, since annotation draws on the pooled buffer.
+            output_queue = self.output_queue
+            scaled_frame = None
+            surface = self.display_surface
+            overlay_source = self.overlay_source
+            if surface is not None and (output_queue is None or overlay_source is not None):
+                scaled_frame = resize_for_display(frame, surface.display_bounds)
+                if output_queue is not None:
+                    if scaled_frame is frame:
+                        scaled_frame = frame.copy()  # Keep the display picture apart from the annotated one
+                    overlay = overlay_source.latest_overlay
+                    if overlay is not None:
+                        overlay.draw(scaled_frame, scaled_frame.shape[1] / frame.shape[1])
+            
+            # Share the buffer with the detection stage through a second reference
+            if output_queue is not None:
+                if not output_queue.put((self.frame_pool.retain(frame), frame_index, time_ms)):
+                    self.frame_pool.release(frame)
+            
+            with self.flight_condition:
+                self.frames_in_flight += 1
+            self.frame_ready.emit(frame, frame_index, time_ms, scaled_frame)
+
+class AnnotationThread(QThread):
+    """Postprocess stage: links detections to tracks, draws them and scales the frame for display, off the inference thread"""
+    detection_ready = pyqtSignal(object, int, list, int, int, int, object)  # Frame, count, boxes, frame index, time (ms), unique visitors, display-size frame
+    
+    def __init__(self, frame_pool, queue_size=4):
+        super().__init__()
+        # (frame, frame index, time ms, boxes, confidences, roi) tuples from the inference stage
+        self.frame_pool = frame_pool
+        self.input_queue = BoundedQueue(queue_size, "block", on_drop=lambda item: frame_pool.release(item[0]))
+        self.running = False
+        
+        # Persistent person IDs and trajectories across frames
+        self.tracker = PersonTracker()
+        self.reset_requested = False
+        self.latest_overlay = None  # DetectionOverlay of the last annotated frame
+        
+        # Surface whose display_bounds frames are scaled down to before they are emitted
+        self.display_surface = None
+        
+        # Results emitted but not yet handled by the receiver
+        self.results_in_flight = 0
+        self.max_results_in_flight = 2
+        self.flight_condition = threading.Condition()
+    
+    def reset(self):
+        """Drop all tracks before the next frame is annotated"""
+        self.reset_requested = True
+        self.latest_overlay = None
+    
+    def result_consumed(self):
+        """Called by the receiver once it has handled a detection_ready signal"""
+        with self.flight_condition:
+            self.results_in_flight = max(0, self.results_in_flight - 1)
+            self.flight_condition.notify_all()
+    
+    def stop(self):
+        self.running = False
+        self.input_queue.close()
+        with self.flight_condition:
+            self.flight_condition.notify_all()
+        self.wait()
+    
+    def run(self):
+        self.running = True
+        self.input_queue.reopen()
+        
+        while self.running:
+            # Don't annotate further ahead while the receiver is still busy with earlier results,
+            # so a slow UI holds back the earlier stages instead of piling up frames
+            with self.flight_condition:
+                self.flight_condition.wait_for(
+                    lambda: self.results_in_flight < self.max_results_in_flight or not self.running)
+            
+            items = self.input_queue.get()
+            if not items:
+                continue
+            frame, frame_index, time_ms, boxes, confidences, roi = items[0]
+            
+            try:
+                # Resets are applied here so the tracker is only ever touched by this thread
+                if self.reset_requested:
+                    self.reset_requested = False
+                    self.tracker.reset()
+                
+                # Link the detections to persistent tracks
+                track_ids = self.tracker.update(boxes, confidences)
+                
+                # Draw the region, trails and boxes, keeping them for the dual-rate display
+                trails = [points.copy() for _, points in self.tracker.trajectories() if len(points) > 1]
+                overlay = DetectionOverlay(boxes, confidences, track_ids, trails, roi)
+                overlay.draw(frame)
+                self.latest_overlay = overlay
+                
+                # Scale down to the size it will be shown at here rather than on the GUI thread
+                surface = self.display_surface
+                scaled_frame = resize_for_display(frame, surface.display_bounds if surface is not None else None)
+                
+                # Emit the processed frame, people count, boxes for heatmap, and the frame it belongs to;
+                # the receiver takes over our reference to the frame
+                with self.flight_condition:
+                    self.results_in_flight += 1
+                self.detection_ready.emit(frame, len(boxes), boxes, frame_index, time_ms,
+                                          self.tracker.unique_count, scaled_frame)
+            
+            except Exception as e:
+                self.frame_pool.release(frame)
+                print(f"Error annotating detections: {e}")
 
 class YoloDetectionThread(QThread):
-    """Separate thread for YOLO detection to prevent UI slowdowns"""
-    detection_ready = pyqtSignal(object, int, list)  # Frame, count, boxes
+    """Inference stage: runs YOLO on frames from its queue and hands the boxes to the annotation stage"""
+    detection_ready = pyqtSignal(object, int, list, int, int, int, object)  # Frame, count, boxes, frame index, time (ms), unique visitors, display-size frame
     model_loaded = pyqtSignal(bool, str)  # Success, message
     
-    def __init__(self, model_path="yolov8n.pt"):
+    def __init__(self, model_path="yolov8n.pt", backend="torch", frame_pool=None):
         super().__init__()
-        self.frame_queue = []
+        # (frame, frame index, time ms) tuples holding a reference to pooled frames;
+        # live mode only keeps the latest frame
+        self.frame_pool = frame_pool if frame_pool is not None else FramePool()
+        self.frame_queue = BoundedQueue(1, "latest", on_drop=lambda item: self.frame_pool.release(item[0]))
         self.running = False
         self.model = None
         self.model_path = model_path
+        self.backend = backend  # Key of INFERENCE_BACKENDS
         self.processing = False
         self.loading_model = False
         self.confidence_threshold = 0.4  # Default threshold
         
+        # Batched mode: collect up to batch_size frames or wait up to batch_timeout_ms
+        self.batch_size = 1  # 1 keeps only the latest frame (live mode)
+        self.batch_timeout_ms = 100
+        
+        # Full detection every stride-th frame, optical flow tracking in between
+        self.detector = StridedDetector(stride=1)
+        
+        # Tracking and drawing run on their own stage, forwarding its results as ours
+        self.annotator = AnnotationThread(self.frame_pool)
+        self.annotator.detection_ready.connect(self.detection_ready)
+        
+        # Inference restricted to a region of interest, at a chosen resolution
+        self.roi = None
+        self.imgsz = None  # None uses the model's default
+        self.tiling = None  # Tiling for sliced inference on high-resolution frames
+        
+        # DetectionCache of the current video and settings; cached frames skip the model
+        self.detection_cache = None
+        
     def set_model_path(self, model_path):
         """Set a new model path and reset the model"""
         self.model_path = model_path
         self.model = None
+        self.reset_tracking()
+    
+    def set_backend(self, backend):
+        """Select the inference backend, reloading the model on the next run"""
+        self.backend = backend
+        self.model = None
         
-    def add_frame(self, frame):
-        if frame is not None and not self.processing:
-            self.frame_queue = [frame.copy()]  # Only keep the latest frame
+    def add_frame(self, frame, frame_index=-1, time_ms=0):
+        if frame is None:
+            return
+        
+        if not self.frame_queue.put((self.frame_pool.retain(frame), frame_index, time_ms)):
+            self.frame_pool.release(frame)
+    
+    def set_queue_policy(self, policy):
+        """Choose what happens when frames arrive faster than inference: block, drop_oldest or latest"""
+        if self.batch_size > 1:
+            # Room for the next batch while the current one runs
+            self.frame_queue.configure(self.batch_size * 2, policy)
+        else:
+            self.frame_queue.configure(1, policy)
+    
+    def result_consumed(self):
+        """Called by the receiver once it has handled a detection_ready signal"""
+        self.annotator.result_consumed()
+    
+    def set_display_surface(self, surface):
+        """Scale annotated frames down to surface.display_bounds before emitting them"""
+        self.annotator.display_surface = surface
+    
+    def flush(self):
+        """Discard queued frames and detections, e.g. when playback stops"""
+        self.frame_queue.clear()
+        self.annotator.input_queue.clear()
+        self.reset_tracking()
+    
+    def reset_tracking(self):
+        """Start over with a full detection and no tracks, e.g. when the video restarts"""
+        self.detector.reset()
+        self.annotator.reset()
+    
+    def set_detection_stride(self, stride):
+        """Run the model on every stride-th frame and propagate boxes to the frames in between"""
+        self.detector.stride = max(1, int(stride))
+        self.detector.reset()
+    
+    def set_roi(self, roi):
+        """Restrict detection to a RegionOfInterest (None for the full frame)"""
+        self.roi = roi
+        self.reset_tracking()
+    
+    def set_imgsz(self, imgsz):
+        """Set the inference resolution (None for the model default)"""
+        self.imgsz = imgsz
+    
+    def set_tiling(self, tiling):
+        """Enable sliced inference with a Tiling, or disable it with None"""
+        self.tiling = tiling
+    
+    def set_batch_mode(self, batch_size, timeout_ms=100):
+        """Run one forward pass per batch of up to batch_size frames, waiting at most timeout_ms to fill it"""
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout_ms = timeout_ms
+        
+        # Live mode keeps only the latest frame; batches queue every frame and drop the oldest
+        # if we fall two batches behind, unless the producer is being paced by blocking
+        policy = self.frame_queue.policy
+        if policy != "block":
+            policy = "drop_oldest" if self.batch_size > 1 else "latest"
+        self.set_queue_policy(policy)
+    
+    def collect_batch(self):
+        """Wait for the next frame, then take a batch, waiting until it is full or the timeout passes"""
+        return self.frame_queue.get(self.batch_size, self.batch_timeout_ms / 1000.0)
     
     def set_confidence_threshold(self, threshold):
         """Set the confidence threshold for detections"""
@@ -459,7 +891,9 @@ class YoloDetectionThread(QThread):
     
     def stop(self):
         self.running = False
+        self.frame_queue.close()  # Wake the thread if it is waiting for frames
         self.wait()
+        self.annotator.stop()
     
     def load_model(self):
         """Load YOLO model"""
@@ -469,8 +903,9 @@ class YoloDetectionThread(QThread):
         self.loading_model = True
         
         try:
-            self.model = YOLO(self.model_path)
-            self.model_loaded.emit(True, f"Model loaded successfully from {self.model_path}")
+            # Non-torch backends export the checkpoint on first use, which can take a while
+            self.model = load_model(self.model_path, self.backend)
+            self.model_loaded.emit(True, f"Model loaded successfully from {self.model_path} ({self.backend})")
         except Exception as e:
             error_msg = f"Error loading YOLO model: {e}"
             self.model_loaded.emit(False, error_msg)
@@ -479,59 +914,47 @@ class YoloDetectionThread(QThread):
     
     def run(self):
         self.running = True
+        self.frame_queue.reopen()
+        if not self.annotator.isRunning():
+            self.annotator.start()
         
         # Load YOLO model if not already loaded
         if self.model is None:
             self.load_model()
         
         while self.running:
-            if len(self.frame_queue) > 0 and self.model is not None:
-                self.processing = True
-                frame = self.frame_queue.pop(0)
+            # Sleeps until the decode stage queues a frame (or stop() closes the queue)
+            batch = self.collect_batch()
+            if not batch:
+                continue
+            if self.model is None:
+                for frame, _, _ in batch:
+                    self.frame_pool.release(frame)
+                continue
+            
+            self.processing = True
+            try:
+                # Run YOLO detection on the batch's detection frames in a single forward pass,
+                # tracking boxes into the frames skipped by the detection stride
+                frames = [frame for frame, _, _ in batch]
+                frame_indices = [frame_index for _, frame_index, _ in batch]
+                roi = self.roi
+                predict_kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+                detections = self.detector.detect_batch(self.model, frames, self.confidence_threshold, frame_indices,
+                                                        self.detection_cache, roi=roi, tiling=self.tiling,
+                                                        **predict_kwargs)
                 
-                try:
-                    # Run YOLO detection on the frame
-                    results = self.model(frame, classes=0)  # Class 0 is 'person' in COCO dataset
-                    
-                    # Collect people boxes for heatmap and count
-                    people_count = 0
-                    boxes = []
-                    
-                    for result in results:
-                        result_boxes = result.boxes
-                        for box in result_boxes:
-                            # Get box coordinates
-                            x1, y1, x2, y2 = box.xyxy[0].tolist()
-                            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                            confidence = float(box.conf[0])
-                            
-                            # Only count if confidence is above threshold
-                            if confidence > self.confidence_threshold:
-                                # Draw bounding box
-                                color = (0, 255, 0)  # Green for people
-                                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                                
-                                # Add confidence text
-                                conf_text = f"{confidence:.2f}"
-                                cv2.putText(frame, conf_text, (x1, y1-5), 
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                                
-                                # Store box coordinates for heatmap
-                                boxes.append((x1, y1, x2, y2))
-                                
-                                # Increment people count
-                                people_count += 1
-                    
-                    # Emit the processed frame, people count, and boxes for heatmap
-                    self.detection_ready.emit(frame, people_count, boxes)
-                    
-                except Exception as e:
-                    print(f"Error in YOLO detection: {e}")
+                # Hand the results and our frame references to the annotation stage, waiting if it falls behind
+                for (frame, frame_index, time_ms), (boxes, confidences, _) in zip(batch, detections):
+                    if not self.annotator.input_queue.put((frame, frame_index, time_ms, boxes, confidences, roi)):
+                        self.frame_pool.release(frame)
                 
-                self.processing = False
+            except Exception as e:
+                for frame, _, _ in batch:
+                    self.frame_pool.release(frame)
+                print(f"Error in YOLO detection: {e}")
             
-            # Sleep to prevent high CPU usage
-            self.msleep(10)
+            self.processing = False
 
 class DragDropVideoLabel(QLabel):
     """Custom QLabel with drag and drop functionality for videos"""
@@ -604,6 +1027,61 @@ class DragDropVideoLabel(QLabel):
         self.content_layout.addWidget(self.icon_label, 0, Qt.AlignmentFlag.AlignCenter)
         self.content_layout.addWidget(self.text_label, 0, Qt.AlignmentFlag.AlignCenter)
         self.content_layout.addStretch(1)
+        
+        # Video surface: the latest frame, normally already scaled to fit, in a reused image buffer
+        self.frame_buffer = None
+        self.frame_image = None
+        self.display_bounds = (self.width(), self.height())  # Read by worker threads that pre-scale frames
+    
+    def show_frame(self, frame):
+        """Paint a BGR frame, copying it into the QImage backing buffer"""
+        h, w = frame.shape[:2]
+        if self.frame_buffer is None or self.frame_buffer.shape != (h, w, 3):
+            self.frame_buffer = np.empty((h, w, 3), dtype=np.uint8)
+            self.frame_image = QImage(self.frame_buffer.data, w, h, 3 * w, QImage.Format.Format_BGR888)
+        np.copyto(self.frame_buffer, frame)
+        
+        # Hide the content layout widgets before showing video
+        if self.text_label.isVisible():
+            for i in range(self.content_layout.count()):
+                item = self.content_layout.itemAt(i)
+                if item and item.widget():
+                    item.widget().setVisible(False)
+        
+        self.update()
+    
+    def frame_rect(self):
+        """Rectangle (x, y, width, height) the frame is painted in, or None without a frame"""
+        if self.frame_image is None:
+            return None
+        
+        # Fit the frame inside the label, keeping its aspect ratio
+        h, w = self.frame_buffer.shape[:2]
+        scale = min(self.width() / w, self.height() / h)
+        dw, dh = w * scale, h * scale
+        if abs(dw - w) <= 1 and abs(dh - h) <= 1:
+            dw, dh = w, h  # Pre-scaled to fit, paint it 1:1
+        return ((self.width() - dw) / 2, (self.height() - dh) / 2, dw, dh)
+    
+    def paintEvent(self, event):
+        """Paint the background, then the current frame"""
+        super().paintEvent(event)
+        rect = self.frame_rect()
+        if rect is None:
+            return
+        
+        painter = QPainter(self)
+        x, y, w, h = rect
+        if (w, h) != (self.frame_image.width(), self.frame_image.height()):
+            # Small source, or the label was resized since this frame was scaled
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawImage(QRectF(x, y, w, h), self.frame_image)
+        painter.end()
+    
+    def resizeEvent(self, event):
+        """Publish the new size to the workers that scale frames for display"""
+        self.display_bounds = (self.width(), self.height())
+        super().resizeEvent(event)
     
     def set_parent_app(self, app):
         """Set parent application reference to access video loading methods"""
@@ -611,8 +1089,11 @@ class DragDropVideoLabel(QLabel):
     
     def set_default_content(self):
         """Set the default content with SVG icon and text"""
-        # Clear the video pixmap if present
+        # Clear the video frame if present
         self.clear()
+        self.frame_buffer = None
+        self.frame_image = None
+        self.update()
         
         # Apply styling based on hover state
         if self.is_hovered:
@@ -667,11 +1148,19 @@ class DragDropVideoLabel(QLabel):
         super().leaveEvent(event)
     
     def mouseReleaseEvent(self, event):
-        """Handle click events to open file dialog"""
-        if self.parent_app:
+        """Handle click events to open file dialog, or add ROI points while drawing one"""
+        if self.parent_app and self.parent_app.roi_drawing:
+            self.parent_app.on_roi_click(event.position(), event.button())
+        elif self.parent_app:
             self.parent_app.open_file_dialog()
         super().mouseReleaseEvent(event)
     
+    def mousePressEvent(self, event):
+        """Remember where an ROI drag starts"""
+        if self.parent_app and self.parent_app.roi_drawing:
+            self.parent_app.roi_drag_start = event.position()
+        super().mousePressEvent(event)
+    
     def dragEnterEvent(self, event: QDragEnterEvent):
         """Accept drag enter events that contain file URLs"""
         if event.mimeData().hasUrls():
@@ -706,6 +1195,83 @@ class DragDropVideoLabel(QLabel):
                     self.parent_app.load_video_from_path(file_path)
                     event.acceptProposedAction()
 
+class ThresholdSweepDialog(QDialog):
+    """Smoothed count curves, peaks and crowd alerts of a threshold_sweep, one row per confidence threshold"""
+    threshold_selected = pyqtSignal(float)  # Threshold the user chose to apply
+    
+    def __init__(self, sweep, crowd_size_threshold, current_threshold, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Confidence Threshold Sweep")
+        self.setStyleSheet(f"background-color: {PANEL_BG_COLOR}; color: {TEXT_COLOR};")
+        self.resize(900, 640)
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(16, 16, 16, 16)
+        layout.setSpacing(12)
+        
+        header = QLabel(f"{len(sweep['frames'])} cached frames, alerts above {crowd_size_threshold} people")
+        header.setStyleSheet(SUBHEADER_FONT_STYLE)
+        layout.addWidget(header)
+        
+        # One smoothed count curve per threshold, the one in use drawn thicker
+        plot = pg.PlotWidget()
+        plot.setBackground(WIDGET_BG_COLOR)
+        plot.showGrid(x=True, y=True, alpha=0.2)
+        plot.setLabel('left', 'People Count', color='#CCCCCC')
+        plot.setLabel('bottom', 'Time (s)', color='#CCCCCC')
+        plot.addLegend(offset=(-10, 10))
+        times_sec = sweep["times_ms"] / 1000.0
+        thresholds = sweep["thresholds"]
+        for row, threshold in enumerate(thresholds):
+            width = 3 if abs(threshold - current_threshold) < 1e-6 else 1
+            curve = plot.plot(times_sec, sweep["smoothed"][row], name=f"> {threshold:.1f}",
+                              pen=pg.mkPen(pg.intColor(row, len(thresholds)), width=width))
+            curve.setClipToView(True)
+            curve.setDownsampling(auto=True, method='peak')
+        plot.addLine(y=crowd_size_threshold, pen=pg.mkPen(color='r', width=1, style=Qt.PenStyle.DashLine))
+        layout.addWidget(plot, 1)
+        
+        # Summary table
+        table = QWidget()
+        grid = QGridLayout(table)
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.setHorizontalSpacing(16)
+        for column, title in enumerate(["Confidence", "Peak", "Off-Peak", "Alerts", "Time in Alert", ""]):
+            label = QLabel(title)
+            label.setStyleSheet(f"{DEFAULT_FONT} font-size: 13px; font-weight: bold; color: #CCCCCC; border: none;")
+            grid.addWidget(label, 0, column)
+        
+        for row, threshold in enumerate(thresholds):
+            alerts = sweep["alerts"][row]
+            cells = [
+                f"> {threshold:.1f}",
+                f"{sweep['peak_count'][row]} at {self.format_time(sweep['peak_time_ms'][row])}",
+                f"{sweep['offpeak_count'][row]} at {self.format_time(sweep['offpeak_time_ms'][row])}",
+                str(len(alerts)),
+                self.format_time(sum(end - start for start, end in alerts)),
+            ]
+            for column, text in enumerate(cells):
+                label = QLabel(text)
+                label.setStyleSheet(f"{DEFAULT_FONT} font-size: 13px; color: {TEXT_COLOR}; border: none;")
+                grid.addWidget(label, row + 1, column)
+            
+            use_button = QPushButton("Use")
+            use_button.setStyleSheet(EXPORT_BUTTON_STYLE)
+            use_button.clicked.connect(lambda _, value=float(threshold): self.select_threshold(value))
+            grid.addWidget(use_button, row + 1, len(cells))
+        layout.addWidget(table)
+    
+    @staticmethod
+    def format_time(time_ms):
+        """Format milliseconds as HH:MM:SS"""
+        total_seconds = int(time_ms) // 1000
+        return f"{total_seconds // 3600:02d}:{(total_seconds % 3600) // 60:02d}:{total_seconds % 60:02d}"
+    
+    def select_threshold(self, threshold):
+        """Apply a threshold from the table and close"""
+        self.threshold_selected.emit(threshold)
+        self.accept()
+
 class CrowdSenseApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -775,21 +1341,43 @@ class CrowdSenseApp(QMainWindow):
         self.current_model_key = "YOLOv8n (Nano)"
         self.model_path = self.available_models[self.current_model_key]["path"]
         
+        # Inference backends the models can run on (keys of INFERENCE_BACKENDS)
+        self.available_backends = {
+            "torch": "PyTorch",
+            "onnx": "ONNX Runtime",
+            "torchscript": "TorchScript",
+        }
+        self.current_backend = "torch"
+        
         # Directory for storing models
         self.models_dir = os.path.join(os.getcwd(), "models")
         os.makedirs(self.models_dir, exist_ok=True)
         
+        # Directory for detections cached per video, model and inference settings
+        self.detection_cache_dir = os.path.join(os.getcwd(), "cache", "detections")
+        
+        # Frame timestamps and keyframes of the current video, built in the background, and the
+        # frame range playback is limited to ([start, end), end None for the whole video)
+        self.seek_index_dir = os.path.join(os.getcwd(), "cache", "seek")
+        self.seek_index = None
+        self.seek_index_threads = set()
+        self.range_start_frame = 0
+        self.range_end_frame = None
+        self.current_frame_index = 0
+        self.add_quantized_models()
+        
         # Flag to track if model is downloading
         self.model_downloading = False
         self.yolo_ready = False
 
         # Initialize video capture in a separate thread
         self.cap = None
-        self.video_thread = VideoFrameThread()
+        self.frame_pool = FramePool()  # Decoded frames shared by the pipeline stages without copies
+        self.video_thread = VideoFrameThread(self.frame_pool)
         self.video_thread.frame_ready.connect(self.process_video_frame)
         
         # Initialize YOLO detection thread
-        self.yolo_thread = YoloDetectionThread(self.model_path)
+        self.yolo_thread = YoloDetectionThread(self.model_path, self.current_backend, self.frame_pool)
         self.yolo_thread.detection_ready.connect(self.display_detection_results)
         self.yolo_thread.model_loaded.connect(self.on_model_loaded)
         
@@ -797,36 +1385,61 @@ class CrowdSenseApp(QMainWindow):
         self.download_thread = None
         
         # Frame buffers and detection data
+        self.smooth_video = False  # Dual-rate display: raw frames at source rate with a detection overlay
         self.current_frame = None  # Raw current frame
         self.displayed_frame = None  # Processed frame with heatmap (if enabled)
         self.last_detected_boxes = []  # Store the last detected boxes
+        self.last_detection_frame_index = -1  # Source frame index of the last detections
 
         # People counting
         self.people_count = 0
-        self.people_count_history = deque(maxlen=24)  # For smoothing
         self.smoothed_people_count = 0
+        self.unique_visitors = 0
         
         # Playback state
         self.paused = False
         self.confidence_threshold = 0.4  # Default value
+        self.detection_stride = 1  # Run YOLO on every frame by default
+        
+        # Inference resolution options (None uses the model's default)
+        self.inference_sizes = {
+            "Model default": None,
+            "320": 320,
+            "480": 480,
+            "640": 640,
+            "960": 960,
+            "1280": 1280,
+        }
+        
+        # Tile sizes for sliced inference on high-resolution footage (None disables tiling)
+        self.tile_sizes = {
+            "Off": None,
+            "480": 480,
+            "640": 640,
+            "960": 960,
+        }
+        
+        # Region of interest and inference size, remembered per source video
+        self.source_settings = {}  # Video path -> {"roi": RegionOfInterest or None, "imgsz": int or None}
+        self.current_video_path = None
+        self.roi_drawing = False
+        self.roi_points = []  # Frame coordinates of the polygon being drawn
+        self.roi_drag_start = None
 
         # Heatmap properties
         self.heatmap_enabled = False
         self.heatmap_opacity = 0.7
-        self.heatmap_accumulator = None
-        self.aggregate_heatmap_accumulator = None  # This will store the aggregate heatmap with no decay
-        self.aggregate_frame_count = 0  # Track how many frames contributed to aggregate
-        self.heatmap_decay = 0.99
         self.heatmap_blur_size = 21
         self.heatmap_radius = 2
-        self.heatmap_intensity = 0.6
-        self.heatmap_scale_factor = 0.2
-        self.heatmap_neighbor_radius = 4
+        self.heatmap = HeatmapAccumulator(decay=0.99, intensity=0.6, scale_factor=0.2, neighbor_radius=4)
+        self.heatmap_renderer = HeatmapOverlayRenderer(grid_color=GRID_COLOR, grid_spacing=50)
 
         # Video timer properties
-        self.video_time_ms = 0
-        self.last_frame_time = 0
+        self.video_time_ms = 0  # Presentation time of the latest decoded frame
+        self.detection_time_ms = 0  # Presentation time of the frame behind the latest detections
         self.frame_interval = 33  # Default frame interval (30 fps)
+        self.playback_speeds = {"1x": 1.0, "2x": 2.0, "4x": 4.0, "8x": 8.0, "Max": 0.0}  # 0 = unthrottled
+        self.batch_sizes = {"Live": 1, "4": 4, "8": 8, "16": 16}  # Frames per forward pass (1 = latest frame only)
 
         self.video_thread.video_ended.connect(self.on_video_ended)
 
@@ -834,18 +1447,26 @@ class CrowdSenseApp(QMainWindow):
         self.crowd_detection_enabled = False
         self.crowd_size_threshold = 10       # Default threshold for people count
         self.smoothing_window_size = 24      # Default window size
-        self.people_count_history = deque(maxlen=self.smoothing_window_size)
+        self.count_smoother = CountSmoother(self.smoothing_window_size)  # For smoothing
         self.threshold_alert_active = False  # Current alert status
         self.threshold_history = []          # Store alert history with timestamps
 
-        self.peak_count = 0
-        self.peak_time_ms = 0
-        self.offpeak_count = float('inf')  # Start with infinity so any count will be lower
-        self.offpeak_time_ms = 0
+        self.peak_tracker = PeakTracker()
         self.peak_marker = None      # Graph marker for peak
         self.offpeak_marker = None   # Graph marker for off-peak
 
         # Setup UI components
+        # Labels, graph and alert styling refresh together at a fixed rate instead of on every frame
+        self.ui_refresh = UiRefreshCoalescer(15, self)
+        self.ui_refresh.register("timer", self.update_timer_display)
+        self.ui_refresh.register("counts", self.update_count_display)
+        self.ui_refresh.register("graph", self.refresh_people_graph)
+        self.ui_refresh.register("peaks", self.update_peak_time_display)
+        self.ui_refresh.register("busiest", self.update_busiest_hour_display)
+        self.ui_refresh.register("alert", self.apply_crowd_alert_style)
+        self.ui_refresh.register("scrub", self.update_scrub_bar)
+        self.alert_count = 0
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -904,6 +1525,19 @@ class CrowdSenseApp(QMainWindow):
         # Add header to main layout
         self.main_layout.addWidget(header_container)
     
+    def add_quantized_models(self):
+        """Offer the INT8 variants built with ``crowdsense.py quantize`` that are in the models folder"""
+        for model_name, model_info in list(self.available_models.items()):
+            int8_path = quantized_model_path(model_info["path"])
+            full_path = os.path.join(self.models_dir, int8_path)
+            if os.path.exists(full_path):
+                self.available_models[f"{model_name} INT8"] = {
+                    "path": int8_path,
+                    "url": None,  # Built locally, never downloaded
+                    "description": "INT8 quantized for CPU",
+                    "size": f"{os.path.getsize(full_path) / (1024 * 1024):.1f} MB"
+                }
+    
     def create_model_selection_row(self, parent_layout):
         first_row_container = QWidget()
         first_row_layout = QHBoxLayout(first_row_container)
@@ -936,8 +1570,22 @@ class CrowdSenseApp(QMainWindow):
         # Connect model selection change event
         self.model_combo.currentIndexChanged.connect(self.on_model_changed)
         
+        # Inference backend selection
+        backend_label = QLabel("Backend:")
+        backend_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        backend_label.setToolTip("ONNX Runtime and TorchScript export the model on first use and cache it in the models folder")
+        
+        self.backend_combo = QComboBox()
+        self.setup_dropdown_style(self.backend_combo)
+        for backend, backend_name in self.available_backends.items():
+            self.backend_combo.addItem(backend_name, backend)
+        self.backend_combo.setCurrentIndex(list(self.available_backends.keys()).index(self.current_backend))
+        self.backend_combo.currentIndexChanged.connect(self.on_backend_changed)
+        
         model_layout.addWidget(model_label)
         model_layout.addWidget(self.model_combo, 1)
+        model_layout.addWidget(backend_label)
+        model_layout.addWidget(self.backend_combo)
         
         # Confidence threshold part
         threshold_container = QWidget()
@@ -958,9 +1606,29 @@ class CrowdSenseApp(QMainWindow):
         threshold_layout.addWidget(threshold_label)
         threshold_layout.addWidget(self.threshold_slider, 1)
         
-        # Add both containers to the first row
+        # Detection stride part
+        stride_container = QWidget()
+        stride_layout = QHBoxLayout(stride_container)
+        stride_layout.setContentsMargins(0, 0, 0, 0)
+        stride_layout.setSpacing(8)
+        
+        stride_label = QLabel("Detect Every:")
+        stride_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        stride_label.setToolTip("Run YOLO every N frames and track boxes with optical flow in between")
+        
+        self.stride_slider = ModernBoxedSlider(integer_display=True)
+        self.stride_slider.setMinimumWidth(80)
+        self.stride_slider.setRange(1, 10)
+        self.stride_slider.setValue(self.detection_stride)
+        self.stride_slider.valueChanged.connect(self.on_detection_stride_changed)
+        
+        stride_layout.addWidget(stride_label)
+        stride_layout.addWidget(self.stride_slider, 1)
+        
+        # Add the containers to the first row
         first_row_layout.addWidget(model_container, 3)
         first_row_layout.addWidget(threshold_container, 1)
+        first_row_layout.addWidget(stride_container, 1)
         
         parent_layout.addWidget(first_row_container)
     
@@ -980,11 +1648,41 @@ class CrowdSenseApp(QMainWindow):
         # Populate the combobox with video sources
         self.populate_sources()
         
+        # Playback speed selection
+        speed_label = QLabel("Speed:")
+        speed_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        
+        self.speed_combo = QComboBox()
+        self.speed_combo.setMinimumWidth(80)
+        self.setup_dropdown_style(self.speed_combo)
+        for speed_name, speed in self.playback_speeds.items():
+            self.speed_combo.addItem(speed_name, speed)
+        self.speed_combo.setToolTip("Playback speed (Max analyzes as fast as possible)")
+        self.speed_combo.currentIndexChanged.connect(self.on_speed_changed)
+        
+        # Detection batch size selection
+        batch_label = QLabel("Batch:")
+        batch_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        
+        self.batch_combo = QComboBox()
+        self.batch_combo.setMinimumWidth(70)
+        self.setup_dropdown_style(self.batch_combo)
+        for batch_name, batch_size in self.batch_sizes.items():
+            self.batch_combo.addItem(batch_name, batch_size)
+        self.batch_tooltip = ("Frames per YOLO forward pass; batches raise throughput on a GPU, "
+                              "Live detects only the newest frame for the lowest latency")
+        self.batch_combo.setToolTip(self.batch_tooltip)
+        self.batch_combo.currentIndexChanged.connect(self.on_batch_size_changed)
+        
         # Control buttons container
         buttons_container = self.create_playback_buttons()
         
         source_layout.addWidget(source_label)
         source_layout.addWidget(self.source_combo, 1)
+        source_layout.addWidget(speed_label)
+        source_layout.addWidget(self.speed_combo)
+        source_layout.addWidget(batch_label)
+        source_layout.addWidget(self.batch_combo)
         source_layout.addWidget(buttons_container)
         
         parent_layout.addWidget(source_container)
@@ -1157,9 +1855,60 @@ class CrowdSenseApp(QMainWindow):
         offpeak_row_layout.addWidget(self.offpeak_count_value)
         offpeak_row_layout.addStretch(1)  # Push everything to the left
         
+        # Busiest hour row (horizontal)
+        busiest_row = QWidget()
+        busiest_row.setStyleSheet("border: none;")
+        busiest_row_layout = QHBoxLayout(busiest_row)
+        busiest_row_layout.setContentsMargins(0, 0, 0, 0)
+        busiest_row_layout.setSpacing(12)  # Space between elements
+        
+        # Small colored indicator for the busiest hour
+        busiest_indicator = QLabel()
+        busiest_indicator.setFixedSize(10, 10)
+        busiest_indicator.setStyleSheet(f"""
+            background-color: {ACCENT_COLOR};
+            border-radius: 5px;
+            border: none;
+        """)
+        
+        busiest_label = QLabel("Busiest Hour:")
+        busiest_label.setStyleSheet("""
+            font-family: Arial;
+            font-size: 14px;
+            font-weight: bold;
+            color: #CCCCCC;
+            border: none;
+        """)
+        busiest_label.setFixedWidth(100)  # Fixed width for label
+        
+        self.busiest_hour_value = QLabel("--:--:--")
+        self.busiest_hour_value.setStyleSheet(f"""
+            font-family: Arial;
+            font-size: 14px;
+            font-weight: bold;
+            color: {ACCENT_COLOR};
+            border: none;
+        """)
+        self.busiest_hour_value.setFixedWidth(60)  # Fixed width for time value
+        
+        self.busiest_hour_count_value = QLabel("(0 people avg)")
+        self.busiest_hour_count_value.setStyleSheet("""
+            font-family: Arial;
+            font-size: 14px;
+            color: #AAAAAA;
+            border: none;
+        """)
+        
+        busiest_row_layout.addWidget(busiest_indicator)
+        busiest_row_layout.addWidget(busiest_label)
+        busiest_row_layout.addWidget(self.busiest_hour_value)
+        busiest_row_layout.addWidget(self.busiest_hour_count_value)
+        busiest_row_layout.addStretch(1)  # Push everything to the left
+        
         # Add rows to container
         rows_layout.addWidget(peak_row)
         rows_layout.addWidget(offpeak_row)
+        rows_layout.addWidget(busiest_row)
         
         # Add container to main layout
         peak_layout.addWidget(rows_container)
@@ -1262,8 +2011,7 @@ class CrowdSenseApp(QMainWindow):
         """Handle splitter movement to update video frame"""
         # Force a resize event to update the video display
         if self.displayed_frame is not None and self.paused:
-            rgb_frame = cv2.cvtColor(self.displayed_frame, cv2.COLOR_BGR2RGB)
-            self.display_frame(rgb_frame)
+            self.display_frame(self.displayed_frame)
 
     def setup_video_output(self, parent_widget):
         # Apply styling directly to the parent widget
@@ -1306,9 +2054,28 @@ class CrowdSenseApp(QMainWindow):
         heatmap_layout.addWidget(heatmap_label)
         heatmap_layout.addWidget(self.heatmap_toggle)
         
-        # Add output header and toggle to header container
+        # Add toggle switch for the dual-rate display
+        smooth_container = QWidget()
+        smooth_container.setStyleSheet("border: none;")
+        smooth_layout = QHBoxLayout(smooth_container)
+        smooth_layout.setContentsMargins(0, 0, 0, 0)
+        smooth_layout.setSpacing(8)
+        
+        smooth_label = QLabel("Smooth Video:")
+        smooth_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        smooth_label.setToolTip("Show every frame at the source rate with the latest detections as an overlay, "
+                                "instead of only the frames detection has finished")
+        
+        self.smooth_toggle = ToggleSwitch()
+        self.smooth_toggle.toggled.connect(self.on_smooth_video_toggled)
+        
+        smooth_layout.addWidget(smooth_label)
+        smooth_layout.addWidget(self.smooth_toggle)
+        
+        # Add output header and toggles to header container
         header_layout.addWidget(output_header)
         header_layout.addStretch(1)
+        header_layout.addWidget(smooth_container)
         header_layout.addWidget(heatmap_container)
         
         # Create timer display
@@ -1396,6 +2163,8 @@ class CrowdSenseApp(QMainWindow):
         self.video_label.set_default_content()
         self.video_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.video_label.setMinimumWidth(100)  # Set a very small minimum width
+        self.yolo_thread.set_display_surface(self.video_label)  # Annotated frames arrive scaled to fit
+        self.video_thread.set_display_surface(self.video_label)
         
         video_layout.addWidget(self.video_label)
         
@@ -1406,6 +2175,42 @@ class CrowdSenseApp(QMainWindow):
         output_layout.addWidget(self.model_progress)
         output_layout.addWidget(video_container, 1)  # Give video container stretch priority
 
+        # Scrub bar and analysis range, usable once the video's seek index is ready
+        scrub_container = QWidget()
+        scrub_container.setStyleSheet("border: none; margin: 0;")
+        scrub_layout = QHBoxLayout(scrub_container)
+        scrub_layout.setContentsMargins(0, 6, 0, 0)
+        scrub_layout.setSpacing(10)
+        
+        self.scrub_slider = QSlider(Qt.Orientation.Horizontal)
+        self.scrub_slider.setEnabled(False)
+        self.scrub_slider.setToolTip("Drag to jump to any frame of the video")
+        self.scrub_slider.sliderReleased.connect(self.on_scrub_released)
+        
+        self.scrub_time_label = QLabel("--:--:-- / --:--:--")
+        self.scrub_time_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        
+        range_label = QLabel("Range:")
+        range_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        range_label.setToolTip("Only analyze this part of the video (HH:MM:SS, MM:SS or seconds; empty for the start or end)")
+        
+        self.range_start_edit = QLineEdit()
+        self.range_end_edit = QLineEdit()
+        for edit, placeholder in ((self.range_start_edit, "Start"), (self.range_end_edit, "End")):
+            edit.setPlaceholderText(placeholder)
+            edit.setFixedWidth(90)
+            edit.setEnabled(False)
+            edit.setStyleSheet(RANGE_EDIT_STYLE.format(border=BORDER_COLOR))
+            edit.editingFinished.connect(self.apply_analysis_range)
+        
+        scrub_layout.addWidget(self.scrub_slider, 1)
+        scrub_layout.addWidget(self.scrub_time_label)
+        scrub_layout.addWidget(range_label)
+        scrub_layout.addWidget(self.range_start_edit)
+        scrub_layout.addWidget(QLabel("–"))
+        scrub_layout.addWidget(self.range_end_edit)
+        output_layout.addWidget(scrub_container)
+        
         # Add spacing before export container
         output_layout.addSpacing(8)  # Fixed spacing of 8px
 
@@ -1423,9 +2228,51 @@ class CrowdSenseApp(QMainWindow):
         self.export_heatmap_button.setEnabled(False)  # Initially disabled
         self.export_heatmap_button.clicked.connect(self.export_heatmap)
 
+        # Inference size selection
+        imgsz_label = QLabel("Inference Size:")
+        imgsz_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        imgsz_label.setToolTip("Resolution YOLO runs at; smaller is faster, larger finds smaller people")
+        
+        self.imgsz_combo = QComboBox()
+        self.setup_dropdown_style(self.imgsz_combo)
+        for size_name, size in self.inference_sizes.items():
+            self.imgsz_combo.addItem(size_name, size)
+        self.imgsz_combo.currentIndexChanged.connect(self.on_imgsz_changed)
+        
+        # Tiled inference selection
+        tiling_label = QLabel("Tiling:")
+        tiling_label.setStyleSheet(SUBHEADER_FONT_STYLE)
+        tiling_label.setToolTip("Detect on overlapping tiles of this size to find small, distant people in high-resolution video")
+        
+        self.tiling_combo = QComboBox()
+        self.setup_dropdown_style(self.tiling_combo)
+        for tile_name, tile_size in self.tile_sizes.items():
+            self.tiling_combo.addItem(tile_name, tile_size)
+        self.tiling_combo.currentIndexChanged.connect(self.on_tiling_changed)
+        
+        # Region of interest buttons
+        self.draw_roi_button = QPushButton("Draw ROI")
+        self.draw_roi_button.setStyleSheet(EXPORT_BUTTON_STYLE)
+        self.draw_roi_button.setFixedWidth(110)
+        self.draw_roi_button.setToolTip("Drag a rectangle, or click polygon points and right-click to finish")
+        self.draw_roi_button.setEnabled(False)  # Enabled once a video is loaded
+        self.draw_roi_button.clicked.connect(self.start_roi_drawing)
+        
+        self.clear_roi_button = QPushButton("Clear ROI")
+        self.clear_roi_button.setStyleSheet(EXPORT_BUTTON_STYLE)
+        self.clear_roi_button.setFixedWidth(110)
+        self.clear_roi_button.setEnabled(False)
+        self.clear_roi_button.clicked.connect(self.clear_roi)
+        
         # Add button to layout with left alignment
         export_layout.addWidget(self.export_heatmap_button)
         export_layout.addStretch(1)  # This pushes the button to the left
+        export_layout.addWidget(imgsz_label)
+        export_layout.addWidget(self.imgsz_combo)
+        export_layout.addWidget(tiling_label)
+        export_layout.addWidget(self.tiling_combo)
+        export_layout.addWidget(self.draw_roi_button)
+        export_layout.addWidget(self.clear_roi_button)
 
         # Add button to output layout
         output_layout.addWidget(export_container)
@@ -1517,13 +2364,21 @@ class CrowdSenseApp(QMainWindow):
         self.export_graph_button.setEnabled(False)
         self.export_graph_button.clicked.connect(self.export_count_graph)
         
+        self.sweep_button = QPushButton("Sweep Confidence Thresholds")
+        self.sweep_button.setStyleSheet(EXPORT_BUTTON_STYLE)
+        self.sweep_button.setFixedWidth(220)
+        self.sweep_button.setEnabled(False)
+        self.sweep_button.setToolTip("Compare counts, peaks and alerts at every threshold from the cached detections")
+        self.sweep_button.clicked.connect(self.show_threshold_sweep)
+        
         # Button container for left alignment
         button_container = QWidget()
         button_container.setStyleSheet("background-color: transparent; border: none;")
         button_layout = QHBoxLayout(button_container)
         button_layout.setContentsMargins(0, 0, 0, 0)
-        button_layout.setSpacing(0)
+        button_layout.setSpacing(8)
         button_layout.addWidget(self.export_graph_button)
+        button_layout.addWidget(self.sweep_button)
         button_layout.addStretch(1)
         
         # Add button to export container
@@ -1565,9 +2420,32 @@ class CrowdSenseApp(QMainWindow):
         self.people_count_value.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.people_count_value.setMinimumWidth(60)  # Increased width for larger numbers
         
+        # Unique visitors: distinct people tracked since the video started
+        unique_visitors_header = QLabel("Unique Visitors")
+        unique_visitors_header.setStyleSheet("""
+            font-family: Arial;
+            font-size: 14px;
+            color: #CCCCCC;
+            border: none;
+        """)
+        
+        self.unique_visitors_value = QLabel("0")
+        self.unique_visitors_value.setStyleSheet(f"""
+            font-family: Arial;
+            font-size: 20px;
+            font-weight: bold;
+            color: {TEXT_COLOR};
+            border: none;
+        """)
+        self.unique_visitors_value.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.unique_visitors_value.setMinimumWidth(50)
+        
         people_count_layout.addWidget(people_count_header)
         people_count_layout.addStretch(1)
         people_count_layout.addWidget(self.people_count_value)
+        people_count_layout.addSpacing(12)
+        people_count_layout.addWidget(unique_visitors_header)
+        people_count_layout.addWidget(self.unique_visitors_value)
         
         # Set a fixed height to keep it compact but accommodate larger text
         people_count_widget.setFixedHeight(60)  # Increased from 50 to 60
@@ -1609,11 +2487,35 @@ class CrowdSenseApp(QMainWindow):
         
         return people_graph_widget
     
+    def create_people_plot(self):
+        """Add the people count line to the graph, drawn at the plot's level of detail
+
+        Only the visible range is drawn, downsampled to the plot width keeping each
+        bucket's minimum and maximum so peaks survive, which keeps drawing cost flat
+        however long the session runs.
+        """
+        plot = self.people_graph_widget.plot(
+            [], [], 
+            pen=pg.mkPen(color=ACCENT_COLOR, width=3), 
+            symbolBrush=pg.mkBrush(LIGHTER_ACCENT_COLOR),
+            symbolPen=pg.mkPen(LIGHTER_ACCENT_COLOR),
+            symbolSize=4,
+            symbol='o'
+        )
+        plot.setClipToView(True)
+        plot.setDownsampling(auto=True, method='peak')
+        plot.setSkipFiniteCheck(True)  # Counts are always finite
+        return plot
+    
     def setup_people_count_graph(self):
         """Setup the real-time people count graph with a modern look"""
-        # Data for the graph - no maxlen to keep all data
-        self.people_data = []
-        self.time_data = []
+        # Data for the graph - recent raw points, drawing is downsampled to the plot width
+        self.count_series = GrowableSeries(max_size=2 ** 18)  # About 2.5 hours of detections at 30 fps
+        self.graph_symbol_limit = 500  # Point markers are dropped beyond this many points
+        
+        # Per-second/minute/hour rollups for what the raw points no longer cover
+        self.occupancy = OccupancyRollups()
+        self.graph_follow = True  # Show the whole session until the user zooms or pans
         self.start_time = time.time()
         
         # Create a pyqtgraph PlotWidget
@@ -1638,14 +2540,7 @@ class CrowdSenseApp(QMainWindow):
         self.people_graph_widget.setFrameShape(QFrame.Shape.NoFrame)
         
         # Create the plot line with improved styling
-        self.people_graph = self.people_graph_widget.plot(
-            [], [], 
-            pen=pg.mkPen(color=ACCENT_COLOR, width=3), 
-            symbolBrush=pg.mkBrush(LIGHTER_ACCENT_COLOR),
-            symbolPen=pg.mkPen(LIGHTER_ACCENT_COLOR),
-            symbolSize=4,
-            symbol='o'
-        )
+        self.people_graph = self.create_people_plot()
         
         # Configure axes with modern styling
         axis_color = '#888888'
@@ -1658,6 +2553,11 @@ class CrowdSenseApp(QMainWindow):
         
         # Style the grid with more subtle lines
         self.people_graph_widget.showGrid(x=True, y=True, alpha=0.2)
+        
+        # Zooming picks the resolution to draw; the auto-range button goes back to following the session
+        plot_item = self.people_graph_widget.getPlotItem()
+        plot_item.getViewBox().sigRangeChangedManually.connect(self.on_people_graph_zoomed)
+        plot_item.autoBtn.clicked.connect(self.follow_people_graph)
 
     def create_crowd_detection_widget(self):
         """Create widget for crowd threshold detection and alerts"""
@@ -1818,97 +2718,55 @@ class CrowdSenseApp(QMainWindow):
 
     def on_smoothing_window_changed(self, value):
         """Handle smoothing window size slider change"""
-        # Store the current history values
-        current_history = list(self.people_count_history)
-        
-        # Update the window size
+        # Update the window size, keeping the existing history limited to the new size
         self.smoothing_window_size = value
-        
-        # Create a new deque with the new size
-        self.people_count_history = deque(maxlen=value)
-        
-        # Add back the existing history, limited to the new size
-        for count in current_history[-value:]:
-            self.people_count_history.append(count)
+        self.count_smoother.set_window_size(value)
             
         # Recalculate smoothed count
-        if len(self.people_count_history) > 0:
-            self.smoothed_people_count = round(np.mean(self.people_count_history))
-            self.people_count_value.setText(str(self.smoothed_people_count))
+        if len(self.count_smoother.history) > 0:
+            self.smoothed_people_count = self.count_smoother.value
+            self.ui_refresh.mark("counts")
             
         # Check threshold with new window size
         if self.crowd_detection_enabled and self.current_frame is not None:
             self.check_threshold_crossing(self.current_frame)
 
     def update_crowd_alert_status(self, alert_active, count=0):
-        """Update the crowd alert status indicator"""
+        """Update the crowd alert state; the indicator is restyled on the next UI refresh"""
         self.threshold_alert_active = alert_active
+        self.alert_count = count
         
         if alert_active:
-            # Active alert styling - light red border
-            self.alert_container.setStyleSheet("""
-                background-color: #4e1c1c;
-                border-radius: 4px;
-                border: 1px solid #cc3232; /* Light red border */
-            """)
-            self.alert_icon.setStyleSheet("""
-                font-family: Arial;
-                font-size: 16px;
-                color: #ff5555;
-                border: none;
-            """)
-            self.alert_text.setStyleSheet("""
-                font-family: Arial;
-                font-size: 12px;
-                color: #ff9999;
-                border: none;
-            """)
-            
-            # Update alert text
-            self.alert_text.setText(f"ALERT! {count} people detected (threshold: {self.crowd_size_threshold})")
-            
-            # Also update people count display with alert styling
-            if hasattr(self, 'people_count_value'):
-                self.people_count_value.setStyleSheet("color: #ff5555; font-size: 32px; font-weight: bold; border: none;")
-            
             # Add to alert history with timestamp
-            current_time = self.format_time_for_filename(self.video_time_ms)
+            current_time = self.format_time_for_filename(self.detection_time_ms)
             alert_record = {
                 'timestamp': current_time,
                 'count': count,
                 'threshold': self.crowd_size_threshold
             }
             self.threshold_history.append(alert_record)
-            
+        
+        self.ui_refresh.mark("alert")
+    
+    def apply_crowd_alert_style(self):
+        """Style the crowd alert indicator and people count for the current alert state"""
+        container_style, icon_style, text_style, count_style = ALERT_STYLES[self.threshold_alert_active]
+        self.alert_container.setStyleSheet(container_style)
+        self.alert_icon.setStyleSheet(icon_style)
+        self.alert_text.setStyleSheet(text_style)
+        self.people_count_value.setStyleSheet(count_style)
+        
+        if self.threshold_alert_active:
+            self.alert_text.setText(f"ALERT! {self.alert_count} people detected (threshold: {self.crowd_size_threshold})")
         else:
-            # Normal status styling - grey border
-            self.alert_container.setStyleSheet(f"""
-                background-color: #2A2A2A;
-                border-radius: 4px;
-                border: 1px solid {BORDER_COLOR}; /* Grey border */
-            """)
-            self.alert_icon.setStyleSheet("""
-                font-family: Arial;
-                font-size: 16px;
-                color: #555555;
-                border: none;
-            """)
-            self.alert_text.setStyleSheet("""
-                font-family: Arial;
-                font-size: 12px;
-                color: #AAAAAA;
-                border: none;
-            """)
-            
-            # Reset alert text
             self.alert_text.setText("People count is normal")
-            
-            # Reset people count display styling
-            if hasattr(self, 'people_count_value'):
-                self.people_count_value.setStyleSheet(f"color: {ACCENT_COLOR}; font-size: 32px; font-weight: bold; border: none;")
     
     def restart_video(self):
-        """Restart the current video from the beginning in a thread-safe way"""
+        """Restart the current video from the start of the analysis range"""
+        self.seek_to_frame(self.range_start_frame)
+    
+    def seek_to_frame(self, frame_index):
+        """Jump to frame_index and restart analysis from there in a thread-safe way"""
         if self.cap is None or not self.cap.isOpened():
             return
             
@@ -1934,22 +2792,35 @@ class CrowdSenseApp(QMainWindow):
         QApplication.processEvents()
         time.sleep(0.1)  # Small delay to ensure thread cleanup
         
-        # Reset video position to beginning
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        # Frame-accurate seeks need the seek index; until it is ready only the start can be reached
+        if self.seek_index is None:
+            frame_index = 0
+        frame_index = self.position_capture(frame_index)
         
-        # Reset timer
-        self.video_time_ms = 0
-        self.last_frame_time = time.time()
+        # Keep what this run detected, so the replay reads it instead of running the model
+        self.save_detection_cache()
+        
+        # Drop frames queued before the restart and start tracking afresh from a full detection
+        self.yolo_thread.flush()
+        self.unique_visitors = 0
+        self.unique_visitors_value.setText("0")
+        
+        # Reset timer to the frame's presentation time
+        self.video_time_ms = int(self.seek_index.times_ms[frame_index]) if self.seek_index is not None else 0
+        self.detection_time_ms = self.video_time_ms
         self.update_timer_display()
+        self.current_frame_index = frame_index
+        self.update_scrub_bar()
         
         # Reset graph data
-        self.people_data.clear()
-        self.time_data.clear()
+        self.count_series.clear()
+        self.occupancy.reset()
+        self.graph_follow = True
         
         # Initialize new heatmap accumulator if needed but keep heatmap enabled state
         heatmap_was_enabled = self.heatmap_enabled
         if heatmap_was_enabled:
-            self.heatmap_accumulator = None
+            self.heatmap.reset_live()
             
         # Reset threshold alert state
         self.threshold_alert_active = False
@@ -1961,14 +2832,13 @@ class CrowdSenseApp(QMainWindow):
             self.alert_segment = None
         
         # Reset peak tracking
-        self.peak_count = 0
-        self.peak_time_ms = 0
-        self.offpeak_count = float('inf')
-        self.offpeak_time_ms = 0
+        self.peak_tracker.reset()
         self.peak_time_value.setText("--:--:--")
         self.peak_count_value.setText("(0 people)")
         self.offpeak_time_value.setText("--:--:--")
         self.offpeak_count_value.setText("(0 people)")
+        self.busiest_hour_value.setText("--:--:--")
+        self.busiest_hour_count_value.setText("(0 people avg)")
         
         if self.peak_marker is not None:
             self.people_graph_widget.removeItem(self.peak_marker)
@@ -1982,26 +2852,21 @@ class CrowdSenseApp(QMainWindow):
         ret, first_frame = self.cap.read()
         if ret:
             # Process the first frame directly
-            self.current_frame = first_frame.copy()
+            self.set_current_frame(first_frame)
             
             # Apply YOLO detection if ready
             if self.yolo_ready:
-                # Run YOLO detection directly to get boxes
-                results = self.yolo_thread.model(first_frame, classes=0)
-                
-                # Collect people boxes for heatmap
-                boxes = []
-                for result in results:
-                    result_boxes = result.boxes
-                    for box in result_boxes:
-                        # Get box coordinates
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-                        confidence = float(box.conf[0])
-                        
-                        # Only count if confidence is above threshold
-                        if confidence > self.confidence_threshold:
-                            boxes.append((x1, y1, x2, y2))
+                # Take the first frame's boxes from the detection cache, or run YOLO directly to get them
+                cache = self.yolo_thread.detection_cache
+                cached = cache.get(frame_index) if cache is not None else None
+                if cached is None:
+                    predict_kwargs = {"imgsz": self.yolo_thread.imgsz} if self.yolo_thread.imgsz else {}
+                    model_threshold = min(self.confidence_threshold, cache.FLOOR) if cache is not None else self.confidence_threshold
+                    cached = detect_people(self.yolo_thread.model, first_frame, model_threshold,
+                                           self.yolo_thread.roi, self.yolo_thread.tiling, **predict_kwargs)
+                    if cache is not None:
+                        cache.put(frame_index, *cached)
+                boxes, _ = filter_detections(*cached, self.confidence_threshold)
                 
                 # Store these boxes
                 self.last_detected_boxes = boxes
@@ -2010,27 +2875,24 @@ class CrowdSenseApp(QMainWindow):
                 if heatmap_was_enabled:
                     display_frame = self.process_frame_with_heatmap(first_frame, boxes)
                 else:
-                    display_frame = first_frame.copy()
-                    
-                # Convert to RGB for display
-                rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+                    display_frame = first_frame
                 
                 # Store the processed frame
                 self.displayed_frame = display_frame
             else:
                 # If YOLO is not ready, just display the frame without processing
-                rgb_frame = cv2.cvtColor(first_frame, cv2.COLOR_BGR2RGB)
-                self.displayed_frame = first_frame.copy()
+                self.displayed_frame = first_frame
             
             # Display the frame
-            self.display_frame(rgb_frame)
+            self.display_frame(self.displayed_frame)
             
-            # Reset to beginning again since we read one frame
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            # Seek back since we read one frame
+            self.position_capture(frame_index)
         
         # Restart video thread if it was running before
+        self.video_thread.end_frame = self.range_end_frame
+        self.video_thread.set_capture(self.cap, frame_index)
         if video_was_running:
-            self.video_thread.set_capture(self.cap)
             self.video_thread.start()
         
         # Determine if we should be paused or playing
@@ -2050,6 +2912,95 @@ class CrowdSenseApp(QMainWindow):
             self.play_button.setEnabled(False)
             self.pause_button.setEnabled(True)
 
+    def position_capture(self, frame_index):
+        """Make frame_index the next frame self.cap reads, returning the frame it actually reached"""
+        if self.seek_index is not None:
+            return self.seek_index.seek(self.cap, frame_index)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        return frame_index
+    
+    def start_seek_index(self, video_path):
+        """Index video_path in the background; scrubbing and range mode unlock once it is ready"""
+        self.seek_index = None
+        self.range_start_frame = 0
+        self.range_end_frame = None
+        self.current_frame_index = 0
+        self.video_thread.end_frame = None
+        self.scrub_slider.setEnabled(False)
+        for edit in (self.range_start_edit, self.range_end_edit):
+            edit.clear()
+            edit.setEnabled(False)
+        self.scrub_time_label.setText("Indexing...")
+        
+        # Earlier videos may still be indexing; keep their threads alive until they finish
+        thread = SeekIndexThread(video_path, self.seek_index_dir)
+        thread.index_ready.connect(self.on_seek_index_ready)
+        thread.finished.connect(lambda: self.seek_index_threads.discard(thread))
+        self.seek_index_threads.add(thread)
+        thread.start()
+    
+    def on_seek_index_ready(self, video_path, index):
+        """Enable the scrub bar and range fields once the current video is indexed"""
+        if video_path != self.current_video_path or index.frame_count == 0:
+            return
+        self.seek_index = index
+        self.scrub_slider.setRange(0, index.frame_count - 1)
+        self.scrub_slider.setEnabled(True)
+        for edit in (self.range_start_edit, self.range_end_edit):
+            edit.setEnabled(True)
+        self.update_scrub_bar()
+    
+    def update_scrub_bar(self):
+        """Move the scrub bar and its time label to the current frame, unless the user is dragging it"""
+        index = self.seek_index
+        if index is None:
+            return
+        frame_index = min(self.current_frame_index, index.frame_count - 1)
+        if not self.scrub_slider.isSliderDown():
+            self.scrub_slider.setValue(frame_index)
+        self.scrub_time_label.setText(f"{ThresholdSweepDialog.format_time(index.times_ms[frame_index])} / "
+                                      f"{ThresholdSweepDialog.format_time(index.times_ms[-1])}")
+    
+    def on_scrub_released(self):
+        """Jump to the frame the scrub bar was dragged to, kept within the analysis range"""
+        frame_index = max(self.scrub_slider.value(), self.range_start_frame)
+        if self.range_end_frame is not None:
+            frame_index = min(frame_index, self.range_end_frame - 1)
+        self.seek_to_frame(frame_index)
+    
+    def apply_analysis_range(self):
+        """Limit analysis to the times in the range fields and restart from the range's start"""
+        index = self.seek_index
+        if index is None:
+            return
+        
+        try:
+            start_text = self.range_start_edit.text().strip()
+            end_text = self.range_end_edit.text().strip()
+            start_frame = index.frame_at(parse_timestamp(start_text)) if start_text else 0
+            end_frame = None
+            if end_text:
+                end_ms = parse_timestamp(end_text)
+                if end_ms <= index.times_ms[-1]:
+                    end_frame = index.frame_at(end_ms)
+            if end_frame is not None and end_frame <= start_frame:
+                raise ValueError("The range must end after it starts")
+        except ValueError as e:
+            # Outline the fields in red until a valid range is entered
+            for edit in (self.range_start_edit, self.range_end_edit):
+                edit.setStyleSheet(RANGE_EDIT_STYLE.format(border=INVALID_BORDER_COLOR))
+                edit.setToolTip(str(e))
+            return
+        for edit in (self.range_start_edit, self.range_end_edit):
+            edit.setStyleSheet(RANGE_EDIT_STYLE.format(border=BORDER_COLOR))
+            edit.setToolTip("")
+        
+        if (start_frame, end_frame) == (self.range_start_frame, self.range_end_frame):
+            return
+        self.range_start_frame = start_frame
+        self.range_end_frame = end_frame
+        self.seek_to_frame(start_frame)
+
     def populate_sources(self):
         # Try to find sources directory
         sources_dir = os.path.join(os.getcwd(), "sources")
@@ -2068,156 +3019,97 @@ class CrowdSenseApp(QMainWindow):
             # If sources directory doesn't exist, add a placeholder
             self.source_combo.addItem("'sources' directory not found", "")
     
-    def process_frame_with_heatmap(self, frame, boxes):
-        """Process a frame with or without heatmap overlay"""
-        # Create a copy of the frame for display
-        display_frame = frame.copy()
+    def process_frame_with_heatmap(self, frame, boxes, scaled_frame=None):
+        """Process a frame with or without heatmap overlay, returning the (scaled) frame itself when there is none
+
+        scaled_frame is the frame already scaled down for display by a worker thread.
+        """
+        if scaled_frame is None:
+            scaled_frame = frame
+        if not self.heatmap_enabled:
+            return scaled_frame
         
-        # Apply heatmap overlay if enabled
-        if self.heatmap_enabled:
-            # Update heatmap with new positions - this adds to the accumulator
-            heatmap = self.update_heatmap(display_frame, boxes)
-            
-            if heatmap is not None and np.max(heatmap) > 0:
-                # Ensure minimum value of 0.1 for blue background in low activity areas
-                viz_heatmap = np.maximum(heatmap, 0.1)
-                
-                # Convert to 8-bit for colormap
-                viz_heatmap_8bit = (viz_heatmap * 255).astype(np.uint8)
-                
-                # Apply JET colormap to get blue->green->red gradient
-                heatmap_colored = cv2.applyColorMap(viz_heatmap_8bit, cv2.COLORMAP_JET)
-                
-                # Darken the original frame to make heatmap more visible
-                darkened_frame = cv2.addWeighted(display_frame, 0.4, np.zeros_like(display_frame), 0.6, 0)
-                
-                # Blend the heatmap with the darkened original frame
-                display_frame = cv2.addWeighted(heatmap_colored, 0.7, darkened_frame, 0.3, 0)
-                
-                # Add grid lines for better visualization
-                h, w = display_frame.shape[:2]
-                grid_spacing = 50
-                
-                # Draw vertical grid lines
-                for x in range(0, w, grid_spacing):
-                    cv2.line(display_frame, (x, 0), (x, h), GRID_COLOR, 1)
-                
-                # Draw horizontal grid lines
-                for y in range(0, h, grid_spacing):
-                    cv2.line(display_frame, (0, y), (w, y), GRID_COLOR, 1)
+        # Update heatmap with new positions - this adds to the accumulator
+        self.update_heatmap(frame, boxes)
+        
+        if self.heatmap.accumulator is None or self.heatmap.accumulator_max <= 0:
+            return scaled_frame
         
-        return display_frame
+        # Composite the heatmap, darkened frame and grid at the size the frame will be shown at
+        h, w = frame.shape[:2]
+        return self.heatmap_renderer.render(scaled_frame, self.heatmap.accumulator, self.heatmap.scale,
+                                            self.display_size(scaled_frame), source_size=(w, h))
 
     def update_heatmap(self, frame, boxes):
         """Update the heatmap accumulator with new people positions using a low-resolution approach"""
-        h, w = frame.shape[:2]
-        
-        # Use the class property for scale factor
-        scale_factor = self.heatmap_scale_factor
-        low_h, low_w = int(h * scale_factor), int(w * scale_factor)
-        
-        # Check if the frame resolution has changed
-        if self.heatmap_accumulator is not None:
-            current_low_h, current_low_w = self.heatmap_accumulator.shape
-            if current_low_h != low_h or current_low_w != low_w:
-                self.heatmap_accumulator = None
-                self.aggregate_heatmap_accumulator = None
-                self.aggregate_frame_count = 0
-        
-        # Initialize low-resolution heatmap accumulator if not exists
-        if self.heatmap_accumulator is None:
-            self.heatmap_accumulator = np.zeros((low_h, low_w), dtype=np.float32)
-        
-        # Initialize aggregate heatmap accumulator if not exists
-        if self.aggregate_heatmap_accumulator is None:
-            self.aggregate_heatmap_accumulator = np.zeros((low_h, low_w), dtype=np.float32)
-        
-        # Apply decay to existing heatmap (only the regular one, not the aggregate)
-        self.heatmap_accumulator *= self.heatmap_decay
-        
-        # Create a new low-resolution heatmap for current positions
-        current_heatmap = np.zeros((low_h, low_w), dtype=np.float32)
-        
-        # Add detected people positions to current heatmap
-        for box in boxes:
-            # Scale down coordinates to low resolution
-            x1, y1, x2, y2 = box
-            
-            # Use bottom center of bounding box (feet position)
-            foot_x = int((x1 + x2) / 2 * scale_factor)
-            foot_y = int(y2 * scale_factor)
-            
-            # Ensure coordinates are within frame
-            if 0 <= foot_x < low_w and 0 <= foot_y < low_h:
-                # Add a point with intensity 1.0
-                current_heatmap[foot_y, foot_x] = 1.0
-                
-                # Also add some intensity to surrounding pixels for better blending
-                # Use the class property for neighbor radius
-                radius = self.heatmap_neighbor_radius
-                y_min = max(0, foot_y - radius)
-                y_max = min(low_h - 1, foot_y + radius)
-                x_min = max(0, foot_x - radius)
-                x_max = min(low_w - 1, foot_x + radius)
-                
-                for y in range(y_min, y_max + 1):
-                    for x in range(x_min, x_max + 1):
-                        # Skip the center point (already set to 1.0)
-                        if x == foot_x and y == foot_y:
-                            continue
-                        # Add lower intensity to neighbors
-                        dist = np.sqrt((x - foot_x)**2 + (y - foot_y)**2)
-                        if dist <= radius:
-                            intensity = 1.0 - (dist / radius) * 0.7
-                            current_heatmap[y, x] = max(current_heatmap[y, x], intensity)
-        
-        # Apply multiple blur passes with different kernel sizes if there are detections
-        if np.sum(current_heatmap) > 0:
-            # First pass: Small kernel to smooth initial points
-            current_heatmap = cv2.GaussianBlur(current_heatmap, (7, 7), 0)
-            
-            # Second pass: Medium kernel for wider spread
-            current_heatmap = cv2.GaussianBlur(current_heatmap, (17, 17), 0)
-            
-            # Third pass: Large kernel for final smoothing
-            current_heatmap = cv2.GaussianBlur(current_heatmap, (31, 31), 0)
-            
-            # Normalize the current heatmap
-            max_val = np.max(current_heatmap)
-            if max_val > 0:
-                current_heatmap = current_heatmap / max_val
-        
-        # Add current heatmap to accumulator with appropriate intensity
-        self.heatmap_accumulator += current_heatmap * self.heatmap_intensity
-        
-        # Add to aggregate heatmap accumulator without decay
-        if np.sum(current_heatmap) > 0:
-            self.aggregate_heatmap_accumulator += current_heatmap
-            self.aggregate_frame_count += 1
-        
-        # Cap the maximum value to prevent overflow
-        max_val = np.max(self.heatmap_accumulator)
-        if max_val > 1.0:
-            self.heatmap_accumulator = self.heatmap_accumulator / max_val
-        
-        # Upsample back to original resolution for display
-        return cv2.resize(self.heatmap_accumulator, (w, h), interpolation=cv2.INTER_LINEAR)
+        self.heatmap.accumulate(frame.shape, boxes)
+    
+    def display_size(self, frame):
+        """Size (width, height) a frame will be shown at in the video label, never larger than the frame"""
+        return fit_display_size(frame.shape, self.video_label.display_bounds)
         
-    def update_people_graph(self, count):
+    def update_people_graph(self, count, time_ms=None):
         """Update the people count graph with new data and threshold line"""
         # Only update when playing video
         if self.cap is None or not self.cap.isOpened() or self.paused:
             return
         
-        # Use video time in seconds for x-axis
-        current_time_sec = self.video_time_ms / 1000.0
+        # Use video time of the counted frame in seconds for x-axis
+        current_time_sec = (self.video_time_ms if time_ms is None else time_ms) / 1000.0
+        
+        # Add current time and count to data; the plot catches up on the next UI refresh
+        self.count_series.append(current_time_sec, count)
+        self.occupancy.add(current_time_sec, count)
+        self.ui_refresh.mark("graph")
+        self.ui_refresh.mark("busiest")
+    
+    def on_people_graph_zoomed(self, *args):
+        """Stop following the session once the user zooms or pans the graph, and redraw at the new level of detail"""
+        self.graph_follow = False
+        self.ui_refresh.mark("graph")
+    
+    def follow_people_graph(self):
+        """Show the whole session again, as before the user zoomed"""
+        self.graph_follow = True
+        self.ui_refresh.mark("graph")
+    
+    def people_graph_data(self, start_sec, end_sec, max_points):
+        """Return (times, counts, lowest, highest, resolution) to draw for the time range [start_sec, end_sec]
+
+        Raw counts are used while they still reach back to start_sec; older ranges
+        come from the finest rollup that holds them in at most max_points buckets,
+        drawn as bucket means at bucket centres.
+        """
+        series = self.count_series
+        if series.dropped == 0 or (len(series) > 0 and series.times[0] <= start_sec):
+            return series.times, series.values, series.min, series.max, None
+        
+        level = self.occupancy.level_for_view(start_sec, end_sec, max_points)
+        buckets = level.buckets(start_sec, end_sec)
+        if len(buckets["means"]) == 0:
+            return buckets["starts"], buckets["means"], 0, 0, level.name
+        return (buckets["starts"] + level.seconds / 2, buckets["means"],
+                buckets["mins"].min(), buckets["maxs"].max(), level.name)
+    
+    def refresh_people_graph(self):
+        """Redraw the people count graph, threshold line and axis ranges from the collected data"""
+        series = self.count_series
+        current_time_sec = series.times[-1] if len(series) > 0 else 0
         
-        # Add current time and count to data
-        self.time_data.append(current_time_sec)
-        self.people_data.append(count)
+        # The whole session while following, otherwise the range the user zoomed to
+        padding = max(current_time_sec * 0.05, 1.0)  # At least 1s padding
+        if self.graph_follow:
+            view_start, view_end = 0, current_time_sec + padding
+        else:
+            view_start, view_end = self.people_graph_widget.getPlotItem().getViewBox().viewRange()[0]
         
-        # Update the graph
-        self.people_graph.setData(self.time_data, self.people_data)
+        # Update the graph at the level of detail for the view; symbols only while points can be told apart
+        times, values, min_count, max_count, resolution = self.people_graph_data(
+            view_start, view_end, max(self.people_graph_widget.width(), 100))
+        self.people_graph.setData(times, values)
+        symbol = 'o' if resolution is None and len(values) <= self.graph_symbol_limit else None
+        if symbol != self.people_graph.opts['symbol']:
+            self.people_graph.setSymbol(symbol)
         
         # Add or update threshold line if crowd detection is enabled
         if self.crowd_detection_enabled:
@@ -2242,16 +3134,16 @@ class CrowdSenseApp(QMainWindow):
             if self.threshold_alert_active:
                 # Last point is above threshold, use red for the last segment
                 red_pen = pg.mkPen(color='r', width=3)
-                if len(self.time_data) >= 2:
+                if len(series) >= 2:
                     # Create or update the alert segment line
                     if not hasattr(self, 'alert_segment') or self.alert_segment is None:
                         self.alert_segment = self.people_graph_widget.plot(
-                            self.time_data[-2:], self.people_data[-2:],
+                            series.times[-2:], series.values[-2:],
                             pen=red_pen
                         )
                     else:
                         self.alert_segment.setData(
-                            self.time_data[-2:], self.people_data[-2:]
+                            series.times[-2:], series.values[-2:]
                         )
         elif hasattr(self, 'threshold_line') and self.threshold_line is not None:
             # Remove threshold line if crowd detection is disabled
@@ -2263,29 +3155,215 @@ class CrowdSenseApp(QMainWindow):
                 self.people_graph_widget.removeItem(self.alert_segment)
                 self.alert_segment = None
         
-        # Always show the full time range from 0 to current time
-        padding = max(current_time_sec * 0.05, 1.0)  # At least 1s padding
+        # Leave the ranges alone while the user is zoomed in
+        if not self.graph_follow:
+            return
+        
+        # Show the full time range from 0 to current time
         if current_time_sec > 0:
             self.people_graph_widget.setXRange(0, current_time_sec + padding)
         
         # Adjust y-axis range with some padding
-        if len(self.people_data) > 0:
-            max_count = max(max(self.people_data), self.crowd_size_threshold if self.crowd_detection_enabled else 1)
-            min_count = min(min(self.people_data), 0)  # Ensure not negative
+        if len(series) > 0:
+            max_count = max(max_count, self.crowd_size_threshold if self.crowd_detection_enabled else 1)
+            min_count = min(min_count, 0)  # Ensure not negative
             y_padding = max((max_count - min_count) * 0.1, 1)  # At least 1 count padding
             self.people_graph_widget.setYRange(
                 max(0, min_count - y_padding),  # Don't go below 0
                 max_count + y_padding
             )
 
+    def on_speed_changed(self, index):
+        """Handle playback speed selection change"""
+        speed = self.speed_combo.itemData(index)
+        if speed is not None:
+            self.video_thread.set_playback_speed(speed)
+            
+            # Real-time playback drops frames detection can't keep up with; "Max" analyses
+            # every frame, so decoding waits for detection instead
+            if speed > 0:
+                self.yolo_thread.set_queue_policy("drop_oldest" if self.yolo_thread.batch_size > 1 else "latest")
+            else:
+                self.yolo_thread.set_queue_policy("block")
+    
+    def on_batch_size_changed(self, index):
+        """Handle detection batch size selection change"""
+        batch_size = self.batch_combo.itemData(index)
+        if batch_size is not None:
+            self.yolo_thread.set_batch_mode(batch_size)
+    
     def on_threshold_changed(self, value):
         """Handle confidence threshold slider change"""
         # Convert slider value (10-90) to threshold (0.1-0.9)
         self.confidence_threshold = value / 100.0
         
-        # Update YOLO thread with new threshold
+        # Update YOLO thread with new threshold; cached detections are filtered with it as they are read
         self.yolo_thread.set_confidence_threshold(self.confidence_threshold)
     
+    def on_detection_stride_changed(self, value):
+        """Handle detection stride slider change"""
+        self.detection_stride = value
+        self.yolo_thread.set_detection_stride(value)
+    
+    def source_setting(self, key):
+        """Get a setting of the current source video"""
+        return self.source_settings.get(self.current_video_path, {}).get(key)
+    
+    def set_source_setting(self, key, value):
+        """Set a setting of the current source video"""
+        if self.current_video_path is not None:
+            self.source_settings.setdefault(self.current_video_path, {})[key] = value
+    
+    def apply_source_settings(self):
+        """Hand the current source's ROI and inference size to the detection thread and controls"""
+        roi = self.source_setting("roi")
+        # Fixed-shape backends only run at the model's default size
+        imgsz = self.source_setting("imgsz") if self.current_backend not in FIXED_SHAPE_BACKENDS else None
+        self.yolo_thread.set_roi(roi)
+        self.yolo_thread.set_imgsz(imgsz)
+        self.clear_roi_button.setEnabled(roi is not None)
+        
+        self.imgsz_combo.blockSignals(True)
+        self.imgsz_combo.setCurrentIndex(list(self.inference_sizes.values()).index(imgsz))
+        self.imgsz_combo.blockSignals(False)
+        self.open_detection_cache()
+    
+    def open_detection_cache(self):
+        """Save the detection cache in use and switch to the one for the current video, model and inference settings"""
+        self.save_detection_cache()
+        cache = None
+        if self.current_video_path is not None:
+            try:
+                cache = DetectionCache.open(self.detection_cache_dir, self.current_video_path, self.model_path,
+                                            self.yolo_thread.imgsz, self.yolo_thread.roi, self.yolo_thread.tiling,
+                                            self.current_backend)
+            except OSError as e:
+                print(f"Detection cache unavailable: {e}")
+        self.yolo_thread.detection_cache = cache
+    
+    def save_detection_cache(self):
+        """Write the detections added to the cache in use to disk"""
+        cache = self.yolo_thread.detection_cache
+        if cache is None:
+            return
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Error saving detection cache: {e}")
+    
+    def on_imgsz_changed(self, index):
+        """Handle inference size selection change"""
+        imgsz = self.imgsz_combo.itemData(index)
+        self.set_source_setting("imgsz", imgsz)
+        self.yolo_thread.set_imgsz(imgsz)
+        self.open_detection_cache()
+    
+    def on_tiling_changed(self, index):
+        """Handle tile size selection change"""
+        self.yolo_thread.set_tiling(self.tiling_for(self.tiling_combo.itemData(index)))
+        self.open_detection_cache()
+    
+    def tiling_for(self, tile_size):
+        """Tiling for a tile size (None for off), one tile per pass on fixed-shape backends"""
+        if not tile_size:
+            return None
+        if self.current_backend in FIXED_SHAPE_BACKENDS:
+            return Tiling(tile_size, max_batch=1)
+        return Tiling(tile_size)
+    
+    def apply_backend_limits(self):
+        """Lock batching and the inference size on backends traced at one input shape, and reopen the cache"""
+        fixed = self.current_backend in FIXED_SHAPE_BACKENDS
+        if fixed:
+            self.batch_combo.setCurrentIndex(0)  # Live
+        note = f"{self.available_backends[self.current_backend]} runs one frame per pass at the model's default size"
+        self.batch_combo.setEnabled(not fixed)
+        self.batch_combo.setToolTip(note if fixed else self.batch_tooltip)
+        self.imgsz_combo.setEnabled(not fixed)
+        self.imgsz_combo.setToolTip(note if fixed else "")
+        
+        self.yolo_thread.set_tiling(self.tiling_for(self.tiling_combo.currentData()))
+        self.apply_source_settings()  # Restores the source's inference size, or the default
+    
+    def start_roi_drawing(self):
+        """Enter ROI drawing mode on the video"""
+        if self.current_frame is None:
+            return
+        self.roi_drawing = True
+        self.roi_points = []
+        self.roi_drag_start = None
+        self.video_label.setCursor(Qt.CursorShape.CrossCursor)
+        self.model_status.setText("Drawing ROI: drag a rectangle, or click polygon points and right-click to finish")
+    
+    def finish_roi_drawing(self, roi):
+        """Leave ROI drawing mode and apply the new region (None keeps the previous one)"""
+        self.roi_drawing = False
+        self.roi_points = []
+        self.video_label.setCursor(Qt.CursorShape.PointingHandCursor)
+        if roi is not None:
+            self.set_source_setting("roi", roi)
+            self.yolo_thread.set_roi(roi)
+            self.clear_roi_button.setEnabled(True)
+            self.open_detection_cache()
+        status = "ROI set" if roi is not None else "ROI drawing cancelled"
+        self.model_status.setText(f"YOLO Model: {self.current_model_key} - {status}")
+        self.show_roi_preview()
+    
+    def clear_roi(self):
+        """Run detection on the full frame again"""
+        self.set_source_setting("roi", None)
+        self.yolo_thread.set_roi(None)
+        self.clear_roi_button.setEnabled(False)
+        self.open_detection_cache()
+    
+    def on_roi_click(self, position, button):
+        """Add a polygon point, finish the polygon, or take a dragged rectangle while drawing an ROI"""
+        point = self.label_to_frame(position)
+        if button == Qt.MouseButton.RightButton:
+            # Right-click closes the polygon
+            self.finish_roi_drawing(RegionOfInterest(self.roi_points) if len(self.roi_points) >= 3 else None)
+            return
+        if point is None:
+            return
+        
+        start = self.label_to_frame(self.roi_drag_start) if self.roi_drag_start is not None else None
+        self.roi_drag_start = None
+        if start is not None and not self.roi_points and abs(start[0] - point[0]) > 8 and abs(start[1] - point[1]) > 8:
+            # A drag draws a rectangle
+            self.finish_roi_drawing(RegionOfInterest([start, point]))
+            return
+        
+        self.roi_points.append(point)
+        self.model_status.setText(f"Drawing ROI: {len(self.roi_points)} points, right-click to finish")
+        self.show_roi_preview()
+    
+    def label_to_frame(self, position):
+        """Map a position on the video label to frame pixel coordinates, or None outside the video"""
+        rect = self.video_label.frame_rect()
+        if self.current_frame is None or rect is None:
+            return None
+        h, w = self.current_frame.shape[:2]
+        offset_x, offset_y, shown_w, shown_h = rect
+        x = (position.x() - offset_x) * w / shown_w
+        y = (position.y() - offset_y) * h / shown_h
+        if x < 0 or y < 0 or x > w or y > h:
+            return None
+        return (x, y)
+    
+    def show_roi_preview(self):
+        """Redraw the last displayed frame with the polygon points drawn so far"""
+        frame = self.displayed_frame if self.displayed_frame is not None else self.current_frame
+        if frame is None:
+            return
+        frame = frame.copy()
+        ratio = frame.shape[1] / self.current_frame.shape[1]  # The displayed frame may be downscaled
+        points = np.round(np.array(self.roi_points, dtype=np.float32).reshape(-1, 2) * ratio).astype(np.int32)
+        if len(points) > 1:
+            cv2.polylines(frame, [points], False, (255, 200, 0), 2)
+        for x, y in points:
+            cv2.circle(frame, (int(x), int(y)), 4, (255, 200, 0), -1)
+        self.display_frame(frame)
+    
     def on_heatmap_toggled(self, enabled):
         """Handle heatmap toggle switch changes"""
         self.heatmap_enabled = enabled
@@ -2303,10 +3381,13 @@ class CrowdSenseApp(QMainWindow):
             
             # Store the updated displayed frame
             self.displayed_frame = display_frame.copy()
-            
-            # Convert to RGB and display
-            rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-            self.display_frame(rgb_frame)
+            self.display_frame(display_frame)
+    
+    def on_smooth_video_toggled(self, enabled):
+        """Switch between showing annotated frames only and the dual-rate display"""
+        self.smooth_video = enabled
+        self.smooth_toggle.setChecked(enabled)
+        self.video_thread.set_overlay_source(self.yolo_thread.annotator if enabled else None)
     
     def on_model_changed(self, index):
         """Handle model selection change"""
@@ -2349,9 +3430,34 @@ class CrowdSenseApp(QMainWindow):
         if self.yolo_thread.running:
             self.yolo_thread.stop()
             
+        self.video_thread.set_output_queue(None)  # Frames go to display only until the model is ready
         self.yolo_thread.set_model_path(self.model_path)
+        self.open_detection_cache()
         self.yolo_thread.start()  # This will trigger loading the new model
     
+    def on_backend_changed(self, index):
+        """Handle inference backend selection change"""
+        backend = self.backend_combo.itemData(index)
+        if not backend or backend == self.current_backend:
+            return
+        
+        self.current_backend = backend
+        self.yolo_ready = False
+        
+        # Update status and start loading (exporting on first use)
+        self.model_status.setText(f"YOLO Model: Loading {self.current_model_key} on {self.available_backends[backend]}...")
+        self.model_progress.setRange(0, 0)  # Indeterminate progress
+        self.model_progress.setVisible(True)
+        
+        # Set new backend and restart YOLO thread if it's running
+        if self.yolo_thread.running:
+            self.yolo_thread.stop()
+        
+        self.video_thread.set_output_queue(None)  # Frames go to display only until the model is ready
+        self.yolo_thread.set_backend(backend)
+        self.apply_backend_limits()
+        self.yolo_thread.start()  # This will trigger loading the model on the new backend
+    
     def download_model(self, model_key):
         """Download the selected model"""
         if self.model_downloading:
@@ -2411,10 +3517,12 @@ class CrowdSenseApp(QMainWindow):
         """Handle model loading completion"""
         if success:
             self.yolo_ready = True
-            self.model_status.setText(f"YOLO Model: {self.current_model_key} loaded successfully")
+            self.video_thread.set_output_queue(self.yolo_thread.frame_queue)  # Decoded frames go straight to detection
+            self.model_status.setText(f"YOLO Model: {self.current_model_key} ({self.available_backends[self.current_backend]}) loaded successfully")
             self.model_progress.setVisible(False)
         else:
             self.yolo_ready = False
+            self.video_thread.set_output_queue(None)
             self.model_status.setText(f"YOLO Model: Loading failed - {message}")
             self.model_progress.setVisible(False)
     
@@ -2444,12 +3552,13 @@ class CrowdSenseApp(QMainWindow):
         
         # Reset video timer
         self.video_time_ms = 0
-        self.last_frame_time = 0
+        self.detection_time_ms = 0
         self.update_timer_display()
         
         # Reset graph data
-        self.people_data.clear()
-        self.time_data.clear()
+        self.count_series.clear()
+        self.occupancy.reset()
+        self.graph_follow = True
         
         # Make sure model is loaded
         if not self.yolo_ready:
@@ -2470,9 +3579,16 @@ class CrowdSenseApp(QMainWindow):
             self.video_label.set_default_content()
             return
 
+        # Restore this source's region of interest and inference size
+        self.current_video_path = file_path
+        self.apply_source_settings()
+        self.start_seek_index(file_path)
+        self.draw_roi_button.setEnabled(True)
+        
         self.heatmap_toggle.setEnabled(True)  # Enable heatmap toggle when video is loaded
         self.crowd_toggle.setEnabled(True)    # Enable crowd detection toggle when video is loaded
         self.export_graph_button.setEnabled(True)  # Enable graph export when video loaded
+        self.sweep_button.setEnabled(True)  # Sweeps read the video's detection cache
 
         # Get video properties
         fps = self.cap.get(cv2.CAP_PROP_FPS)
@@ -2518,12 +3634,13 @@ class CrowdSenseApp(QMainWindow):
             return
         
         # Reset graph data when starting a new video
-        self.people_data.clear()
-        self.time_data.clear()
+        self.count_series.clear()
+        self.occupancy.reset()
+        self.graph_follow = True
         
         # Reset video timer
         self.video_time_ms = 0
-        self.last_frame_time = 0
+        self.detection_time_ms = 0
         self.update_timer_display()
         
         self.restart_button.setEnabled(True)  # Enable restart button when playing
@@ -2564,8 +3681,8 @@ class CrowdSenseApp(QMainWindow):
         
         # Pause YOLO processing and clear its queue
         if hasattr(self, 'yolo_thread') and self.yolo_thread is not None:
-            self.yolo_thread.frame_queue = []
-            self.yolo_thread.processing = False
+            self.yolo_thread.flush()
+            self.save_detection_cache()
         
         # Release video capture with proper exception handling
         if self.cap is not None:
@@ -2583,7 +3700,7 @@ class CrowdSenseApp(QMainWindow):
         
         # Reset video state
         self.paused = False
-        self.current_frame = None
+        self.set_current_frame(None)
         self.displayed_frame = None
         
         # Force UI update
@@ -2594,46 +3711,39 @@ class CrowdSenseApp(QMainWindow):
         
         # Reset people count and smoothing history
         self.people_count = 0
-        self.people_count_history.clear()
+        self.count_smoother.reset()
         self.smoothed_people_count = 0
+        self.unique_visitors = 0
         self.people_count_value.setText("0")
+        self.unique_visitors_value.setText("0")
         
         # Reset video timer
         self.video_time_ms = 0
-        self.last_frame_time = 0
+        self.detection_time_ms = 0
         self.update_timer_display()
         
         # Reset heatmap accumulator
-        self.heatmap_accumulator = None
-        self.aggregate_heatmap_accumulator = None
-        self.aggregate_frame_count = 0
+        self.heatmap.reset()
         
         # Completely clear the graph widget and recreate the plot
         self.people_graph_widget.clear()
         
         # Recreate the plot line for future use
-        self.people_graph = self.people_graph_widget.plot(
-            [], [], 
-            pen=pg.mkPen(color=ACCENT_COLOR, width=3), 
-            symbolBrush=pg.mkBrush(LIGHTER_ACCENT_COLOR),
-            symbolPen=pg.mkPen(LIGHTER_ACCENT_COLOR),
-            symbolSize=4,
-            symbol='o'
-        )
+        self.people_graph = self.create_people_plot()
         
         # Reset data arrays
-        self.people_data = []
-        self.time_data = []
+        self.count_series.clear()
+        self.occupancy.reset()
+        self.graph_follow = True
         
         # Reset peak tracking
-        self.peak_count = 0
-        self.peak_time_ms = 0
-        self.offpeak_count = float('inf')
-        self.offpeak_time_ms = 0
+        self.peak_tracker.reset()
         self.peak_time_value.setText("--:--:--")
         self.peak_count_value.setText("(0 people)")
         self.offpeak_time_value.setText("--:--:--")
         self.offpeak_count_value.setText("(0 people)")
+        self.busiest_hour_value.setText("--:--:--")
+        self.busiest_hour_count_value.setText("(0 people avg)")
         
         # No need to remove markers since we cleared the entire graph widget
         self.peak_marker = None
@@ -2658,6 +3768,7 @@ class CrowdSenseApp(QMainWindow):
         # Also make sure to disable the export buttons
         self.export_heatmap_button.setEnabled(False)
         self.export_graph_button.setEnabled(False)
+        self.sweep_button.setEnabled(False)
 
         # Update button states
         self.play_button.setEnabled(True)
@@ -2678,6 +3789,9 @@ class CrowdSenseApp(QMainWindow):
         # Show end of playback indicator
         self.end_playback_label.setVisible(True)
         
+        # Keep this run's detections for replays
+        self.save_detection_cache()
+        
         # Update button states - disable both play and pause buttons
         self.play_button.setEnabled(False)  # Disable play button at end of video
         self.pause_button.setEnabled(False)
@@ -2697,178 +3811,222 @@ class CrowdSenseApp(QMainWindow):
         
         # Update the display
         self.timer_display.setText(time_str)
-        
-        # Force update of UI
-        QApplication.processEvents()
     
-    def process_video_frame(self, frame):
+    def process_video_frame(self, frame, frame_index=-1, time_ms=0, scaled_frame=None):
         """Process video frame and send to YOLO detection thread"""
+        # Let the video thread decode the next frame
+        self.video_thread.frame_consumed()
+        
         if frame is None:
             return
         
+        # Done with the frame before the timer update below processes events, so nested
+        # calls can't pile up frame references
+        if self.yolo_ready:
+            # The video thread already queued the frame for detection, and the annotated
+            # frame will come back through display_detection_results
+            self.frame_pool.release(frame)
+            
+            # The dual-rate display shows every frame with the latest detections drawn over it
+            if self.smooth_video and scaled_frame is not None and not self.paused:
+                self.display_live_frame(scaled_frame, frame.shape)
+        else:
+            # Keep our reference to the frame for resize events
+            self.set_current_frame(frame)
+            self.displayed_frame = frame
+            
+            # If YOLO is not ready, display the frame without detection
+            self.display_frame(scaled_frame if scaled_frame is not None else frame)
+        
         # Check if the video thread has detected a loop
         if self.video_thread.loop_detected:
             self.video_thread.loop_detected = False  # Reset flag
             
             # Reset timer
             self.video_time_ms = 0
-            self.last_frame_time = time.time()
+            self.detection_time_ms = 0
             self.update_timer_display()
             
             # Reset graph data
-            self.people_data.clear()
-            self.time_data.clear()
+            self.count_series.clear()
+            self.occupancy.reset()
+            self.graph_follow = True
             
             # Reset heatmap accumulator if needed
-            if self.heatmap_enabled and self.heatmap_accumulator is not None:
-                self.heatmap_accumulator = None
+            if self.heatmap_enabled and self.heatmap.accumulator is not None:
+                self.heatmap.reset_live()
         
-        # Update video timer (only if not paused)
+        # Update video timer from the frame's presentation time (only if not paused)
         if not self.paused:
-            current_time = time.time()
-            if self.last_frame_time > 0:
-                elapsed = int((current_time - self.last_frame_time) * 1000)  # ms
-                # Limit elapsed time to reasonable values to avoid jumps during resize
-                if elapsed < 1000:  # Cap at 1 second to prevent huge jumps
-                    self.video_time_ms += elapsed
-            self.last_frame_time = current_time
-            self.update_timer_display()
-        
-        # Store the current frame for resize events
-        self.current_frame = frame.copy()
+            self.video_time_ms = time_ms
+            self.ui_refresh.mark("timer")
+        self.current_frame_index = frame_index
+        self.ui_refresh.mark("scrub")
+    
+    def display_live_frame(self, scaled_frame, source_shape):
+        """Show a display-size frame with the cached heatmap colors and the alert border composited over it"""
+        display_frame = scaled_frame
+        if self.heatmap_enabled and self.heatmap.accumulator is not None and self.heatmap.accumulator_max > 0:
+            h, w = scaled_frame.shape[:2]
+            display_frame = self.heatmap_renderer.render(scaled_frame, self.heatmap.accumulator, self.heatmap.scale,
+                                                         (w, h), source_size=(source_shape[1], source_shape[0]),
+                                                         reuse_colors=True)
         
-        # Convert frame to RGB (from BGR) for display
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.crowd_detection_enabled and self.threshold_alert_active:
+            self.draw_alert(display_frame, display_frame.shape[1] / source_shape[1])
         
-        # Send the frame to YOLO thread for detection if model is loaded
-        if self.yolo_ready:
-            self.yolo_thread.add_frame(frame)
-        else:
-            # If YOLO is not ready, display the frame without detection
-            self.display_frame(rgb_frame)
-            # Make sure to store the displayed frame
-            self.displayed_frame = frame.copy()
+        self.displayed_frame = display_frame
+        self.display_frame(display_frame)
+    
+    def set_current_frame(self, frame):
+        """Make frame the current frame, releasing our reference to the previous one"""
+        previous = self.current_frame
+        self.current_frame = frame
+        if previous is not frame:
+            self.frame_pool.release(previous)
 
     def update_peak_time_display(self):
         """Update peak and off-peak time displays"""
         # Format peak time
-        if self.peak_time_ms > 0:
-            peak_hours = (self.peak_time_ms // 1000) // 3600
-            peak_minutes = ((self.peak_time_ms // 1000) % 3600) // 60
-            peak_seconds = (self.peak_time_ms // 1000) % 60
+        if self.peak_tracker.peak_time_ms > 0:
+            peak_hours = (self.peak_tracker.peak_time_ms // 1000) // 3600
+            peak_minutes = ((self.peak_tracker.peak_time_ms // 1000) % 3600) // 60
+            peak_seconds = (self.peak_tracker.peak_time_ms // 1000) % 60
             peak_time_str = f"{peak_hours:02d}:{peak_minutes:02d}:{peak_seconds:02d}"
             self.peak_time_value.setText(peak_time_str)
-            self.peak_count_value.setText(f"({self.peak_count} people)")  # Added parentheses
+            self.peak_count_value.setText(f"({self.peak_tracker.peak_count} people)")  # Added parentheses
             
             # Update peak marker on graph - removed white border
-            if len(self.time_data) > 0:
-                peak_time_sec = self.peak_time_ms / 1000.0
+            if len(self.count_series) > 0:
+                peak_time_sec = self.peak_tracker.peak_time_ms / 1000.0
                 if self.peak_marker is None:
                     # Create marker if it doesn't exist - removed symbolPen parameter
                     self.peak_marker = self.people_graph_widget.plot(
-                        [peak_time_sec], [self.peak_count],
+                        [peak_time_sec], [self.peak_tracker.peak_count],
                         pen=None, symbol='o', symbolSize=10,
                         symbolBrush='#FF5555'  # Pure red with no border
                     )
                 else:
                     # Update existing marker
-                    self.peak_marker.setData([peak_time_sec], [self.peak_count])
+                    self.peak_marker.setData([peak_time_sec], [self.peak_tracker.peak_count])
         
         # Format off-peak time
-        if self.offpeak_time_ms > 0 and self.offpeak_count < float('inf'):
-            offpeak_hours = (self.offpeak_time_ms // 1000) // 3600
-            offpeak_minutes = ((self.offpeak_time_ms // 1000) % 3600) // 60
-            offpeak_seconds = (self.offpeak_time_ms // 1000) % 60
+        if self.peak_tracker.offpeak_time_ms > 0 and self.peak_tracker.offpeak_count < float('inf'):
+            offpeak_hours = (self.peak_tracker.offpeak_time_ms // 1000) // 3600
+            offpeak_minutes = ((self.peak_tracker.offpeak_time_ms // 1000) % 3600) // 60
+            offpeak_seconds = (self.peak_tracker.offpeak_time_ms // 1000) % 60
             offpeak_time_str = f"{offpeak_hours:02d}:{offpeak_minutes:02d}:{offpeak_seconds:02d}"
             self.offpeak_time_value.setText(offpeak_time_str)
-            self.offpeak_count_value.setText(f"({self.offpeak_count} people)")  # Added parentheses
+            self.offpeak_count_value.setText(f"({self.peak_tracker.offpeak_count} people)")  # Added parentheses
             
             # Update off-peak marker on graph - removed white border
-            if len(self.time_data) > 0:
-                offpeak_time_sec = self.offpeak_time_ms / 1000.0
+            if len(self.count_series) > 0:
+                offpeak_time_sec = self.peak_tracker.offpeak_time_ms / 1000.0
                 if self.offpeak_marker is None:
                     # Create marker if it doesn't exist - removed symbolPen parameter
                     self.offpeak_marker = self.people_graph_widget.plot(
-                        [offpeak_time_sec], [self.offpeak_count],
+                        [offpeak_time_sec], [self.peak_tracker.offpeak_count],
                         pen=None, symbol='o', symbolSize=10,
                         symbolBrush='#5599FF'  # Pure blue with no border
                     )
                 else:
                     # Update existing marker
-                    self.offpeak_marker.setData([offpeak_time_sec], [self.offpeak_count])
+                    self.offpeak_marker.setData([offpeak_time_sec], [self.peak_tracker.offpeak_count])
 
-    def display_detection_results(self, processed_frame, people_count, boxes):
+    def update_busiest_hour_display(self):
+        """Show the hour with the highest mean count over the last week"""
+        busiest = self.occupancy.busiest("hour")
+        if busiest is None:
+            return
+        start_sec, mean_count = busiest
+        hours = int(start_sec) // 3600
+        self.busiest_hour_value.setText(f"{hours:02d}:00:00")
+        self.busiest_hour_count_value.setText(f"({mean_count:.1f} people avg)")
+
+    def update_count_display(self):
+        """Show the smoothed people count and unique visitors"""
+        self.people_count_value.setText(str(self.smoothed_people_count))
+        self.unique_visitors_value.setText(str(self.unique_visitors))
+    
+    def display_detection_results(self, processed_frame, people_count, boxes, frame_index=-1, time_ms=None,
+                                  unique_visitors=0, scaled_frame=None):
         """Display processed frame with detections, heatmap, and update people count"""
+        # Let the annotation stage emit the next result
+        self.yolo_thread.result_consumed()
+        
         if processed_frame is None:
             return
         
+        # Remember which source frame these detections belong to
+        self.last_detection_frame_index = frame_index
+        self.detection_time_ms = self.video_time_ms if time_ms is None else time_ms
+        
         # Store the last detected boxes for use when toggling heatmap while paused
         self.last_detected_boxes = boxes.copy()
         
-        # Add current count to history for smoothing
-        self.people_count_history.append(people_count)
-        
-        # Calculate smoothed people count (moving average)
-        if len(self.people_count_history) > 0:
-            self.smoothed_people_count = round(np.mean(self.people_count_history))
-        else:
-            self.smoothed_people_count = people_count
+        # Add current count to history and calculate smoothed people count (moving average)
+        self.smoothed_people_count = self.count_smoother.add(people_count)
         
         # Update people count display with smoothed value
         self.people_count = self.smoothed_people_count
-        self.people_count_value.setText(str(self.smoothed_people_count))
+        self.unique_visitors = unique_visitors
+        self.ui_refresh.mark("counts")
         
         # Check for threshold crossing if crowd detection is enabled
         if self.crowd_detection_enabled:
             self.check_threshold_crossing(processed_frame)
         
         # Update the people count graph with smoothed value
-        self.update_people_graph(self.smoothed_people_count)
+        self.update_people_graph(self.smoothed_people_count, self.detection_time_ms)
 
         # Track peak and off-peak
-        if self.smoothed_people_count > self.peak_count:
-            self.peak_count = self.smoothed_people_count
-            self.peak_time_ms = self.video_time_ms
-            self.update_peak_time_display()
-            
-        if self.smoothed_people_count < self.offpeak_count and self.smoothed_people_count > 0:
-            # Only track non-zero off-peak to avoid counting before people appear
-            self.offpeak_count = self.smoothed_people_count
-            self.offpeak_time_ms = self.video_time_ms
-            self.update_peak_time_display()
+        if self.peak_tracker.update(self.smoothed_people_count, self.detection_time_ms):
+            self.ui_refresh.mark("peaks")
         
-        # Store the original frame
-        self.current_frame = processed_frame.copy()
+        # Keep the detection stage's reference to the frame as the current frame
+        self.set_current_frame(processed_frame)
         
         # Process the frame with or without heatmap
-        display_frame = self.process_frame_with_heatmap(processed_frame, boxes)
+        display_frame = self.process_frame_with_heatmap(processed_frame, boxes, scaled_frame)
+        
+        # The dual-rate display shows these detections over the next frames from the video thread
+        if self.smooth_video and not self.paused:
+            return
         
         # Add threshold alert visualization if active
         if self.crowd_detection_enabled and self.threshold_alert_active:
-            # Add red border to indicate alert
-            h, w = display_frame.shape[:2]
-            # Top border
-            display_frame[0:8, 0:w] = [0, 0, 200]
-            # Bottom border
-            display_frame[h-8:h, 0:w] = [0, 0, 200]
-            # Left border
-            display_frame[0:h, 0:8] = [0, 0, 200]
-            # Right border
-            display_frame[0:h, w-8:w] = [0, 0, 200]
+            if display_frame is processed_frame:
+                display_frame = processed_frame.copy()  # Keep the alert off the current frame
             
-            # Add alert text
-            alert_text = f"ALERT! {self.smoothed_people_count} people (threshold: {self.crowd_size_threshold})"
-            cv2.putText(display_frame, alert_text, (20, 40), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+            # Border and text are sized for the source frame; the frame may already be at display size
+            self.draw_alert(display_frame, display_frame.shape[1] / processed_frame.shape[1])
         
-        # Store the final displayed frame (with heatmap if enabled)
-        self.displayed_frame = display_frame.copy()
-        
-        # Convert to RGB for display
-        rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+        # Store the final displayed frame (with heatmap if enabled); it is replaced before
+        # the heatmap renderer reuses its buffer
+        self.displayed_frame = display_frame
         
         # Display the processed frame
-        self.display_frame(rgb_frame)
+        self.display_frame(display_frame)
+    
+    def draw_alert(self, display_frame, ratio):
+        """Draw the crowd alert border and text, sized for the source frame shown at ratio of its size"""
+        h, w = display_frame.shape[:2]
+        border = max(2, int(round(8 * ratio)))
+        
+        # Add red border to indicate alert
+        # Top border
+        display_frame[0:border, 0:w] = [0, 0, 200]
+        # Bottom border
+        display_frame[h-border:h, 0:w] = [0, 0, 200]
+        # Left border
+        display_frame[0:h, 0:border] = [0, 0, 200]
+        # Right border
+        display_frame[0:h, w-border:w] = [0, 0, 200]
+        
+        # Add alert text
+        alert_text = f"ALERT! {self.smoothed_people_count} people (threshold: {self.crowd_size_threshold})"
+        cv2.putText(display_frame, alert_text, (int(20 * ratio), int(40 * ratio)), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9 * ratio, (0, 0, 255), max(1, int(round(2 * ratio))))
 
     def check_threshold_crossing(self, frame):
         """Check if people count exceeds threshold using the smoothed value"""
@@ -2882,48 +4040,19 @@ class CrowdSenseApp(QMainWindow):
             if self.threshold_alert_active:
                 self.update_crowd_alert_status(False)
     
-    def display_frame(self, rgb_frame):
-        """Display a video frame"""
-        if rgb_frame is None:
+    def display_frame(self, frame):
+        """Display a BGR video frame, scaling it down to the label here only if no worker already did"""
+        if frame is None:
             return
         
-        # Convert to QImage and then to QPixmap
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        
-        # Get the current size of the video label
-        label_size = self.video_label.size()
-        
-        # Scale the pixmap to fit the label size while preserving aspect ratio
-        pixmap = QPixmap.fromImage(qt_image)
-        scaled_pixmap = pixmap.scaled(label_size, 
-                                    Qt.AspectRatioMode.KeepAspectRatio, 
-                                    Qt.TransformationMode.SmoothTransformation)
-        
-        # Hide the content layout widgets before showing video
-        for i in range(self.video_label.content_layout.count()):
-            item = self.video_label.content_layout.itemAt(i)
-            if item and item.widget():
-                item.widget().setVisible(False)
-        
-        # Display the frame
-        self.video_label.setPixmap(scaled_pixmap)
-        self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.video_label.show_frame(resize_for_display(frame, self.video_label.display_bounds))
     
     def resizeEvent(self, event):
         """Handle window resize events without affecting video playback"""
         super().resizeEvent(event)
         
-        # Always update the display when resizing, even when paused
-        if self.displayed_frame is not None:
-            # Convert to RGB for display
-            rgb_frame = cv2.cvtColor(self.displayed_frame, cv2.COLOR_BGR2RGB)
-            self.display_frame(rgb_frame)
-        elif self.current_frame is not None:
-            # Convert to RGB for display
-            rgb_frame = cv2.cvtColor(self.current_frame, cv2.COLOR_BGR2RGB)
-            self.display_frame(rgb_frame)
+        # The video label repaints its last frame at the new size by itself, and frames
+        # from the workers arrive scaled to the new size
     
     def closeEvent(self, event):
         """Handle application close event"""
@@ -2934,6 +4063,11 @@ class CrowdSenseApp(QMainWindow):
         # Stop the YOLO thread
         if self.yolo_thread.running:
             self.yolo_thread.stop()
+        self.save_detection_cache()
+        
+        # Let background indexing finish writing its cache file
+        for thread in list(self.seek_index_threads):
+            thread.wait()
         
         # Release video capture
         if self.cap is not None and self.cap.isOpened():
@@ -2957,8 +4091,8 @@ class CrowdSenseApp(QMainWindow):
     def export_count_graph(self):
         """Export the people count graph as an image"""
         # Check if we have graph data
-        if len(self.time_data) == 0 or len(self.people_data) == 0:
-            self.show_export_error_message("No graph data available yet.")
+        if len(self.count_series) == 0:
+            self.show_export_error_message("No graph data available yet.", text="Error exporting graph")
             return
         
         # Ask the user to select an output directory
@@ -2984,8 +4118,10 @@ class CrowdSenseApp(QMainWindow):
         ax = fig.add_subplot(111)
         
         # Plot the data with styling
-        ax.plot(list(self.time_data), list(self.people_data), 
-                marker='o', markersize=4, linewidth=2, color=ACCENT_COLOR)
+        end_sec = self.count_series.times[-1]
+        times, values, _, _, resolution = self.people_graph_data(0, end_sec, 2000)
+        ax.plot(times, values, 
+                marker='o' if resolution is None else None, markersize=4, linewidth=2, color=ACCENT_COLOR)
         
         # Style the plot
         ax.set_facecolor('#2D2D30')  # Match app background
@@ -3023,7 +4159,7 @@ class CrowdSenseApp(QMainWindow):
     def export_heatmap(self):
         """Export the aggregate heatmap directly after selecting a directory"""
         # First, check if we have aggregate heatmap data
-        if self.aggregate_heatmap_accumulator is None or self.aggregate_frame_count <= 0:
+        if self.heatmap.aggregate_accumulator is None or self.heatmap.aggregate_frame_count <= 0:
             self.show_export_error_message("No heatmap data available yet. Play a video with heatmap enabled first.")
             return
         
@@ -3039,30 +4175,10 @@ class CrowdSenseApp(QMainWindow):
         # Create the output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Create a normalized version of the aggregate heatmap
-        normalized_aggregate = self.aggregate_heatmap_accumulator.copy()
-        
-        # Normalize by the number of frames that contributed to it
-        if self.aggregate_frame_count > 0:
-            normalized_aggregate /= self.aggregate_frame_count
-        
-        # Scale up to original frame size
-        h, w = self.current_frame.shape[:2] if self.current_frame is not None else (720, 1280)
-        heatmap = cv2.resize(normalized_aggregate, (w, h), interpolation=cv2.INTER_LINEAR)
-        
-        # Apply additional blur for smoother visualization
-        heatmap = cv2.GaussianBlur(heatmap, (15, 15), 0)
-        
-        # Convert to colormap
-        heatmap_8bit = (heatmap * 255).astype(np.uint8)
-        heatmap_colored = cv2.applyColorMap(heatmap_8bit, cv2.COLORMAP_JET)
-        
-        # Create a background frame for the heatmap
-        if self.current_frame is not None:
-            background = cv2.addWeighted(self.current_frame, 0.4, np.zeros_like(self.current_frame), 0.6, 0)
-            result = cv2.addWeighted(heatmap_colored, 0.7, background, 0.3, 0)
-        else:
-            result = heatmap_colored
+        # Render the normalized aggregate heatmap over a darkened copy of the current frame
+        result = render_aggregate_heatmap(self.heatmap.aggregate_accumulator,
+                                          self.heatmap.aggregate_frame_count,
+                                          background=self.current_frame)
         
         # Save the result
         timestamp = time.strftime("%Y%m%d-%H%M%S")
@@ -3103,20 +4219,47 @@ class CrowdSenseApp(QMainWindow):
             msg.setStandardButtons(QMessageBox.StandardButton.Ok)
             msg.exec()
 
-    def show_export_error_message(self, error_msg):
-        """Show error message for heatmap export"""
+    def show_threshold_sweep(self):
+        """Recompute counts, peaks and alerts at confidence thresholds 0.1 to 0.9 from the cached detections"""
+        cache = self.yolo_thread.detection_cache
+        if cache is None:
+            self.show_export_error_message("No detection cache for this video.", "Threshold Sweep",
+                                           "Cannot sweep confidence thresholds")
+            return
+        
+        self.save_detection_cache()
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap is not None and self.cap.isOpened() else 0
+        sweep = threshold_sweep(cache, np.round(np.arange(0.1, 0.95, 0.1), 1), self.count_smoother.window_size,
+                                fps if fps > 0 else 30.0, self.crowd_size_threshold)
+        if len(sweep["frames"]) == 0:
+            self.show_export_error_message("No detections cached yet. Play the video first.", "Threshold Sweep",
+                                           "Cannot sweep confidence thresholds")
+            return
+        
+        dialog = ThresholdSweepDialog(sweep, self.crowd_size_threshold, self.confidence_threshold, self)
+        dialog.threshold_selected.connect(lambda threshold: self.threshold_slider.setValue(int(round(threshold * 100))))
+        dialog.exec()
+    
+    def show_export_error_message(self, error_msg, title="Export Error", text="Error exporting heatmap"):
+        """Show an error message, by default for heatmap export"""
         from PyQt6.QtWidgets import QMessageBox
         
         msg = QMessageBox(self)
         msg.setIcon(QMessageBox.Icon.Warning)
-        msg.setWindowTitle("Export Error")
-        msg.setText("Error exporting heatmap")
+        msg.setWindowTitle(title)
+        msg.setText(text)
         msg.setInformativeText(error_msg)
         msg.setStandardButtons(QMessageBox.StandardButton.Ok)
         msg.exec()
 
 
 def main():
+    # Headless analysis bypasses the GUI entirely
+    if len(sys.argv) > 1 and sys.argv[1] == "analyze":
+        sys.exit(analyze_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "quantize":
+        sys.exit(quantize_main(sys.argv[2:]))
+    
     app = QApplication(sys.argv)
     app.setFont(QFont("Arial", 10))
     window = CrowdSenseApp()
@@ -0,0 +1,2628 @@
+#!/usr/bin/env python3
+"""Qt-free detection, smoothing, peak tracking and heatmap logic shared by the
+CrowdSense GUI and the headless analyzer."""
+
+import sys
+import os
+import json
+import time
+import argparse
+import hashlib
+import io
+import threading
+import math
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from collections import deque
+
+# Import YOLO from ultralytics
+from ultralytics import YOLO
+
+
+MAX_DETECTIONS = 300  # Most people NMS keeps per image (frame or tile)
+
+
+def people_from_result(result, confidence_threshold):
+    """Extract the person boxes and confidences above the threshold from one YOLO result
+
+    This is the one place model output becomes (boxes, confidences): both
+    columns are copied to NumPy in one step and thresholded with a mask, and
+    boxes are truncated to integer (x1, y1, x2, y2) tuples.
+    """
+    boxes = result.boxes.cpu().numpy()
+    confidences = boxes.conf.astype(np.float64)
+    keep = confidences > confidence_threshold
+    return [tuple(box) for box in boxes.xyxy[keep].astype(np.int32).tolist()], confidences[keep].tolist()
+
+
+def predict_people(model, images, confidence_threshold, **predict_kwargs):
+    """Run the model on images and return (boxes, confidences) per image
+
+    The threshold and MAX_DETECTIONS go into the model call, so NMS drops the
+    boxes below the threshold instead of ranking them.
+    """
+    predict_kwargs.setdefault("max_det", MAX_DETECTIONS)
+    results = model(images, classes=0, conf=confidence_threshold, **predict_kwargs)  # Class 0 is 'person' in COCO dataset
+    return [people_from_result(result, confidence_threshold) for result in results]
+
+
+def filter_detections(boxes, confidences, confidence_threshold):
+    """Keep the boxes whose confidence is above the threshold, e.g. from detections made at a lower floor"""
+    kept = [(box, confidence) for box, confidence in zip(boxes, confidences) if confidence > confidence_threshold]
+    return [box for box, _ in kept], [confidence for _, confidence in kept]
+
+
+def detect_people(model, frame, confidence_threshold, roi=None, tiling=None, **predict_kwargs):
+    """Run person detection on a frame and return the boxes and confidences above the threshold"""
+    return detect_people_batch(model, [frame], confidence_threshold, roi, tiling, **predict_kwargs)[0]
+
+
+def detect_people_batch(model, frames, confidence_threshold, roi=None, tiling=None, **predict_kwargs):
+    """Run person detection on several frames in one forward pass, returning (boxes, confidences) per frame
+
+    With a RegionOfInterest the model only sees the region's crop of each frame,
+    and boxes come back in full-frame coordinates. With a Tiling the frames (or
+    crops) are sliced into tiles that are batched and merged. Pass imgsz to
+    change the inference resolution.
+    """
+    if roi is not None:
+        frame_shapes = [frame.shape for frame in frames]
+        frames = [roi.crop(frame) for frame in frames]
+
+    if tiling is not None:
+        detections = tiling.detect(model, frames, confidence_threshold, **predict_kwargs)
+    else:
+        detections = predict_people(model, frames, confidence_threshold, **predict_kwargs)
+
+    if roi is not None:
+        detections = [roi.map_boxes(shape, boxes, confidences)
+                      for shape, (boxes, confidences) in zip(frame_shapes, detections)]
+    return detections
+
+
+class RegionOfInterest:
+    """Rectangle or polygon of the frame that inference is restricted to
+
+    Frames are cropped to the region's bounding rectangle before inference and
+    the boxes are shifted back into full-frame coordinates. For polygons, only
+    people whose feet (bottom-center of the box) are inside the polygon count.
+    """
+
+    def __init__(self, points):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(points) == 2:
+            # Two corners describe a rectangle
+            (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+            points = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+        if len(points) < 3:
+            raise ValueError("A region of interest needs two corners or at least three polygon points")
+
+        self.points = points
+        low, high = points.min(axis=0), points.max(axis=0)
+        self.x0, self.y0 = (int(v) for v in np.floor(low))
+        self.x1, self.y1 = (int(v) for v in np.ceil(high))
+
+        # Axis-aligned rectangles need no point-in-polygon test
+        self.is_rectangle = bool(len(points) == 4 and np.isin(points[:, 0], [low[0], high[0]]).all() and
+                                 np.isin(points[:, 1], [low[1], high[1]]).all())
+
+    @classmethod
+    def parse(cls, text):
+        """Parse ``x1,y1,x2,y2`` (rectangle) or ``x,y;x,y;x,y[;...]`` (polygon) in frame pixels"""
+        if ";" in text:
+            points = [[float(v) for v in point.split(",")] for point in text.split(";") if point.strip()]
+        else:
+            values = [float(v) for v in text.split(",")]
+            if len(values) != 4:
+                raise ValueError(f"Expected x1,y1,x2,y2 for a rectangle, got: {text}")
+            points = [values[:2], values[2:]]
+        return cls(points)
+
+    def bounds(self, frame_shape):
+        """Bounding rectangle (x0, y0, x1, y1) clipped to the frame"""
+        h, w = frame_shape[:2]
+        x0, y0 = min(max(self.x0, 0), w - 1), min(max(self.y0, 0), h - 1)
+        return x0, y0, max(min(self.x1, w), x0 + 1), max(min(self.y1, h), y0 + 1)
+
+    def crop(self, frame):
+        """View of the frame inside the bounding rectangle, without copying"""
+        x0, y0, x1, y1 = self.bounds(frame.shape)
+        return frame[y0:y1, x0:x1]
+
+    def contains(self, xs, ys):
+        """Vectorized even-odd test of which points lie inside the polygon"""
+        inside = np.zeros(len(xs), dtype=bool)
+        px, py = self.points[:, 0], self.points[:, 1]
+        for i in range(len(self.points)):
+            j = i - 1
+            crosses = (py[i] > ys) != (py[j] > ys)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_cross = (px[j] - px[i]) * (ys - py[i]) / (py[j] - py[i]) + px[i]
+            inside ^= crosses & (xs < x_cross)
+        return inside
+
+    def map_boxes(self, frame_shape, boxes, confidences):
+        """Shift boxes detected on the crop back to the frame, dropping people outside a polygon"""
+        x0, y0, _, _ = self.bounds(frame_shape)
+        boxes = [(x1 + x0, y1 + y0, x2 + x0, y2 + y0) for x1, y1, x2, y2 in boxes]
+        if self.is_rectangle or not boxes:
+            return boxes, confidences
+
+        feet = np.array([((x1 + x2) / 2, y2) for x1, _, x2, y2 in boxes], dtype=np.float32)
+        inside = self.contains(feet[:, 0], feet[:, 1])
+        return ([box for box, keep in zip(boxes, inside) if keep],
+                [confidence for confidence, keep in zip(confidences, inside) if keep])
+
+    def draw(self, frame, color=(255, 200, 0), thickness=2, scale=1.0):
+        """Outline the region on a frame, scaling coordinates for a resized frame"""
+        cv2.polylines(frame, [np.round(self.points * scale).astype(np.int32)], True, color, thickness)
+
+
+class Tiling:
+    """Sliced inference: cut frames into overlapping tiles, detect on all tiles in batches and merge with NMS
+
+    Distant people that shrink to a few pixels when a 4K frame is downscaled
+    to the model input stay at full resolution inside a tile. A downscaled
+    full-frame pass is added by default so people larger than a tile are
+    still found whole; duplicates across seams are removed by NMS.
+    """
+
+    def __init__(self, tile_size=640, overlap=0.2, max_batch=16, full_frame=True,
+                 nms_threshold=0.6, nms_metric="ios"):
+        self.tile_size = tile_size
+        self.overlap = overlap  # Fraction of the tile shared with its neighbour
+        self.max_batch = max_batch  # Tiles per forward pass
+        self.full_frame = full_frame
+        self.nms_threshold = nms_threshold
+        self.nms_metric = nms_metric  # Intersection over the smaller box also merges partial boxes cut by a seam
+        self.tile_cache = {}  # Frame shape -> tile rectangles
+
+    def tiles(self, frame_shape):
+        """Tile rectangles (x0, y0, x1, y1) covering a frame, the last row and column flush with its edges"""
+        key = frame_shape[:2]
+        if key not in self.tile_cache:
+            h, w = key
+            step = max(1, int(self.tile_size * (1 - self.overlap)))
+
+            def starts(length):
+                if length <= self.tile_size:
+                    return [0]
+                return list(range(0, length - self.tile_size, step)) + [length - self.tile_size]
+
+            self.tile_cache[key] = [(x0, y0, min(x0 + self.tile_size, w), min(y0 + self.tile_size, h))
+                                    for y0 in starts(h) for x0 in starts(w)]
+        return self.tile_cache[key]
+
+    def detect(self, model, frames, confidence_threshold, **predict_kwargs):
+        """Run tiled detection on frames, returning (boxes, confidences) per frame in frame coordinates"""
+        # Flatten every frame's tiles (views, not copies) into one work list
+        crops = []
+        owners = []  # (frame index, x offset, y offset) per crop
+        for frame_index, frame in enumerate(frames):
+            tiles = self.tiles(frame.shape)
+            for x0, y0, x1, y1 in tiles:
+                crops.append(frame[y0:y1, x0:x1])
+                owners.append((frame_index, x0, y0))
+            if self.full_frame and len(tiles) > 1:
+                crops.append(frame)
+                owners.append((frame_index, 0, 0))
+
+        # Tiles are inferred at their own resolution unless told otherwise
+        predict_kwargs.setdefault("imgsz", self.tile_size)
+        frame_boxes = [[] for _ in frames]
+        frame_confidences = [[] for _ in frames]
+        for start in range(0, len(crops), self.max_batch):
+            results = predict_people(model, crops[start:start + self.max_batch], confidence_threshold, **predict_kwargs)
+            for (frame_index, x0, y0), (boxes, confidences) in zip(owners[start:start + self.max_batch], results):
+                frame_boxes[frame_index].extend((x1 + x0, y1 + y0, x2 + x0, y2 + y0) for x1, y1, x2, y2 in boxes)
+                frame_confidences[frame_index].extend(confidences)
+
+        # Merge duplicates along the seams
+        detections = []
+        for boxes, confidences in zip(frame_boxes, frame_confidences):
+            keep = non_max_suppression(boxes, confidences, self.nms_threshold, self.nms_metric)
+            detections.append(([boxes[i] for i in keep], [confidences[i] for i in keep]))
+        return detections
+
+
+class BoxPropagator:
+    """Carry detection boxes across frames that skip inference using sparse optical flow
+
+    A few points inside each box are tracked with pyramidal Lucas-Kanade on a
+    downscaled grayscale frame, and each box moves by the median displacement
+    of its points.
+    """
+
+    def __init__(self, max_width=640, grid=3):
+        self.max_width = max_width  # Track on a downscaled frame no wider than this
+        self.grid = grid  # grid x grid points per box
+        self.previous_gray = None
+        self.boxes = []
+        self.confidences = []
+
+    def prepare(self, frame):
+        """Downscaled grayscale copy of a frame and its scale relative to the original"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.max_width / w)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return gray, scale
+
+    def reset(self, frame, boxes, confidences):
+        """Start propagating from freshly detected boxes"""
+        self.previous_gray, self.scale = self.prepare(frame)
+        self.boxes = [tuple(float(v) for v in box) for box in boxes]
+        self.confidences = list(confidences)
+
+    def propagate(self, frame):
+        """Move the last boxes to this frame and return (boxes, confidences)"""
+        if self.previous_gray is None:
+            return [], []
+
+        gray, scale = self.prepare(frame)
+        if len(self.boxes) == 0 or gray.shape != self.previous_gray.shape:
+            self.previous_gray, self.scale = gray, scale
+            return [tuple(int(round(v)) for v in box) for box in self.boxes], list(self.confidences)
+
+        # Grid of points over the central half of every box, in downscaled coordinates
+        box_array = np.asarray(self.boxes, dtype=np.float32) * scale
+        offsets = (np.arange(self.grid, dtype=np.float32) + 0.5) / self.grid * 0.5 + 0.25
+        fx, fy = np.meshgrid(offsets, offsets)
+        widths = (box_array[:, 2] - box_array[:, 0])[:, None]
+        heights = (box_array[:, 3] - box_array[:, 1])[:, None]
+        xs = box_array[:, 0:1] + widths * fx.ravel()[None, :]
+        ys = box_array[:, 1:2] + heights * fy.ravel()[None, :]
+        points = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2).astype(np.float32)
+
+        # Track all points of all boxes in one call
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, points, None,
+                                                         winSize=(15, 15), maxLevel=2)
+
+        # Median displacement per box over the points that were tracked; boxes with none stay put
+        per_box = self.grid * self.grid
+        displacement = (new_points - points).reshape(-1, per_box, 2)
+        valid = status.reshape(-1, per_box).astype(bool)
+        tracked = valid.any(axis=1)
+        displacement[~valid] = np.nan
+        shift = np.zeros((len(self.boxes), 2), dtype=np.float32)
+        shift[tracked] = np.nanmedian(displacement[tracked], axis=1) / scale
+
+        # Keep sub-pixel positions between frames so rounding doesn't accumulate
+        moved = np.asarray(self.boxes, dtype=np.float32)
+        moved[:, [0, 2]] += shift[:, 0:1]
+        moved[:, [1, 3]] += shift[:, 1:2]
+
+        self.previous_gray, self.scale = gray, scale
+        self.boxes = [tuple(box) for box in moved.tolist()]
+        return [tuple(int(round(v)) for v in box) for box in self.boxes], list(self.confidences)
+
+
+class StridedDetector:
+    """Run the model on every stride-th frame and propagate boxes with optical flow in between"""
+
+    def __init__(self, stride=1):
+        self.stride = max(1, int(stride))
+        self.propagator = BoxPropagator()
+        self.frames_since_detection = None  # None until the first detection
+
+    def reset(self):
+        """Force a fresh detection on the next frame"""
+        self.frames_since_detection = None
+
+    def detect_batch(self, model, frames, confidence_threshold, frame_indices=None, cache=None, **predict_kwargs):
+        """Return (boxes, confidences, detected) per frame, running one forward pass for the frames that need it
+
+        With a DetectionCache and the frames' indices, frames the cache holds take
+        their detections from it instead of the model, and the others are run at
+        the cache's floor and added to it; the threshold is applied afterwards.
+        """
+        cached = [None] * len(frames)
+        model_threshold = confidence_threshold
+        if cache is not None and frame_indices is not None:
+            cached = [cache.get(frame_index) for frame_index in frame_indices]
+            model_threshold = min(confidence_threshold, cache.FLOOR)
+        needs_detection = self.plan(len(frames), [detections is not None for detections in cached])
+
+        detect_frames = [frame for frame, detect, hit in zip(frames, needs_detection, cached) if detect and hit is None]
+        inferred = iter(detect_people_batch(model, detect_frames, model_threshold, **predict_kwargs)
+                        if detect_frames else [])
+        detections = []
+        for index, (detect, hit) in enumerate(zip(needs_detection, cached)):
+            if not detect:
+                continue
+            if hit is None:
+                hit = next(inferred)
+                if cache is not None and frame_indices is not None:
+                    cache.put(frame_indices[index], *hit)
+            detections.append(filter_detections(*hit, confidence_threshold))
+        return self.resolve(frames, needs_detection, detections)
+
+    def plan(self, frame_count, available=None):
+        """Decide which of the next frame_count frames get a full detection
+
+        Frames flagged in available already have detections to hand (e.g. cached)
+        and always count as detected, restarting the stride.
+        """
+        needs_detection = []
+        count = self.frames_since_detection
+        for index in range(frame_count):
+            detect = count is None or count + 1 >= self.stride or (available is not None and available[index])
+            needs_detection.append(detect)
+            count = 0 if detect else count + 1
+        self.frames_since_detection = count
+        return needs_detection
+
+    def resolve(self, frames, needs_detection, detections):
+        """Merge the detections of the planned frames with propagated boxes for the others"""
+        detections = iter(detections)
+
+        # Walk the frames in order so propagated frames follow the detection before them
+        results = []
+        for frame, detect in zip(frames, needs_detection):
+            if detect or self.stride == 1:
+                boxes, confidences = next(detections)
+                if self.stride > 1:
+                    self.propagator.reset(frame, boxes, confidences)
+            else:
+                boxes, confidences = self.propagator.propagate(frame)
+            results.append((boxes, confidences, detect))
+        return results
+
+
+def overlapping_pairs(boxes_a, boxes_b):
+    """Index arrays (a, b) of the intersecting box pairs, found with a sweep over sorted x1"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.empty(0, np.intp), np.empty(0, np.intp)
+    a_x1, a_y1, a_x2, a_y2 = boxes_a.T.copy()  # Contiguous columns gather much faster
+    b_x1, b_y1, b_x2, b_y2 = boxes_b.T.copy()
+
+    # A box b can only overlap a if b.x1 lies in (a.x1 - widest b, a.x2)
+    order = np.argsort(b_x1, kind="stable")
+    sorted_x1 = b_x1[order]
+    start = np.searchsorted(sorted_x1, a_x1 - (b_x2 - b_x1).max(), side="right")
+    end = np.searchsorted(sorted_x1, a_x2, side="left")
+    counts = np.maximum(end - start, 0)
+
+    # Expand each a's range of candidates into flat pair arrays
+    index_a = np.repeat(np.arange(len(boxes_a)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    index_b = order[np.repeat(start, counts) + offsets]
+
+    # Keep the candidates that really intersect
+    overlap = (b_x2[index_b] > a_x1[index_a]) & (b_y1[index_b] < a_y2[index_a]) & (b_y2[index_b] > a_y1[index_a])
+    return index_a[overlap], index_b[overlap]
+
+
+def pair_intersection(boxes_a, boxes_b):
+    """Element-wise intersection areas and box areas of two equally long (N, 4) arrays of x1, y1, x2, y2 boxes"""
+    inter_w = np.minimum(boxes_a[:, 2], boxes_b[:, 2]) - np.maximum(boxes_a[:, 0], boxes_b[:, 0])
+    inter_h = np.minimum(boxes_a[:, 3], boxes_b[:, 3]) - np.maximum(boxes_a[:, 1], boxes_b[:, 1])
+    intersection = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection, area_a, area_b
+
+
+def pair_iou(boxes_a, boxes_b):
+    """Element-wise IoU between two equally long (N, 4) arrays of boxes"""
+    intersection, area_a, area_b = pair_intersection(boxes_a, boxes_b)
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-6)
+
+
+def pair_ios(boxes_a, boxes_b):
+    """Element-wise intersection over the smaller box between two equally long (N, 4) arrays of boxes"""
+    intersection, area_a, area_b = pair_intersection(boxes_a, boxes_b)
+    return intersection / np.maximum(np.minimum(area_a, area_b), 1e-6)
+
+
+def match_pairs(index_a, index_b, scores, rounds=3):
+    """Greedy mutual-best matching over scored candidate pairs, returning matched (a, b) index arrays"""
+    if len(index_a) == 0:
+        return np.empty(0, np.intp), np.empty(0, np.intp)
+
+    order = np.argsort(-scores, kind="stable")
+    index_a = index_a[order]
+    index_b = index_b[order]
+    best_a = np.empty(index_a.max() + 1, np.intp)
+    best_b = np.empty(index_b.max() + 1, np.intp)
+    matched_a = []
+    matched_b = []
+    for _ in range(rounds):  # Later rounds pick up pairs whose best partner was taken
+        if len(index_a) == 0:
+            break
+
+        # With pairs sorted by score, the first pair of each index is its best one. Writing positions
+        # in reverse leaves the first one in place since the last write to a repeated index wins.
+        positions = np.arange(len(index_a))
+        best_a[index_a[::-1]] = positions[::-1]
+        best_b[index_b[::-1]] = positions[::-1]
+        mutual = (best_a[index_a] == positions) & (best_b[index_b] == positions)
+
+        matched_a.append(index_a[mutual])
+        matched_b.append(index_b[mutual])
+        taken_a = np.zeros(len(best_a), bool)
+        taken_a[index_a[mutual]] = True
+        taken_b = np.zeros(len(best_b), bool)
+        taken_b[index_b[mutual]] = True
+        remaining = ~(taken_a[index_a] | taken_b[index_b])
+        index_a = index_a[remaining]
+        index_b = index_b[remaining]
+
+    return np.concatenate(matched_a), np.concatenate(matched_b)
+
+
+def non_max_suppression(boxes, scores, threshold=0.5, metric="iou"):
+    """Greedy non-maximum suppression, returning the indices of the kept boxes, best first
+
+    metric is "iou" or "ios" (intersection over the smaller box). Only the
+    intersecting pairs are scored, so frames with thousands of boxes stay cheap.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order]
+
+    # Overlapping pairs, each once with the higher-scoring box first
+    index_a, index_b = overlapping_pairs(boxes, boxes)
+    once = index_a < index_b
+    index_a, index_b = index_a[once], index_b[once]
+    overlap = pair_iou(boxes[index_a], boxes[index_b]) if metric == "iou" else pair_ios(boxes[index_a], boxes[index_b])
+    index_a, index_b = index_a[overlap > threshold], index_b[overlap > threshold]
+
+    # Walk the boxes with overlapping neighbours best first; a kept box suppresses its neighbours
+    grouping = np.argsort(index_a, kind="stable")
+    index_a, index_b = index_a[grouping], index_b[grouping]
+    # (plain lists, since this loop touches one small neighbour list at a time)
+    bounds = np.searchsorted(index_a, np.arange(len(boxes) + 1)).tolist()
+    neighbours = index_b.tolist()
+    suppressed = [False] * len(boxes)
+    for i in np.unique(index_a).tolist():
+        if not suppressed[i]:
+            for j in neighbours[bounds[i]:bounds[i + 1]]:
+                suppressed[j] = True
+    return order[~np.array(suppressed, dtype=bool)]
+
+
+class PersonTracker:
+    """SORT/ByteTrack-style tracker giving people persistent IDs across frames
+
+    Track state lives in parallel NumPy arrays, one row per track. Boxes are
+    predicted with a constant velocity, high-confidence detections are matched
+    first and low-confidence ones are then used to keep unmatched tracks alive.
+    Tracks get an ID once they have been seen min_hits times, so IDs double as
+    a running count of unique visitors.
+    """
+
+    def __init__(self, iou_threshold=0.3, high_confidence=0.5, min_hits=3, max_age=30, trail_length=32):
+        self.iou_threshold = iou_threshold
+        self.high_confidence = high_confidence  # Only detections above this start new tracks
+        self.min_hits = min_hits  # Matches needed before a track gets an ID
+        self.max_age = max_age  # Frames a confirmed track survives without a match
+        self.trail_length = trail_length  # Foot points kept per track
+        self.reset()
+
+    def reset(self):
+        """Drop all tracks and restart the ID counter"""
+        self.boxes = np.empty((0, 4), np.float32)
+        self.velocities = np.empty((0, 4), np.float32)
+        self.ids = np.empty(0, np.int64)  # 0 while the track is tentative
+        self.hits = np.empty(0, np.int32)
+        self.misses = np.empty(0, np.int32)
+        self.trails = np.empty((0, self.trail_length, 2), np.float32)  # Ring buffers of foot points
+        self.trail_counts = np.empty(0, np.int64)
+        self.next_id = 1
+
+    @property
+    def unique_count(self):
+        """Number of people confirmed as tracks so far"""
+        return self.next_id - 1
+
+    @property
+    def active_count(self):
+        """Number of confirmed tracks matched on the latest frame"""
+        return int(np.count_nonzero((self.ids > 0) & (self.misses == 0)))
+
+    def update(self, boxes, confidences):
+        """Associate one frame's detections with the tracks, returning the track ID per detection (0 if tentative)"""
+        detections = np.asarray(boxes, np.float32).reshape(-1, 4)
+        confidences = np.asarray(confidences, np.float32).reshape(-1)
+
+        # Predict where every track moved since the last frame
+        previous_boxes = self.boxes
+        self.boxes = previous_boxes + self.velocities
+
+        # Associate high-confidence detections first, then give low-confidence ones to the leftover tracks
+        detection_tracks = np.full(len(detections), -1, np.intp)
+        track_free = np.ones(len(self.boxes), bool)
+        high = confidences >= self.high_confidence
+        for detection_mask in (high, ~high):
+            detection_rows = np.flatnonzero(detection_mask)
+            track_rows = np.flatnonzero(track_free)
+            if len(detection_rows) == 0 or len(track_rows) == 0:
+                continue
+            # Score only the pairs that can overlap, so cost grows with neighbours rather than tracks x detections
+            track_index, detection_index = overlapping_pairs(self.boxes[track_rows], detections[detection_rows])
+            iou = pair_iou(self.boxes[track_rows[track_index]], detections[detection_rows[detection_index]])
+            above = iou > self.iou_threshold
+            track_index, detection_index = match_pairs(track_index[above], detection_index[above], iou[above])
+            detection_tracks[detection_rows[detection_index]] = track_rows[track_index]
+            track_free[track_rows[track_index]] = False
+
+        # Update matched tracks, smoothing the velocity towards the observed motion
+        matched = detection_tracks >= 0
+        rows = detection_tracks[matched]
+        matched_boxes = detections[matched]
+        self.velocities[rows] = 0.5 * self.velocities[rows] + 0.5 * (matched_boxes - previous_boxes[rows])
+        self.boxes[rows] = matched_boxes
+        self.hits[rows] += 1
+        self.misses += 1
+        self.misses[rows] = 0
+        self.append_trail_points(rows, matched_boxes)
+
+        # Start tentative tracks from unmatched high-confidence detections
+        new_detections = np.flatnonzero(~matched & high)
+        if len(new_detections) > 0:
+            start = len(self.boxes)
+            count = len(new_detections)
+            self.boxes = np.concatenate([self.boxes, detections[new_detections]])
+            self.velocities = np.concatenate([self.velocities, np.zeros((count, 4), np.float32)])
+            self.ids = np.concatenate([self.ids, np.zeros(count, np.int64)])
+            self.hits = np.concatenate([self.hits, np.ones(count, np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(count, np.int32)])
+            self.trails = np.concatenate([self.trails, np.zeros((count, self.trail_length, 2), np.float32)])
+            self.trail_counts = np.concatenate([self.trail_counts, np.zeros(count, np.int64)])
+            new_rows = np.arange(start, start + count)
+            detection_tracks[new_detections] = new_rows
+            self.append_trail_points(new_rows, detections[new_detections])
+
+        # Confirm tracks that have been seen often enough
+        confirmed = np.flatnonzero((self.ids == 0) & (self.hits >= self.min_hits))
+        self.ids[confirmed] = np.arange(self.next_id, self.next_id + len(confirmed))
+        self.next_id += len(confirmed)
+
+        track_ids = np.zeros(len(detections), np.int64)
+        has_track = detection_tracks >= 0
+        track_ids[has_track] = self.ids[detection_tracks[has_track]]
+
+        # Drop tentative tracks that missed a frame and confirmed tracks that have been lost too long
+        keep = (self.misses == 0) | ((self.ids > 0) & (self.misses <= self.max_age))
+        if not keep.all():
+            self.boxes = self.boxes[keep]
+            self.velocities = self.velocities[keep]
+            self.ids = self.ids[keep]
+            self.hits = self.hits[keep]
+            self.misses = self.misses[keep]
+            self.trails = self.trails[keep]
+            self.trail_counts = self.trail_counts[keep]
+
+        return track_ids
+
+    def append_trail_points(self, rows, boxes):
+        """Append the bottom-center point of each box to its track's trail"""
+        slots = self.trail_counts[rows] % self.trail_length
+        self.trails[rows, slots, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        self.trails[rows, slots, 1] = boxes[:, 3]
+        self.trail_counts[rows] += 1
+
+    def trajectories(self, max_misses=0):
+        """Return (track ID, points) for confirmed tracks seen within max_misses frames, oldest point first"""
+        result = []
+        for row in np.flatnonzero((self.ids > 0) & (self.misses <= max_misses)):
+            count = self.trail_counts[row]
+            if count <= self.trail_length:
+                points = self.trails[row, :count]
+            else:
+                points = np.roll(self.trails[row], -(count % self.trail_length), axis=0)
+            result.append((int(self.ids[row]), points))
+        return result
+
+
+class DetectionOverlay:
+    """Snapshot of one frame's detections that can be drawn over any later frame at any scale
+
+    The annotation stage draws it on the frame it was detected on, and the
+    dual-rate display draws the latest snapshot over every raw frame at display size.
+    """
+
+    def __init__(self, boxes, confidences, track_ids, trails=(), roi=None):
+        self.boxes = boxes
+        self.confidences = confidences
+        self.track_ids = track_ids
+        self.trails = trails  # Points of each confirmed track's recent path, owned by the snapshot
+        self.roi = roi
+
+    def draw(self, frame, scale=1.0):
+        """Draw the region of interest, trails and labelled boxes, scaling coordinates by scale"""
+        thickness = max(1, int(round(2 * scale)))
+
+        # Outline the region detection is restricted to
+        if self.roi is not None:
+            self.roi.draw(frame, thickness=thickness, scale=scale)
+
+        # Each confirmed track's recent path
+        for points in self.trails:
+            cv2.polylines(frame, [(points * scale).astype(np.int32)], False, (0, 160, 0), 1)
+
+        color = (0, 255, 0)  # Green for people
+        for box, confidence, track_id in zip(self.boxes, self.confidences, self.track_ids):
+            x1, y1, x2, y2 = (int(v * scale) for v in box)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+
+            # Track ID (once confirmed) and confidence text
+            text = f"#{track_id} {confidence:.2f}" if track_id > 0 else f"{confidence:.2f}"
+            cv2.putText(frame, text, (x1, y1 - max(1, int(5 * scale))),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5 * scale, color, thickness)
+
+
+class BoundedQueue:
+    """Thread-safe bounded queue between pipeline stages, with a backpressure policy for when it is full
+
+    - "block": put waits until the consumer makes room, pacing the producer
+    - "drop_oldest": put discards the oldest queued item
+    - "latest": put replaces whatever is queued, so only the newest item ever waits
+
+    Consumers sleep in get until an item arrives, so idle stages use no CPU.
+    close() wakes every waiting producer and consumer for shutdown. on_drop is
+    called with every item the queue discards, e.g. to return pooled frames.
+    """
+
+    POLICIES = ("block", "drop_oldest", "latest")
+
+    def __init__(self, maxsize=2, policy="drop_oldest", on_drop=None):
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0  # Items discarded by the drop_oldest and latest policies
+        self.on_drop = on_drop
+        self.configure(maxsize, policy)
+
+    def configure(self, maxsize, policy):
+        """Change the capacity and the backpressure policy"""
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        with self.condition:
+            self.maxsize = max(1, int(maxsize))
+            self.policy = policy
+            self.condition.notify_all()
+
+    def put(self, item):
+        """Queue an item according to the policy, returning False if the queue was closed"""
+        with self.condition:
+            if self.policy == "latest":
+                self.dropped += len(self.items)
+                self.discard_all()
+            elif self.policy == "drop_oldest":
+                while len(self.items) >= self.maxsize:
+                    self.discard(self.items.popleft())
+                    self.dropped += 1
+            else:
+                self.condition.wait_for(lambda: len(self.items) < self.maxsize or self.closed)
+
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+
+    def get(self, max_items=1, fill_timeout=0.0):
+        """Wait for an item, then take up to max_items, waiting at most fill_timeout seconds for more
+
+        Returns an empty list once the queue is closed.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed)
+            if fill_timeout > 0 and max_items > 1:
+                self.condition.wait_for(lambda: len(self.items) >= max_items or self.closed, fill_timeout)
+            if self.closed:
+                return []
+
+            batch = [self.items.popleft() for _ in range(min(max_items, len(self.items)))]
+            self.condition.notify_all()  # Room for blocked producers
+            return batch
+
+    def discard(self, item):
+        """Hand an item the queue is dropping to on_drop"""
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    def discard_all(self):
+        """Drop every queued item, caller holds the condition"""
+        while self.items:
+            self.discard(self.items.popleft())
+
+    def clear(self):
+        """Drop everything queued, e.g. when playback restarts"""
+        with self.condition:
+            self.discard_all()
+            self.condition.notify_all()
+
+    def close(self):
+        """Release every waiting producer and consumer; later puts are refused"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def reopen(self):
+        """Accept items again after close()"""
+        with self.condition:
+            self.closed = False
+            self.discard_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+
+class FramePool:
+    """Reference-counted pool of preallocated frame buffers shared by the pipeline stages
+
+    The decoder reads straight into a buffer from acquire() and every stage that
+    keeps the frame takes a reference with retain(), so frames move between threads
+    without copies. The last release() returns the buffer to the pool. Arrays that
+    did not come from the pool are ignored by retain() and release().
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity  # Free buffers kept around for reuse
+        self.shape = None
+        self.free = []
+        self.refcounts = {}  # id(buffer) -> [buffer, references held], keeping the id in use
+        self.allocated = 0  # Buffers created since the frame size last changed
+        self.lock = threading.Lock()
+
+    def acquire(self, shape):
+        """Return a uint8 buffer of the given shape holding one reference"""
+        shape = tuple(shape)
+        with self.lock:
+            if shape != self.shape:
+                # New frame size: buffers still in use are dropped when released
+                self.shape = shape
+                self.free = []
+                self.allocated = 0
+
+            if self.free:
+                buffer = self.free.pop()
+            else:
+                # Nothing free, e.g. more frames in flight than expected
+                buffer = np.empty(shape, dtype=np.uint8)
+                self.allocated += 1
+            self.refcounts[id(buffer)] = [buffer, 1]
+            return buffer
+
+    def retain(self, buffer):
+        """Take another reference to a pooled buffer"""
+        with self.lock:
+            entry = self.refcounts.get(id(buffer))
+            if entry is not None:
+                entry[1] += 1
+        return buffer
+
+    def release(self, buffer):
+        """Drop a reference, returning the buffer to the pool once nothing holds it"""
+        if buffer is None:
+            return
+        with self.lock:
+            entry = self.refcounts.get(id(buffer))
+            if entry is None:
+                return
+            if entry[1] > 1:
+                entry[1] -= 1
+                return
+
+            del self.refcounts[id(buffer)]
+            if buffer.shape == self.shape and len(self.free) < self.capacity:
+                self.free.append(buffer)
+
+
+class ReadAheadDecoder:
+    """Decodes a capture on its own thread, keeping up to depth frames ready ahead of the consumer
+
+    keep(frame_index, time_ms) says whether a frame will be used; frames it
+    rejects are only grabbed, skipping retrieve() and its conversion to BGR.
+    Kept frames are retrieved into buffers from frame_pool when one is given,
+    and read() hands the consumer that reference. The decoder owns the capture
+    between start() and stop().
+    """
+
+    def __init__(self, cap, depth=8, frame_pool=None, start_frame=0, end_frame=None, keep=None):
+        self.cap = cap
+        self.frame_pool = frame_pool
+        self.next_frame_index = start_frame  # Index of the next frame cap returns
+        self.end_frame = end_frame  # Stop before this frame (None decodes to the end)
+        self.keep = keep  # None keeps every frame
+        self.queue = BoundedQueue(depth, "block", on_drop=self.release_item)
+        self.thread = None
+        self.ended = False
+        self.skipped = 0  # Frames grabbed without being retrieved
+
+    def release_item(self, item):
+        """Return the frame of a queued item to the pool"""
+        if item is not None and self.frame_pool is not None:
+            self.frame_pool.release(item[0])
+
+    def start(self):
+        """Start decoding in the background"""
+        self.queue.reopen()
+        self.ended = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop decoding and drop the frames still queued, returning the capture to the caller"""
+        self.queue.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.queue.clear()
+
+    def read(self):
+        """Wait for the next kept frame, returning (frame, frame index, time ms), or None at the end or once stopped"""
+        if self.ended:
+            return None
+        items = self.queue.get()
+        if not items or items[0] is None:
+            self.ended = True
+            return None
+        return items[0]
+
+    def run(self):
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+        while self.end_frame is None or self.next_frame_index < self.end_frame:
+            if not self.cap.grab():
+                break
+            frame_index = self.next_frame_index
+            self.next_frame_index += 1
+            time_ms = frame_time_ms(self.cap, frame_index, fps)
+            if self.keep is not None and not self.keep(frame_index, time_ms):
+                self.skipped += 1
+                continue
+
+            # Convert straight into a pooled buffer
+            buffer = self.frame_pool.acquire(shape) if self.frame_pool is not None else None
+            ret, frame = self.cap.retrieve(image=buffer) if buffer is not None else self.cap.retrieve()
+            if buffer is not None and frame is not buffer:
+                # The reported frame size was wrong, so OpenCV allocated its own array
+                self.frame_pool.release(buffer)
+            if not ret:
+                self.release_item((frame, frame_index, time_ms))
+                break
+            if not self.queue.put((frame, frame_index, time_ms)):
+                self.release_item((frame, frame_index, time_ms))
+                return  # Stopped
+        self.queue.put(None)  # End of the video
+
+
+class GrowableSeries:
+    """Append-only (time, value) series in NumPy arrays that double their capacity when full
+
+    The running minimum and maximum are kept as values arrive, so axis ranges never
+    rescan the data, and times/values are views that plot without conversion. With
+    max_size set, the oldest half of the points is dropped whenever the series
+    reaches it, bounding memory for always-on sources.
+    """
+
+    def __init__(self, capacity=1024, max_size=None):
+        self.max_size = max_size
+        self.time_buffer = np.empty(capacity, dtype=np.float64)
+        self.value_buffer = np.empty(capacity, dtype=np.float64)
+        self.clear()
+
+    def clear(self):
+        """Drop all points, keeping the allocated capacity"""
+        self.size = 0
+        self.dropped = 0  # Points discarded from the front to stay under max_size
+        self.min = math.inf
+        self.max = -math.inf
+
+    def append(self, time_value, value):
+        """Add a point, growing the buffers geometrically so appends stay amortised O(1)"""
+        if self.max_size is not None and self.size >= self.max_size:
+            self.drop_oldest(self.size // 2)
+        if self.size == len(self.time_buffer):
+            capacity = 2 * len(self.time_buffer)
+            if self.max_size is not None:
+                capacity = min(capacity, self.max_size)
+            self.time_buffer = np.resize(self.time_buffer, capacity)
+            self.value_buffer = np.resize(self.value_buffer, capacity)
+
+        self.time_buffer[self.size] = time_value
+        self.value_buffer[self.size] = value
+        self.size += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def drop_oldest(self, count):
+        """Discard the first count points, rescanning the survivors for the minimum and maximum"""
+        keep = self.size - count
+        # Fresh buffers, since the plot may still hold views of the old ones
+        time_buffer = np.empty_like(self.time_buffer)
+        value_buffer = np.empty_like(self.value_buffer)
+        time_buffer[:keep] = self.time_buffer[count:self.size]
+        value_buffer[:keep] = self.value_buffer[count:self.size]
+        self.time_buffer = time_buffer
+        self.value_buffer = value_buffer
+        self.size = keep
+        self.dropped += count
+        self.min = float(self.values.min()) if keep else math.inf
+        self.max = float(self.values.max()) if keep else -math.inf
+
+    @property
+    def times(self):
+        return self.time_buffer[:self.size]
+
+    @property
+    def values(self):
+        return self.value_buffer[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+class QuantileSketch:
+    """Mergeable streaming quantiles with bounded relative error, as in DDSketch
+
+    Values are counted in bins whose bounds grow geometrically by gamma, so every
+    quantile is within relative_accuracy of the true value and the number of bins
+    only grows with the logarithm of the value range. Zero, an empty scene, has a
+    bin of its own.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.reset()
+
+    def reset(self):
+        """Forget every value"""
+        self.bins = {}  # Bin index -> values counted in it
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        """Count a value; counts are never negative, so anything not above zero goes in the zero bin"""
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        """Add the values counted by another sketch with the same accuracy"""
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1), or return nan when nothing was counted"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                break
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+class RollupLevel:
+    """Round-robin buffer of fixed-width time buckets with the mean, min, max and p95 of the values in each
+
+    Only the open bucket keeps a quantile sketch; closed buckets are five floats
+    each, so memory is fixed by capacity however long the source runs. Once the
+    buffer is full every new bucket overwrites the oldest one.
+    """
+
+    FIELDS = ("starts", "means", "mins", "maxs", "p95s")
+
+    def __init__(self, name, seconds, capacity, relative_accuracy=0.01):
+        self.name = name
+        self.seconds = seconds  # Bucket width
+        self.capacity = capacity
+        for field in self.FIELDS:
+            setattr(self, field, np.zeros(capacity, dtype=np.float64))
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.reset()
+
+    def reset(self):
+        """Drop every bucket"""
+        self.head = 0  # Slot the next closed bucket goes into
+        self.size = 0  # Closed buckets held
+        self.reset_open(None)
+
+    def reset_open(self, start):
+        """Start a new open bucket at start (seconds)"""
+        self.open_start = start
+        self.open_count = 0
+        self.open_sum = 0.0
+        self.open_min = math.inf
+        self.open_max = -math.inf
+        self.sketch.reset()
+
+    def add(self, time_s, value):
+        """Fold a value into the bucket holding time_s; values from before the open bucket go into it"""
+        start = math.floor(time_s / self.seconds) * self.seconds
+        if self.open_start is None:
+            self.open_start = start
+        elif start > self.open_start:
+            self.close()
+            self.reset_open(start)
+
+        self.open_count += 1
+        self.open_sum += value
+        self.open_min = min(self.open_min, value)
+        self.open_max = max(self.open_max, value)
+        self.sketch.add(value)
+
+    def close(self):
+        """Write the open bucket's aggregates into the ring"""
+        slot = self.head
+        self.starts[slot] = self.open_start
+        self.means[slot] = self.open_sum / self.open_count
+        self.mins[slot] = self.open_min
+        self.maxs[slot] = self.open_max
+        self.p95s[slot] = self.sketch.quantile(0.95)
+        self.head = (slot + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def holds(self, time_s):
+        """Whether no bucket at or after time_s has been overwritten yet"""
+        if self.size < self.capacity:
+            return True
+        return self.starts[self.head] <= time_s  # The oldest bucket sits where the next one goes
+
+    def buckets(self, start_s=-math.inf, end_s=math.inf):
+        """Return a dict of bucket arrays (FIELDS), oldest first, for the buckets overlapping [start_s, end_s]
+
+        The open bucket is included with its aggregates so far.
+        """
+        order = (np.arange(self.size) + self.head - self.size) % self.capacity
+        columns = {field: getattr(self, field)[order] for field in self.FIELDS}
+        if self.open_count > 0:
+            open_values = (self.open_start, self.open_sum / self.open_count, self.open_min, self.open_max,
+                           self.sketch.quantile(0.95))
+            for field, value in zip(self.FIELDS, open_values):
+                columns[field] = np.append(columns[field], value)
+
+        first, last = np.searchsorted(columns["starts"], [start_s - self.seconds, end_s], side="right")
+        return {field: column[first:last] for field, column in columns.items()}
+
+
+class OccupancyRollups:
+    """Per-second, per-minute and per-hour rollups of the smoothed count for always-on sources
+
+    Each resolution is a RollupLevel of bounded size (by default two hours of
+    seconds, a week of minutes and five weeks of hours), so questions such as the
+    busiest hour this week are answered from a few hundred numbers instead of
+    every raw count.
+    """
+
+    RESOLUTIONS = (("second", 1, 2 * 3600), ("minute", 60, 7 * 24 * 60), ("hour", 3600, 5 * 7 * 24))
+
+    def __init__(self, resolutions=RESOLUTIONS, relative_accuracy=0.01):
+        self.levels = [RollupLevel(name, seconds, capacity, relative_accuracy)
+                       for name, seconds, capacity in resolutions]
+        self.latest_s = None
+
+    def reset(self):
+        """Drop every bucket at every resolution"""
+        for level in self.levels:
+            level.reset()
+        self.latest_s = None
+
+    def add(self, time_s, value):
+        """Fold a smoothed count at time_s (seconds) into every resolution"""
+        for level in self.levels:
+            level.add(time_s, value)
+        self.latest_s = time_s if self.latest_s is None else max(self.latest_s, time_s)
+
+    def level(self, name):
+        """Return the RollupLevel called name"""
+        for level in self.levels:
+            if level.name == name:
+                return level
+        raise ValueError(f"Unknown rollup resolution: {name}")
+
+    def busiest(self, name="hour", window_s=7 * 24 * 3600):
+        """Return (start_s, mean) of the bucket with the highest mean within window_s of the latest count, or None"""
+        if self.latest_s is None:
+            return None
+        buckets = self.level(name).buckets(self.latest_s - window_s)
+        if len(buckets["means"]) == 0:
+            return None
+        index = int(np.argmax(buckets["means"]))
+        return float(buckets["starts"][index]), float(buckets["means"][index])
+
+    def level_for_view(self, start_s, end_s, max_points):
+        """Return the finest level still holding start_s with at most max_points buckets in [start_s, end_s]"""
+        for level in self.levels:
+            if (end_s - start_s) / level.seconds <= max_points and level.holds(start_s):
+                return level
+        return self.levels[-1]
+
+
+class CountSmoother:
+    """Moving average over the most recent per-frame people counts"""
+
+    def __init__(self, window_size=24):
+        self.window_size = window_size
+        self.history = deque(maxlen=window_size)
+        self.value = 0
+
+    def add(self, count):
+        """Add a raw count and return the new smoothed count"""
+        self.history.append(count)
+        self.value = int(round(np.mean(self.history)))
+        return self.value
+
+    def set_window_size(self, window_size):
+        """Change the window size, keeping the most recent history"""
+        current_history = list(self.history)
+        self.window_size = window_size
+        self.history = deque(current_history[-window_size:], maxlen=window_size)
+        if len(self.history) > 0:
+            self.value = int(round(np.mean(self.history)))
+
+    def reset(self):
+        """Clear the history"""
+        self.history.clear()
+        self.value = 0
+
+
+class PeakTracker:
+    """Track the peak and the non-zero off-peak smoothed counts with their video times"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the recorded peak and off-peak"""
+        self.peak_count = 0
+        self.peak_time_ms = 0
+        self.offpeak_count = float('inf')  # Start with infinity so any count will be lower
+        self.offpeak_time_ms = 0
+
+    def update(self, count, time_ms):
+        """Record a smoothed count, returning True if the peak or off-peak changed"""
+        changed = False
+
+        if count > self.peak_count:
+            self.peak_count = count
+            self.peak_time_ms = time_ms
+            changed = True
+
+        # Only track non-zero off-peak to avoid counting before people appear
+        if count < self.offpeak_count and count > 0:
+            self.offpeak_count = count
+            self.offpeak_time_ms = time_ms
+            changed = True
+
+        return changed
+
+
+class HeatmapAccumulator:
+    """Low-resolution decaying heatmap plus an aggregate heatmap with no decay
+
+    All foot points of a frame are stamped at once with a precomputed kernel, and
+    only the region around them is blurred. Decay is applied lazily: the live
+    heatmap is ``accumulator * scale``, so a frame only touches the cells near
+    detected people instead of rescaling the whole accumulator.
+    """
+
+    # Three Gaussian passes (7, 17 and 31 px kernels) collapse into one pass whose
+    # sigma is the root sum of squares of the passes' sigmas
+    BLUR_SIGMA = float(np.sqrt(sum((0.3 * ((k - 1) * 0.5 - 1) + 0.8) ** 2 for k in (7, 17, 31))))
+    BLUR_RADIUS = int(np.ceil(3 * BLUR_SIGMA))
+
+    # Fold the global scale back into the accumulator before float32 precision suffers
+    MIN_SCALE = 1e-4
+
+    def __init__(self, decay=0.99, intensity=0.6, scale_factor=0.2, neighbor_radius=4):
+        self.decay = decay
+        self.intensity = intensity
+        self.scale_factor = scale_factor
+        self.neighbor_radius = neighbor_radius
+        self.build_kernel()
+        self.reset()
+
+    def build_kernel(self):
+        """Precompute the stamp offsets and intensities for one foot point"""
+        radius = self.neighbor_radius
+        dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        dist = np.sqrt(dx ** 2 + dy ** 2)
+        inside = dist <= radius
+
+        # Center gets 1.0, neighbors fall off linearly to 0.3 at the radius
+        values = 1.0 - (dist / radius) * 0.7 if radius > 0 else np.ones_like(dist)
+        self.kernel_dy = dy[inside].astype(np.int32)
+        self.kernel_dx = dx[inside].astype(np.int32)
+        self.kernel_values = values[inside].astype(np.float32)
+
+    def reset(self):
+        """Drop both accumulators"""
+        self.reset_live()
+        self.aggregate_accumulator = None  # Aggregate heatmap with no decay
+        self.aggregate_frame_count = 0  # Track how many frames contributed to aggregate
+
+    def reset_live(self):
+        """Drop the decaying heatmap but keep the aggregate"""
+        self.accumulator = None  # Live heatmap is accumulator * scale
+        self.scale = 1.0
+        self.accumulator_max = 0.0
+        self.last_points = None  # Foot points of the last stamped frame
+        self.last_stamp = None  # (y0, y1, x0, x1, normalized blurred stamp) for those points
+
+    def merge_aggregate(self, aggregate_accumulator, aggregate_frame_count):
+        """Add an aggregate heatmap computed elsewhere, e.g. by a worker analyzing another segment"""
+        if aggregate_accumulator is None:
+            return
+        if self.aggregate_accumulator is None or self.aggregate_accumulator.shape != aggregate_accumulator.shape:
+            self.aggregate_accumulator = np.zeros_like(aggregate_accumulator)
+            self.aggregate_frame_count = 0
+        self.aggregate_accumulator += aggregate_accumulator
+        self.aggregate_frame_count += aggregate_frame_count
+
+    def update(self, frame_shape, boxes):
+        """Add people positions to the heatmap and return the low-resolution live heatmap"""
+        self.accumulate(frame_shape, boxes)
+        return self.heatmap()
+
+    def accumulate(self, frame_shape, boxes):
+        """Add people positions to the heatmap without materializing the live heatmap"""
+        h, w = frame_shape[:2]
+        low_h, low_w = int(h * self.scale_factor), int(w * self.scale_factor)
+
+        # Check if the frame resolution has changed
+        if self.aggregate_accumulator is not None and self.aggregate_accumulator.shape != (low_h, low_w):
+            self.reset()
+
+        # Initialize accumulators if they don't exist
+        if self.accumulator is None:
+            self.accumulator = np.zeros((low_h, low_w), dtype=np.float32)
+            self.scale = 1.0
+            self.accumulator_max = 0.0
+        if self.aggregate_accumulator is None:
+            self.aggregate_accumulator = np.zeros((low_h, low_w), dtype=np.float32)
+
+        # Apply decay to the global scale (only the live heatmap, not the aggregate)
+        self.scale *= self.decay
+
+        stamp = self.stamp_points(boxes, low_h, low_w)
+        if stamp is not None:
+            y0, y1, x0, x1, current_heatmap = stamp
+
+            # Add current heatmap to accumulator with appropriate intensity, compensating for the lazy scale
+            region = self.accumulator[y0:y1, x0:x1]
+            region += current_heatmap * (self.intensity / self.scale)
+            self.accumulator_max = max(self.accumulator_max, float(region.max()))
+
+            # Add to aggregate heatmap accumulator without decay
+            self.aggregate_accumulator[y0:y1, x0:x1] += current_heatmap
+            self.aggregate_frame_count += 1
+
+        # Cap the maximum value to prevent overflow
+        if self.accumulator_max * self.scale > 1.0:
+            self.scale = 1.0 / self.accumulator_max
+
+        # Fold the scale into the accumulator once it gets small
+        if self.scale < self.MIN_SCALE:
+            self.accumulator *= self.scale
+            self.accumulator_max *= self.scale
+            self.scale = 1.0
+
+    def stamp_points(self, boxes, low_h, low_w):
+        """Stamp and blur the foot points of all boxes, returning (y0, y1, x0, x1, heatmap) or None"""
+        if len(boxes) == 0:
+            return None
+
+        # Use bottom center of bounding box (feet position), scaled down to low resolution
+        box_array = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        foot_x = ((box_array[:, 0] + box_array[:, 2]) / 2 * self.scale_factor).astype(np.int32)
+        foot_y = (box_array[:, 3] * self.scale_factor).astype(np.int32)
+
+        # Ensure coordinates are within frame
+        inside = (foot_x >= 0) & (foot_x < low_w) & (foot_y >= 0) & (foot_y < low_h)
+        foot_x, foot_y = foot_x[inside], foot_y[inside]
+        if len(foot_x) == 0:
+            return None
+
+        # Reuse the previous stamp when nobody moved at this resolution
+        points = np.unique(foot_y * low_w + foot_x)
+        if self.last_stamp is not None and self.last_points is not None and np.array_equal(points, self.last_points):
+            return self.last_stamp
+
+        # Region around the points that the stamp and blur can reach
+        pad = self.neighbor_radius + self.BLUR_RADIUS
+        y0, y1 = max(0, int(foot_y.min()) - pad), min(low_h, int(foot_y.max()) + pad + 1)
+        x0, x1 = max(0, int(foot_x.min()) - pad), min(low_w, int(foot_x.max()) + pad + 1)
+        roi_h, roi_w = y1 - y0, x1 - x0
+
+        # Stamp the kernel at every foot point at once, keeping the strongest value where stamps overlap
+        ys = (foot_y - y0)[:, None] + self.kernel_dy[None, :]
+        xs = (foot_x - x0)[:, None] + self.kernel_dx[None, :]
+        values = np.broadcast_to(self.kernel_values, ys.shape)
+        valid = (ys >= 0) & (ys < roi_h) & (xs >= 0) & (xs < roi_w)
+        current_heatmap = np.zeros(roi_h * roi_w, dtype=np.float32)
+        np.maximum.at(current_heatmap, ys[valid] * roi_w + xs[valid], values[valid])
+        current_heatmap = current_heatmap.reshape(roi_h, roi_w)
+
+        # One Gaussian pass equivalent to the original three, limited to the region
+        ksize = 2 * self.BLUR_RADIUS + 1
+        current_heatmap = cv2.GaussianBlur(current_heatmap, (ksize, ksize), self.BLUR_SIGMA)
+
+        # Normalize the current heatmap
+        max_val = current_heatmap.max()
+        if max_val <= 0:
+            return None
+        current_heatmap /= max_val
+
+        self.last_points = points
+        self.last_stamp = (y0, y1, x0, x1, current_heatmap)
+        return self.last_stamp
+
+    def heatmap(self, out=None):
+        """Materialize the live heatmap (accumulator * scale), optionally into a preallocated array"""
+        if self.accumulator is None:
+            return None
+        if out is None:
+            return self.accumulator * np.float32(self.scale)
+        np.multiply(self.accumulator, np.float32(self.scale), out=out)
+        return out
+
+
+class HeatmapOverlayRenderer:
+    """Composite the live heatmap over a frame at display resolution without per-frame allocations
+
+    Output, resize and colormap buffers are allocated once per (source size, display
+    size) pair together with the grid line positions. The returned image is an internal
+    buffer that stays valid until the next call to render(). The colorized heatmap is
+    kept, so frames shown between heatmap updates only pay for the blend.
+    """
+
+    def __init__(self, grid_color=(80, 80, 80), grid_spacing=50, min_level=0.1):
+        self.grid_color = grid_color
+        self.grid_spacing = grid_spacing  # In source pixels
+
+        # Minimum value keeps a blue background in low activity areas
+        self.min_level = int(min_level * 255)
+
+        # JET colormap as a lookup table, computed once
+        self.lut = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), cv2.COLORMAP_JET)
+
+        self.buffer_key = None
+        self.colors_valid = False
+
+    def prepare(self, source_size, display_size):
+        """(Re)allocate buffers and grid positions when the source or display size changes"""
+        key = (source_size, display_size)
+        if key == self.buffer_key:
+            return
+
+        (w, h), (dw, dh) = source_size, display_size
+        self.frame_buffer = np.empty((dh, dw, 3), dtype=np.uint8)
+        self.heat_buffer = np.empty((dh, dw), dtype=np.float32)
+        self.heat_8bit = np.empty((dh, dw), dtype=np.uint8)
+        self.colored = np.empty((dh, dw, 3), dtype=np.uint8)
+        self.output = np.empty((dh, dw, 3), dtype=np.uint8)
+
+        # Grid lines every grid_spacing source pixels, mapped to display pixels
+        self.grid_columns = (np.arange(0, w, self.grid_spacing) * dw // w).astype(np.intp)
+        self.grid_rows = (np.arange(0, h, self.grid_spacing) * dh // h).astype(np.intp)
+
+        self.buffer_key = key
+        self.colors_valid = False
+
+    def render(self, frame, heatmap, scale=1.0, display_size=None, source_size=None, reuse_colors=False):
+        """Blend a low-resolution heatmap (values heatmap * scale in 0-1) over a BGR frame
+
+        source_size is the (width, height) grid spacing refers to when the frame was
+        already scaled down for display. reuse_colors blends the heatmap colorized by
+        the previous call, when the heatmap has not changed since.
+        """
+        h, w = frame.shape[:2]
+        dw, dh = display_size if display_size is not None else (w, h)
+        self.prepare(source_size if source_size is not None else (w, h), (dw, dh))
+
+        # Downscale the frame once instead of compositing at source resolution
+        if (dw, dh) != (w, h):
+            base = cv2.resize(frame, (dw, dh), dst=self.frame_buffer, interpolation=cv2.INTER_AREA)
+        else:
+            base = frame
+
+        if not (reuse_colors and self.colors_valid):
+            # Upsample the heatmap straight to display size and convert to 8-bit, folding in the scale
+            cv2.resize(heatmap, (dw, dh), dst=self.heat_buffer, interpolation=cv2.INTER_LINEAR)
+            cv2.convertScaleAbs(self.heat_buffer, dst=self.heat_8bit, alpha=255.0 * scale)
+            np.maximum(self.heat_8bit, self.min_level, out=self.heat_8bit)
+
+            # Apply JET colormap to get blue->green->red gradient
+            cv2.applyColorMap(self.heat_8bit, self.lut, dst=self.colored)
+            self.colors_valid = True
+
+        # Blend the heatmap with the frame darkened to 40%
+        cv2.addWeighted(self.colored, 0.7, base, 0.3 * 0.4, 0, dst=self.output)
+
+        # Add grid lines for better visualization
+        self.output[:, self.grid_columns] = self.grid_color
+        self.output[self.grid_rows, :] = self.grid_color
+
+        return self.output
+
+
+def fit_display_size(frame_shape, bounds):
+    """Size (width, height) a frame is shown at inside bounds (width, height), never larger than the frame"""
+    h, w = frame_shape[:2]
+    scale = min(bounds[0] / w, bounds[1] / h)
+    if scale <= 0 or scale >= 1:
+        return (w, h)
+    return (max(1, int(w * scale)), max(1, int(h * scale)))
+
+
+def resize_for_display(frame, bounds):
+    """Downscale a frame with area averaging to fit bounds, or return it unchanged if it already fits"""
+    if bounds is None:
+        return frame
+    size = fit_display_size(frame.shape, bounds)
+    if size == (frame.shape[1], frame.shape[0]):
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def render_aggregate_heatmap(aggregate_accumulator, aggregate_frame_count, background=None, size=(1280, 720)):
+    """Render an aggregate heatmap as a colored BGR image, blended over background if given"""
+    # Normalize by the number of frames that contributed to it
+    normalized_aggregate = aggregate_accumulator.copy()
+    if aggregate_frame_count > 0:
+        normalized_aggregate /= aggregate_frame_count
+
+    # Scale up to original frame size
+    h, w = background.shape[:2] if background is not None else (size[1], size[0])
+    heatmap = cv2.resize(normalized_aggregate, (w, h), interpolation=cv2.INTER_LINEAR)
+
+    # Apply additional blur for smoother visualization
+    heatmap = cv2.GaussianBlur(heatmap, (15, 15), 0)
+
+    # Convert to colormap
+    heatmap_8bit = (heatmap * 255).astype(np.uint8)
+    heatmap_colored = cv2.applyColorMap(heatmap_8bit, cv2.COLORMAP_JET)
+
+    # Darken the background and blend the heatmap over it
+    if background is not None:
+        darkened = cv2.addWeighted(background, 0.4, np.zeros_like(background), 0.6, 0)
+        return cv2.addWeighted(heatmap_colored, 0.7, darkened, 0.3, 0)
+    return heatmap_colored
+
+
+def frame_time_ms(cap, frame_index, fps):
+    """Presentation time of the frame just read, from the container clock or the frame index"""
+    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_ms > 0 or frame_index == 0:
+        return int(pos_ms)
+    return int(frame_index * 1000 / fps) if fps > 0 else 0
+
+
+def resolve_model_path(model_path, models_dir):
+    """Find a model checkpoint in the models directory or the current directory"""
+    candidate = os.path.join(models_dir, model_path)
+    if os.path.exists(candidate):
+        return candidate
+    # Fall back to the given path, which ultralytics downloads if it's a known checkpoint name
+    return model_path
+
+
+
+# Inference backends: the suffix of the exported artifact cached next to the .pt checkpoint (None runs the .pt)
+INFERENCE_BACKENDS = {
+    "torch": None,
+    "onnx": ".onnx",
+    "torchscript": ".torchscript",
+}
+
+# Backends whose export is traced at batch 1 and the model's default input size, so they only
+# take one frame per forward pass at that size
+FIXED_SHAPE_BACKENDS = ("torchscript",)
+
+
+def export_model(model_path, backend="torch"):
+    """Return the model file to load for a backend, exporting the .pt checkpoint on first use
+
+    The exported artifact is cached next to the checkpoint and re-exported if
+    the checkpoint is newer. Every backend is loaded through ultralytics, so
+    pre- and post-processing are identical whatever runs the network.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    suffix = INFERENCE_BACKENDS[backend]
+    if suffix is None or not model_path.endswith(".pt"):
+        return model_path
+    if not os.path.exists(model_path):
+        # Let ultralytics download a known checkpoint name before exporting it
+        model_path = YOLO(model_path).ckpt_path
+
+    artifact_path = os.path.splitext(model_path)[0] + suffix
+    if not os.path.exists(artifact_path) or os.path.getmtime(artifact_path) < os.path.getmtime(model_path):
+        # Dynamic axes let the ONNX model take any batch size
+        export_args = {"dynamic": True} if backend == "onnx" else {}
+        exported_path = YOLO(model_path).export(format=backend, **export_args)
+        if os.path.abspath(exported_path) != os.path.abspath(artifact_path):
+            os.replace(exported_path, artifact_path)
+    return artifact_path
+
+
+def load_model(model_path, backend="torch"):
+    """Load a YOLO detector on the given inference backend"""
+    return YOLO(export_model(model_path, backend), task="detect")
+
+def sample_video_frames(video_path, count, max_frames=None):
+    """Read count frames spread evenly over the first max_frames frames of a video (or all of it)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if max_frames is not None:
+        total_frames = min(total_frames, max_frames)
+    step = max(1, total_frames // max(1, count))
+
+    frames = []
+    frame_index = 0
+    while len(frames) < count and frame_index < total_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_index % step == 0:
+            frames.append(frame)
+        frame_index += 1
+    cap.release()
+    return frames
+
+
+def letterbox_tensor(frame, size=640):
+    """Letterbox a BGR frame into the 1x3xHxW float RGB tensor the exported YOLO models take"""
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)  # Same grey padding as ultralytics
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def quantized_model_path(model_path, output_dir=None):
+    """Path of the INT8 variant of a .pt checkpoint, next to it or in output_dir"""
+    if output_dir is not None:
+        model_path = os.path.join(output_dir, os.path.basename(model_path))
+    return os.path.splitext(model_path)[0] + "_int8.onnx"
+
+
+def quantize_model(model_path, calibration_video, calibration_frames=64, imgsz=640, output_dir=None):
+    """Build an INT8 ONNX variant of a checkpoint, calibrated on frames sampled from a local video
+
+    Weights are quantized per channel and activations statically, from the
+    ranges seen on the calibration frames at imgsz. The detection head stays in
+    float, since quantizing its box regression costs far more accuracy than
+    time. Like the onnx backend's export the model has dynamic axes, so it takes
+    batches, tiles and any inference size. The variant is written to output_dir,
+    or next to the checkpoint.
+    """
+    # Quantization is an offline step, so its tooling is only imported here
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name, frames):
+            self.inputs = iter([{input_name: letterbox_tensor(frame, imgsz)} for frame in frames])
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    frames = sample_video_frames(calibration_video, calibration_frames)
+    if not frames:
+        raise IOError(f"No frames could be read from {calibration_video}")
+
+    if not os.path.exists(model_path):
+        model_path = YOLO(model_path).ckpt_path
+    output_path = quantized_model_path(model_path, output_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    # Quantize a dynamic-axes float export, made in a scratch directory so the
+    # onnx backend's cached export next to the checkpoint is left alone
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        scratch_path = shutil.copy(model_path, scratch_dir)
+        exported_path = YOLO(scratch_path).export(format="onnx", imgsz=imgsz, dynamic=True)
+        float_path = os.path.join(scratch_dir, "preprocessed.onnx")
+        quant_pre_process(exported_path, float_path)  # Shape inference and graph cleanup ahead of quantization
+        float_model = onnx.load(float_path)
+        input_name = float_model.graph.input[0].name
+
+        # The head is the highest-numbered module, e.g. /model.22/... for YOLOv8
+        modules = [node.name.split("/")[1] for node in float_model.graph.node if node.name.startswith("/model.")]
+        module_indices = [int(module.split(".")[1]) for module in modules if module.split(".")[1].isdigit()]
+        head_prefix = f"/model.{max(module_indices)}/" if module_indices else None
+        head_nodes = [node.name for node in float_model.graph.node
+                      if head_prefix is not None and node.name.startswith(head_prefix)]
+
+        quantize_static(float_path, output_path, FrameReader(input_name, frames),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        nodes_to_exclude=head_nodes)
+    return output_path
+
+
+def compare_models(reference_path, candidate_path, video_path, max_frames=200, confidence_threshold=0.4):
+    """Run two models on the same clip and report the candidate's count error and both models' speed"""
+    frames = sample_video_frames(video_path, max_frames, max_frames)
+    report = {"video": video_path, "frames": len(frames), "confidence_threshold": confidence_threshold}
+
+    counts = {}
+    for key, path in (("reference", reference_path), ("candidate", candidate_path)):
+        model = load_model(path)
+        detect_people(model, frames[0], confidence_threshold, verbose=False)  # Warm up
+
+        start_time = time.time()
+        counts[key] = np.array([len(detect_people(model, frame, confidence_threshold, verbose=False)[0])
+                                for frame in frames])
+        elapsed = time.time() - start_time
+        report[key] = {"model": path, "fps": round(len(frames) / elapsed, 2) if elapsed > 0 else 0.0,
+                       "mean_count": round(float(counts[key].mean()), 3)}
+
+    error = counts["candidate"] - counts["reference"]
+    report["count_mae"] = round(float(np.abs(error).mean()), 3)
+    report["count_max_error"] = int(np.abs(error).max())
+    report["count_bias"] = round(float(error.mean()), 3)
+    report["speedup"] = round(report["candidate"]["fps"] / report["reference"]["fps"], 2) \
+        if report["reference"]["fps"] > 0 else 0.0
+    return report
+
+
+def file_fingerprint(path, sample_size=1 << 20, samples=8):
+    """Hash of a file's size and evenly spaced samples of its content, cheap even for multi-gigabyte videos"""
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= sample_size * samples:
+            digest.update(f.read())
+        else:
+            for index in range(samples):
+                f.seek((size - sample_size) * index // (samples - 1))
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """On-disk per-frame detections of one video under one model and set of inference settings
+
+    Arrays are stored column by column in .npy files that are memory-mapped on
+    open, so a cached frame costs a slice instead of a forward pass:
+
+    - counts.npy: boxes per frame as uint16, MISSING for frames never detected;
+      the per-frame offsets are their running sum, rebuilt on open
+    - boxes.npy: (N, 4) int16 x1, y1, x2, y2 of every box, in frame order
+    - confidences.npy: uint16 confidences scaled to 0..65535
+
+    put() keeps new detections in memory until save() merges them into the files.
+    Frames past the end of the saved ones, as playback produces, are appended in
+    place; anything else rewrites the columns.
+    The directory name is a hash of the video's content, the model file and the
+    settings, so changing any of them starts a separate cache. Detections are
+    stored down to FLOOR and the confidence threshold is applied when they are
+    read, so every threshold above it shares one cache.
+    """
+
+    VERSION = 2
+    FLOOR = 0.05  # Lowest confidence kept
+    MISSING = np.iinfo(np.uint16).max
+    CONFIDENCE_SCALE = np.iinfo(np.uint16).max
+    fingerprints = {}  # (path, size, mtime) -> file_fingerprint, so settings changes don't rehash the video
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pending = {}  # Frame index -> (boxes, confidences) not saved yet
+        self.lock = threading.Lock()
+        self.load()
+
+    @classmethod
+    def fingerprint(cls, path):
+        """file_fingerprint of path, remembered until the file changes"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in cls.fingerprints:
+            cls.fingerprints[key] = file_fingerprint(path)
+        return cls.fingerprints[key]
+
+    @classmethod
+    def key(cls, video_path, model_path, imgsz=None, roi=None, tiling=None, backend="torch"):
+        """Cache key for a video analyzed with a model and inference settings"""
+        settings = {
+            "version": cls.VERSION,
+            "video": cls.fingerprint(video_path),
+            "model": cls.fingerprint(model_path) if os.path.exists(model_path) else model_path,
+            "backend": backend,
+            "floor": cls.FLOOR,
+            "imgsz": imgsz,
+            "roi": None if roi is None else roi.points.tolist(),
+            "tiling": None if tiling is None else [tiling.tile_size, tiling.overlap, tiling.full_frame,
+                                                   tiling.nms_threshold, tiling.nms_metric],
+        }
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def open(cls, cache_dir, video_path, model_path, imgsz=None, roi=None, tiling=None, backend="torch"):
+        """Open (or start) the cache of a video under cache_dir"""
+        key = cls.key(video_path, model_path, imgsz, roi, tiling, backend)
+        return cls(os.path.join(cache_dir, key))
+
+    def load(self):
+        """Memory-map the saved arrays, starting empty if there are none or they don't match"""
+        self.counts = np.zeros(0, dtype=np.uint16)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.int16)
+        self.confidences = np.zeros(0, dtype=np.uint16)
+        try:
+            counts = np.load(os.path.join(self.directory, "counts.npy"), mmap_mode="r")
+            boxes = np.load(os.path.join(self.directory, "boxes.npy"), mmap_mode="r")
+            confidences = np.load(os.path.join(self.directory, "confidences.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return
+
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.where(counts == self.MISSING, 0, counts), out=offsets[1:])
+        if boxes.shape != (offsets[-1], 4) or len(confidences) != offsets[-1]:
+            return  # Interrupted save
+        self.counts, self.offsets, self.boxes, self.confidences = counts, offsets, boxes, confidences
+
+    def get(self, frame_index):
+        """Return the (boxes, confidences) cached for a frame, or None"""
+        with self.lock:
+            pending = self.pending.get(frame_index)
+            if pending is not None:
+                return pending
+            if frame_index < 0 or frame_index >= len(self.counts) or self.counts[frame_index] == self.MISSING:
+                return None
+
+            start, end = self.offsets[frame_index], self.offsets[frame_index + 1]
+            boxes = [tuple(box) for box in self.boxes[start:end].tolist()]
+            confidences = (self.confidences[start:end] / self.CONFIDENCE_SCALE).tolist()
+        return boxes, confidences
+
+    def confidence_columns(self):
+        """Return (frame indices, offsets, confidences) of the saved frames, frame i's boxes being offsets[i]:offsets[i + 1]"""
+        with self.lock:
+            present = np.flatnonzero(self.counts != self.MISSING)
+            offsets = np.zeros(len(present) + 1, dtype=np.int64)
+            np.cumsum(self.counts[present], out=offsets[1:])
+            confidences = np.asarray(self.confidences, dtype=np.float64) / self.CONFIDENCE_SCALE
+        return present, offsets, confidences
+
+    def put(self, frame_index, boxes, confidences):
+        """Remember a frame's detections (made at FLOOR) until the next save()"""
+        if frame_index < 0:
+            return
+        with self.lock:
+            self.pending[frame_index] = (list(boxes), list(confidences))
+
+    def encode(self, boxes, confidences):
+        """Stored (boxes, confidences) columns of one frame's detections"""
+        boxes = np.clip(np.asarray(boxes, dtype=np.int64).reshape(-1, 4),
+                        np.iinfo(np.int16).min, np.iinfo(np.int16).max).astype(np.int16)
+        confidences = np.round(np.asarray(confidences, dtype=np.float64) * self.CONFIDENCE_SCALE).astype(np.uint16)
+        return boxes, confidences
+
+    def save(self):
+        """Merge the pending detections into the files on disk
+
+        If writing fails the OSError propagates, the files are reopened as they
+        are and the detections stay pending for the next save.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            try:
+                if len(self.counts) == 0 or min(pending) < len(self.counts) or not self.append(pending):
+                    self.rewrite(pending)
+            except OSError:
+                for frame_index, detections in pending.items():
+                    self.pending.setdefault(frame_index, detections)  # Newer puts win
+                raise
+            finally:
+                self.load()
+
+    def rewrite(self, pending):
+        """Rebuild the files from the saved frames and pending, caller holds the lock and reloads"""
+        frame_count = max(len(self.counts), max(pending) + 1)
+        counts = np.full(frame_count, self.MISSING, dtype=np.uint16)
+        counts[:len(self.counts)] = self.counts
+        for frame_index, (boxes, _) in pending.items():
+            counts[frame_index] = len(boxes)
+
+        # Rebuild the columns in frame order, taking each frame from the pending set or the old files
+        box_columns = []
+        confidence_columns = []
+        for frame_index in np.flatnonzero(counts != self.MISSING).tolist():
+            if frame_index in pending:
+                boxes, confidences = self.encode(*pending[frame_index])
+                box_columns.append(boxes)
+                confidence_columns.append(confidences)
+            else:
+                start, end = self.offsets[frame_index], self.offsets[frame_index + 1]
+                box_columns.append(self.boxes[start:end])
+                confidence_columns.append(self.confidences[start:end])
+        boxes = np.concatenate(box_columns) if box_columns else np.zeros((0, 4), dtype=np.int16)
+        confidences = np.concatenate(confidence_columns) if confidence_columns else np.zeros(0, dtype=np.uint16)
+
+        # Replace each file atomically, counts last so a half-written save is detected on load
+        self.counts = self.boxes = self.confidences = None  # Close the memory maps
+        os.makedirs(self.directory, exist_ok=True)
+        for name, array in (("boxes", boxes), ("confidences", confidences), ("counts", counts)):
+            temp_path = os.path.join(self.directory, f"{name}.tmp.npy")
+            np.save(temp_path, array)
+            os.replace(temp_path, os.path.join(self.directory, f"{name}.npy"))
+
+    def append(self, pending):
+        """Append frames that all follow the saved ones to the files in place, caller holds the lock and reloads
+
+        Only the new rows are written, with each file's header rewritten for its
+        new length; numpy pads headers so the length can grow without moving the
+        data. Returns False, writing nothing, if a header has no room or the
+        files are unreadable, leaving the caller to rewrite the columns. If a
+        write fails, the files are cut back to what they held before.
+        """
+        first = len(self.counts)
+        counts = np.full(max(pending) + 1 - first, self.MISSING, dtype=np.uint16)
+        box_columns = []
+        confidence_columns = []
+        for frame_index in sorted(pending):
+            boxes, confidences = self.encode(*pending[frame_index])
+            counts[frame_index - first] = len(boxes)
+            box_columns.append(boxes)
+            confidence_columns.append(confidences)
+        new_rows = {"boxes": np.concatenate(box_columns), "confidences": np.concatenate(confidence_columns),
+                    "counts": counts}
+
+        # Check every header has room before touching any file, keeping the originals for rollback
+        headers = {}
+        originals = {}  # Name -> (header, file size)
+        try:
+            for name, rows in new_rows.items():
+                path = os.path.join(self.directory, f"{name}.npy")
+                with open(path, "rb") as f:
+                    version = np.lib.format.read_magic(f)
+                    if version != (1, 0):
+                        return False
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                    header_size = f.tell()
+                    f.seek(0)
+                    originals[name] = (f.read(header_size), os.path.getsize(path))
+                if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+                    return False
+                header = io.BytesIO()
+                np.lib.format.write_array_header_1_0(header, {
+                    "descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                    "shape": (shape[0] + len(rows),) + shape[1:]})
+                if len(header.getvalue()) != header_size:
+                    return False
+                headers[name] = header.getvalue()
+        except (OSError, ValueError):
+            return False
+
+        # Counts last, so a half-written append is detected on load like a half-written save
+        self.counts = self.boxes = self.confidences = None  # Close the memory maps
+        written = []
+        try:
+            for name in ("boxes", "confidences", "counts"):
+                with open(os.path.join(self.directory, f"{name}.npy"), "r+b") as f:
+                    written.append(name)
+                    f.seek(0, os.SEEK_END)
+                    f.write(new_rows[name].tobytes())
+                    f.seek(0)
+                    f.write(headers[name])
+        except OSError:
+            for name in written:
+                header, size = originals[name]
+                with open(os.path.join(self.directory, f"{name}.npy"), "r+b") as f:
+                    f.truncate(size)
+                    f.write(header)
+            raise
+        return True
+
+
+def threshold_sweep(cache, thresholds, smoothing_window=24, fps=30.0, crowd_size_threshold=None):
+    """Replay the saved detections of a cache at every confidence threshold at once
+
+    Box counts for all thresholds come from one (thresholds x boxes) comparison
+    and running sums over the frame offsets; the smoothed curves use the same
+    moving average as CountSmoother, and peaks follow PeakTracker. Only frames
+    the model ran on are in the cache, so with a detection stride the smoothing
+    window spans more video time than in playback. Returns a dict of arrays with
+    one row per threshold, and per threshold the (start ms, end ms) intervals
+    where the smoothed count is above crowd_size_threshold.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    frames, offsets, confidences = cache.confidence_columns()
+    times_ms = (frames * 1000 / fps).astype(np.int64) if fps > 0 else np.zeros(len(frames), dtype=np.int64)
+
+    # Boxes above each threshold per frame, as differences of running sums at the frame boundaries
+    above = np.zeros((len(thresholds), len(confidences) + 1), dtype=np.int64)
+    np.cumsum(confidences[None, :] > thresholds[:, None], axis=1, out=above[:, 1:])
+    counts = above[:, offsets[1:]] - above[:, offsets[:-1]]
+
+    # Moving average over the last smoothing_window frames, rounded like CountSmoother
+    running = np.zeros((len(thresholds), len(frames) + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=running[:, 1:])
+    ends = np.arange(1, len(frames) + 1)
+    starts = np.maximum(ends - smoothing_window, 0)
+    smoothed = np.round((running[:, ends] - running[:, starts]) / (ends - starts)).astype(np.int64)
+
+    sweep = {"thresholds": thresholds, "frames": frames, "times_ms": times_ms, "counts": counts, "smoothed": smoothed}
+    if len(frames) == 0:
+        zeros = np.zeros(len(thresholds), dtype=np.int64)
+        sweep.update(peak_count=zeros, peak_time_ms=zeros, offpeak_count=zeros, offpeak_time_ms=zeros,
+                     alerts=[[] for _ in thresholds])
+        return sweep
+
+    # Peak: first frame with the highest count; off-peak: first frame with the lowest non-zero count
+    rows = np.arange(len(thresholds))
+    peak_index = np.argmax(smoothed, axis=1)
+    sweep["peak_count"] = smoothed[rows, peak_index]
+    sweep["peak_time_ms"] = np.where(sweep["peak_count"] > 0, times_ms[peak_index], 0)
+    nonzero = np.where(smoothed > 0, smoothed, np.iinfo(np.int64).max)
+    offpeak_index = np.argmin(nonzero, axis=1)
+    has_offpeak = (smoothed > 0).any(axis=1)
+    sweep["offpeak_count"] = np.where(has_offpeak, smoothed[rows, offpeak_index], 0)
+    sweep["offpeak_time_ms"] = np.where(has_offpeak, times_ms[offpeak_index], 0)
+
+    # Alert intervals: runs of frames above the crowd size threshold, found from the edges of the mask
+    alerts = [[] for _ in thresholds]
+    if crowd_size_threshold is not None:
+        alerting = np.zeros((len(thresholds), len(frames) + 2), dtype=np.int8)
+        alerting[:, 1:-1] = smoothed > crowd_size_threshold
+        edge_rows, edge_columns = np.nonzero(np.diff(alerting, axis=1))
+        last_time = times_ms[-1]
+        for row, start, end in zip(edge_rows[::2], edge_columns[::2], edge_columns[1::2]):
+            alerts[row].append((int(times_ms[start]), int(times_ms[end]) if end < len(frames) else int(last_time)))
+    sweep["alerts"] = alerts
+    return sweep
+
+
+def parse_timestamp(text):
+    """Parse HH:MM:SS[.mmm], MM:SS or plain seconds into milliseconds"""
+    try:
+        seconds = 0.0
+        for part in text.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Invalid time: {text!r} (use HH:MM:SS, MM:SS or seconds)")
+    if seconds < 0:
+        raise ValueError(f"Invalid time: {text!r} (must not be negative)")
+    return int(round(seconds * 1000))
+
+
+class SeekIndex:
+    """Presentation time of every frame of a video and the keyframes decoding can restart from
+
+    Built once per video by a demux-only pass: with FFmpeg, VideoCapture hands
+    out raw packets without decoding them and flags keyframes. Packets come in
+    decode order, so frames are numbered by sorting their timestamps. Without
+    raw packet access every frame is grabbed instead and only frame 0 counts
+    as a keyframe, which keeps seeks exact but makes them decode from the start.
+    """
+
+    VERSION = 1
+
+    def __init__(self, times_ms, keyframes):
+        self.times_ms = np.asarray(times_ms, dtype=np.int64)  # Per frame, in display order
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)  # Sorted frame indices
+
+    @property
+    def frame_count(self):
+        return len(self.times_ms)
+
+    @classmethod
+    def build(cls, video_path):
+        """Read every packet of a video once and index its frames"""
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])  # Packets, not pictures
+        raw = cap.isOpened() and hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME")
+        if not raw:
+            cap.release()
+            cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        times_ms = []
+        key_packets = []
+        try:
+            while cap.grab():
+                if raw and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    key_packets.append(len(times_ms))
+                times_ms.append(cap.get(cv2.CAP_PROP_POS_MSEC) if raw else frame_time_ms(cap, len(times_ms), fps))
+        finally:
+            cap.release()
+
+        # Number frames in display order and map the keyframe packets onto them
+        times_ms = np.asarray(times_ms, dtype=np.float64)
+        order = np.argsort(times_ms, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keyframes = np.unique(np.concatenate([[0], rank[key_packets]])).astype(np.int64)
+        return cls(times_ms[order].astype(np.int64), keyframes)
+
+    @classmethod
+    def load_or_build(cls, cache_dir, video_path):
+        """Load the video's index from cache_dir, building and saving it there on first use"""
+        path = os.path.join(cache_dir, f"{DetectionCache.fingerprint(video_path)}.npz")
+        try:
+            with np.load(path) as saved:
+                if int(saved["version"]) == cls.VERSION:
+                    return cls(saved["times_ms"], saved["keyframes"])
+        except (OSError, KeyError, ValueError):
+            pass
+
+        index = cls.build(video_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path[:-len('.npz')]}.tmp.npz"
+        np.savez(temp_path, version=cls.VERSION, times_ms=index.times_ms, keyframes=index.keyframes)
+        os.replace(temp_path, path)
+        return index
+
+    def frame_at(self, time_ms):
+        """Index of the first frame shown at or after time_ms (the last frame past the end)"""
+        if self.frame_count == 0:
+            return 0
+        return int(min(np.searchsorted(self.times_ms, time_ms, side="left"), self.frame_count - 1))
+
+    def keyframe_before(self, frame_index):
+        """The last keyframe at or before frame_index"""
+        return int(self.keyframes[max(np.searchsorted(self.keyframes, frame_index, side="right") - 1, 0)])
+
+    def seek(self, cap, frame_index):
+        """Position cap so that its next read() returns frame_index, returning that index
+
+        Jumps to the keyframe at or before the frame, then grabs forward without
+        converting the frames in between. If the jump lands past the frame, as
+        some containers seek inexactly, it falls back to grabbing from the start.
+        """
+        frame_index = max(0, min(int(frame_index), self.frame_count - 1))
+        position = self.keyframe_before(frame_index)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        if position > 0:
+            # Where the jump landed, from the timestamp of the first frame grabbed there
+            if not cap.grab():
+                return position
+            landed = self.frame_at(int(cap.get(cv2.CAP_PROP_POS_MSEC)))
+            if landed > frame_index:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                position = 0
+            elif landed == frame_index:
+                # The grab consumed the target itself (e.g. a keyframe), so jump back to it
+                cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+                return frame_index
+            else:
+                position = landed + 1
+
+        while position < frame_index and cap.grab():
+            position += 1
+        return position
+
+
+class VideoStream:
+    """One source's decode reader and analysis state (smoothing, peaks, tracks, heatmap)"""
+
+    def __init__(self, video_path, smoothing_window=24, heatmap=None, peaks=None, tracker=None, stride=1,
+                 start_frame=0, end_frame=None, roi=None, imgsz=None, tiling=None, cache=None, seek_index=None,
+                 read_ahead=8):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+        if start_frame > 0:
+            if seek_index is not None:
+                # Frame-accurate: decode from the keyframe before start_frame
+                start_frame = seek_index.seek(self.cap, start_frame)
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        # Decode up to read_ahead frames ahead while the model runs; end_frame None reads to the end
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.decoder = ReadAheadDecoder(self.cap, read_ahead, start_frame=start_frame, end_frame=end_frame)
+        self.decoder.start()
+        self.smoother = CountSmoother(smoothing_window)
+        self.peaks = PeakTracker() if peaks is None else peaks
+        self.rollups = OccupancyRollups()
+        self.tracker = PersonTracker() if tracker is None else tracker
+        self.heatmap = heatmap
+        self.detector = StridedDetector(stride)
+        self.roi = roi  # RegionOfInterest the model is restricted to (None for the full frame)
+        self.imgsz = imgsz  # Inference resolution (None for the model default)
+        self.tiling = tiling  # Tiling for sliced inference (None runs on whole frames)
+        self.cache = cache  # DetectionCache read before, and filled by, the model (None to always infer)
+        self.frame_index = start_frame  # Index of the next frame to be processed
+        self.finished = False
+
+    def read(self, max_frames):
+        """Take up to max_frames decoded frames, returning the frames and their times (ms)"""
+        frames = []
+        times_ms = []
+        while len(frames) < max_frames:
+            item = self.decoder.read()
+            if item is None:
+                self.finished = True
+                break
+            frame, _, time_ms = item
+            frames.append(frame)
+            times_ms.append(time_ms)
+        return frames, times_ms
+
+    def process(self, frames, times_ms, detections):
+        """Feed the (boxes, confidences, detected) of decoded frames into the stream state, returning one record per frame"""
+        records = []
+        for frame, time_ms, (boxes, confidences, detected) in zip(frames, times_ms, detections):
+            track_ids = self.tracker.update(boxes, confidences)
+            smoothed_count = self.smoother.add(len(boxes))
+            self.peaks.update(smoothed_count, time_ms)
+            self.rollups.add(time_ms / 1000.0, smoothed_count)
+
+            if self.heatmap is not None:
+                self.heatmap.accumulate(frame.shape, boxes)
+
+            records.append({
+                "frame": self.frame_index,
+                "time_ms": time_ms,
+                "count": len(boxes),
+                "smoothed_count": smoothed_count,
+                "detected": detected,
+                "track_ids": track_ids.tolist(),
+            })
+            self.frame_index += 1
+        return records
+
+    def release(self):
+        """Close the decode reader and save what was added to the detection cache"""
+        self.decoder.stop()
+        self.cap.release()
+        if self.cache is not None:
+            self.cache.save()
+
+
+def analyze_streams(streams, model, confidence_threshold=0.4, batch_size=1):
+    """Analyze several streams with one shared model, yielding (stream index, record) pairs
+
+    Every round each unfinished stream decodes an equal share of the batch, so
+    all streams advance at the same rate. The frames that need a detection are
+    then run through the model together, batch_size frames per forward pass,
+    grouped by the streams' inference size and tiling. Each stream's ROI crop
+    goes into the batch and its boxes are mapped back to the full frame.
+    Frames a stream's detection cache holds skip the model; with caches the
+    model runs at the cache's floor and the threshold is applied afterwards.
+    """
+    model_threshold = confidence_threshold
+    if any(stream.cache is not None for stream in streams):
+        model_threshold = min(confidence_threshold, DetectionCache.FLOOR)
+    try:
+        while True:
+            active = [index for index, stream in enumerate(streams) if not stream.finished]
+            if not active:
+                break
+            frames_per_stream = max(1, batch_size // len(active))
+
+            # Decode each stream's share and plan which frames need the model
+            decoded = []
+            pending = {}  # (inference size, tiling) -> (stream index, frame index, frame) awaiting detection
+            detections = {}  # (stream index, frame index) -> (boxes, confidences)
+            for index in active:
+                stream = streams[index]
+                frames, times_ms = stream.read(frames_per_stream)
+                frame_indices = range(stream.frame_index, stream.frame_index + len(frames))
+                for frame_index in frame_indices:
+                    cached = stream.cache.get(frame_index) if stream.cache is not None else None
+                    if cached is not None:
+                        detections[index, frame_index] = cached
+                needs_detection = stream.detector.plan(len(frames), [(index, frame_index) in detections
+                                                                     for frame_index in frame_indices])
+                decoded.append((index, frames, times_ms, frame_indices, needs_detection))
+                pending.setdefault((stream.imgsz, stream.tiling), []).extend(
+                    (index, frame_index, frame) for frame_index, frame, detect
+                    in zip(frame_indices, frames, needs_detection) if detect and (index, frame_index) not in detections)
+
+            # One forward pass per batch_size detection frames, across all streams with the same settings
+            for (imgsz, tiling), items in pending.items():
+                predict_kwargs = {"imgsz": imgsz} if imgsz else {}
+                for start in range(0, len(items), batch_size):
+                    chunk = items[start:start + batch_size]
+                    crops = [frame if streams[index].roi is None else streams[index].roi.crop(frame)
+                             for index, _, frame in chunk]
+                    results = detect_people_batch(model, crops, model_threshold, tiling=tiling, verbose=False,
+                                                  **predict_kwargs)
+                    for (index, frame_index, frame), (boxes, confidences) in zip(chunk, results):
+                        stream = streams[index]
+                        if stream.roi is not None:
+                            boxes, confidences = stream.roi.map_boxes(frame.shape, boxes, confidences)
+                        if stream.cache is not None:
+                            stream.cache.put(frame_index, boxes, confidences)
+                        detections[index, frame_index] = (boxes, confidences)
+
+            # Hand each stream its detections back in decode order
+            for index, frames, times_ms, frame_indices, needs_detection in decoded:
+                stream = streams[index]
+                stream_detections = [filter_detections(*detections[index, frame_index], confidence_threshold)
+                                     for frame_index, detect in zip(frame_indices, needs_detection) if detect]
+                results = stream.detector.resolve(frames, needs_detection, stream_detections)
+                for record in stream.process(frames, times_ms, results):
+                    yield index, record
+    finally:
+        for stream in streams:
+            stream.release()
+
+
+def analyze_video(video_path, model, confidence_threshold=0.4, smoothing_window=24, heatmap=None, peaks=None,
+                  batch_size=1, stride=1, tracker=None, roi=None, imgsz=None, tiling=None):
+    """Decode and analyze a video as fast as possible, yielding one record per frame"""
+    stream = VideoStream(video_path, smoothing_window, heatmap, peaks, tracker, stride, roi=roi, imgsz=imgsz,
+                         tiling=tiling)
+    for _, record in analyze_streams([stream], model, confidence_threshold, batch_size):
+        yield record
+
+
+def analyze_segment(video_path, model_path, start_frame, end_frame, confidence_threshold=0.4, batch_size=1,
+                    stride=1, heatmap=False, threads=None, roi=None, imgsz=None, tiling=None, seek_index=None,
+                    read_ahead=8):
+    """Worker for parallel analysis: analyze frames [start_frame, end_frame) and return the raw partial results"""
+    if threads is not None:
+        # Split the cores between the workers instead of letting each one use them all
+        import torch
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(threads)
+
+    model = load_model(model_path)  # Already exported by the parent
+    stream = VideoStream(video_path, heatmap=HeatmapAccumulator() if heatmap else None, stride=stride,
+                         start_frame=start_frame, end_frame=end_frame, roi=roi, imgsz=imgsz, tiling=tiling,
+                         seek_index=seek_index, read_ahead=read_ahead)
+    records = [record for _, record in analyze_streams([stream], model, confidence_threshold, batch_size)]
+    return {
+        "frames": [record["frame"] for record in records],
+        "times_ms": [record["time_ms"] for record in records],
+        "counts": [record["count"] for record in records],
+        "detected": [record["detected"] for record in records],
+        "aggregate_accumulator": stream.heatmap.aggregate_accumulator if heatmap else None,
+        "aggregate_frame_count": stream.heatmap.aggregate_frame_count if heatmap else 0,
+    }
+
+
+def analyze_video_parallel(video_path, model_path, workers=None, confidence_threshold=0.4, smoothing_window=24,
+                           heatmap=None, peaks=None, batch_size=1, stride=1, roi=None, imgsz=None, tiling=None,
+                           rollups=None, start_frame=0, end_frame=None, seek_index=None, read_ahead=8):
+    """Analyze frame-range segments of a video in worker processes, yielding one record per frame
+
+    Each worker seeks its own capture to its segment and loads its own model.
+    Workers return raw counts, and smoothing and peaks are recomputed over the
+    concatenated counts, so windows spanning segment boundaries match a
+    sequential run. Aggregate heatmaps are summed into heatmap and smoothed
+    counts are fed to rollups (an OccupancyRollups) if given. Tracks restart
+    in every segment, so records carry no track IDs. Only frames
+    [start_frame, end_frame) are analyzed; with a SeekIndex every segment
+    starts frame-accurately from the keyframe before it.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    total_frames = seek_index.frame_count if seek_index is not None else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    range_end = total_frames if end_frame is None else min(end_frame, total_frames)
+    if end_frame is not None and range_end <= start_frame:
+        return  # Nothing in the range
+
+    workers = workers or os.cpu_count() or 1
+    # Segments start on a detection frame, like a sequential run with the same stride
+    range_length = max(range_end - start_frame, 1)
+    segment_length = math.ceil(range_length / workers / stride) * stride
+    starts = list(range(start_frame, start_frame + range_length, segment_length))
+    ends = starts[1:] + [end_frame]  # Without an end the last segment reads to the real end, whatever the header says
+
+    smoother = CountSmoother(smoothing_window)
+    if peaks is None:
+        peaks = PeakTracker()
+    threads = max(1, (os.cpu_count() or 1) // len(starts))
+
+    # Spawn rather than fork, since forking after torch has started threads can deadlock
+    with ProcessPoolExecutor(max_workers=len(starts), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(analyze_segment, video_path, model_path, start, end, confidence_threshold,
+                               batch_size, stride, heatmap is not None, threads, roi, imgsz, tiling, seek_index,
+                               read_ahead)
+                   for start, end in zip(starts, ends)]
+
+        # Merge the segments in order as they complete
+        for future in futures:
+            segment = future.result()
+            if heatmap is not None:
+                heatmap.merge_aggregate(segment["aggregate_accumulator"], segment["aggregate_frame_count"])
+            for frame_index, time_ms, count, detected in zip(segment["frames"], segment["times_ms"],
+                                                             segment["counts"], segment["detected"]):
+                smoothed_count = smoother.add(count)
+                peaks.update(smoothed_count, time_ms)
+                if rollups is not None:
+                    rollups.add(time_ms / 1000.0, smoothed_count)
+                yield {
+                    "frame": frame_index,
+                    "time_ms": time_ms,
+                    "count": count,
+                    "smoothed_count": smoothed_count,
+                    "detected": detected,
+                }
+
+
+def busiest_hour_summary(rollups):
+    """Summary fields for the hour with the highest mean smoothed count in the last week"""
+    busiest = rollups.busiest("hour")
+    if busiest is None:
+        return {"busiest_hour_start_ms": 0, "busiest_hour_mean": 0.0}
+    start_s, mean_count = busiest
+    return {"busiest_hour_start_ms": int(start_s * 1000), "busiest_hour_mean": round(mean_count, 2)}
+
+
+def analyze_main(argv=None):
+    """Headless entry point: ``crowdsense.py analyze <video> [<video> ...]`` streams per-frame counts as JSON Lines"""
+    parser = argparse.ArgumentParser(prog="crowdsense analyze",
+                                     description="Analyze videos without the GUI and stream per-frame people counts as JSON Lines")
+    parser.add_argument("video", nargs="+",
+                        help="Path to the video file; several videos are analyzed together with one shared model")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO checkpoint (looked up in ./models first)")
+    parser.add_argument("--backend", choices=list(INFERENCE_BACKENDS), default="torch",
+                        help="Inference backend; onnx and torchscript export the checkpoint on first use, "
+                             "and torchscript runs one frame per pass at the model's default size (default: torch)")
+    parser.add_argument("--conf", type=float, default=0.4, help="Confidence threshold (default: 0.4)")
+    parser.add_argument("--smoothing", type=int, default=24, help="Smoothing window in frames (default: 24)")
+    parser.add_argument("--batch", type=int, default=1, help="Frames per forward pass, across all videos (default: 1)")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Run detection every N frames and track boxes in between (default: 1)")
+    parser.add_argument("--read-ahead", type=int, default=8,
+                        help="Frames each video decodes ahead of inference on its own thread (default: 8)")
+    parser.add_argument("--imgsz", type=int, help="Inference resolution in pixels (default: the model's, usually 640)")
+    parser.add_argument("--roi", type=RegionOfInterest.parse,
+                        help="Only detect inside x1,y1,x2,y2 (rectangle) or x,y;x,y;x,y;... (polygon), in frame pixels")
+    parser.add_argument("--tile", type=int,
+                        help="Sliced inference: cut frames into tiles of this many pixels (default: off)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="Fraction of overlap between tiles (default: 0.2)")
+    parser.add_argument("--tile-batch", type=int, default=16,
+                        help="Tiles per forward pass (default: 16; always 1 with --backend torchscript)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Split a single video into segments analyzed by this many processes (default: 1)")
+    parser.add_argument("--start", type=parse_timestamp,
+                        help="Only analyze from this video time (HH:MM:SS, MM:SS or seconds)")
+    parser.add_argument("--end", type=parse_timestamp,
+                        help="Only analyze up to this video time (HH:MM:SS, MM:SS or seconds)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="Read and store per-frame detections under DIR, so reruns of a video skip inference")
+    parser.add_argument("-o", "--output", help="Write JSON Lines to this file instead of stdout")
+    parser.add_argument("--heatmap", help="Save the aggregate heatmap to this image file (suffixed _<stream> for several videos)")
+    args = parser.parse_args(argv)
+
+    if args.backend in FIXED_SHAPE_BACKENDS:
+        if args.batch > 1:
+            parser.error(f"--backend {args.backend} runs one frame per forward pass; use --batch 1")
+        if args.imgsz is not None:
+            parser.error(f"--backend {args.backend} runs at the model's default size; drop --imgsz")
+        args.tile_batch = 1  # Tiles are letterboxed to the default size, but go through one at a time
+
+    args.tiling = Tiling(args.tile, args.tile_overlap, max(1, args.tile_batch)) if args.tile else None
+
+    if args.workers > 1 and len(args.video) > 1:
+        parser.error("--workers splits a single video; pass one video or use --batch for several")
+    if args.workers > 1 and args.cache:
+        parser.error("--cache is not supported with --workers")
+    if args.start is not None and args.end is not None and args.start >= args.end:
+        parser.error("--start must be before --end")
+
+    for video in args.video:
+        if not os.path.exists(video):
+            print(f"Video not found: {video}", file=sys.stderr)
+            return 1
+
+    model_path = resolve_model_path(args.model, os.path.join(os.getcwd(), "models"))
+    try:
+        model_path = export_model(model_path, args.backend)
+        model = load_model(model_path)
+    except Exception as e:
+        print(f"Error loading YOLO model: {e}", file=sys.stderr)
+        return 1
+
+    # Range mode: index each video once (cached under ./cache/seek) to find and seek to its frames
+    seek_indices = {}
+    if args.start is not None or args.end is not None:
+        try:
+            for video in args.video:
+                seek_indices[video] = SeekIndex.load_or_build(os.path.join(os.getcwd(), "cache", "seek"), video)
+        except IOError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+
+    if args.workers > 1:
+        return analyze_parallel_main(args, model_path, seek_indices.get(args.video[0]))
+
+    streams = []
+    try:
+        for video in args.video:
+            start_frame, end_frame = analysis_range(args, seek_indices.get(video))
+            heatmap = HeatmapAccumulator() if args.heatmap else None
+            cache = None
+            if args.cache:
+                cache = DetectionCache.open(args.cache, video, model_path, args.imgsz, args.roi, args.tiling)
+            streams.append(VideoStream(video, args.smoothing, heatmap, stride=args.stride, roi=args.roi, imgsz=args.imgsz,
+                                       tiling=args.tiling, cache=cache, start_frame=start_frame, end_frame=end_frame,
+                                       seek_index=seek_indices.get(video), read_ahead=args.read_ahead))
+    except IOError as e:
+        for stream in streams:
+            stream.release()
+        print(str(e), file=sys.stderr)
+        return 1
+
+    multiple = len(streams) > 1
+    out = open(args.output, "w") if args.output else sys.stdout
+
+    start_time = time.time()
+    frames = 0
+    stream_frames = [0] * len(streams)  # Frames analyzed per video, which range mode starts mid-video
+    try:
+        for index, record in analyze_streams(streams, model, args.conf, batch_size=max(1, args.batch)):
+            record["type"] = "frame"
+            if multiple:
+                record["stream"] = index
+            out.write(json.dumps(record) + "\n")
+            frames += 1
+            stream_frames[index] += 1
+
+        elapsed = time.time() - start_time
+        for index, stream in enumerate(streams):
+            peaks = stream.peaks
+            summary = {
+                "type": "summary",
+                "video": stream.video_path,
+                "model": model_path,
+                "frames": stream_frames[index],
+                "elapsed_s": round(elapsed, 3),
+                "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,  # Total across all videos
+                "peak_count": peaks.peak_count,
+                "peak_time_ms": peaks.peak_time_ms,
+                "offpeak_count": peaks.offpeak_count if peaks.offpeak_count < float('inf') else 0,
+                "offpeak_time_ms": peaks.offpeak_time_ms,
+                "unique_visitors": stream.tracker.unique_count,
+            }
+            summary.update(busiest_hour_summary(stream.rollups))
+            if multiple:
+                summary["stream"] = index
+            out.write(json.dumps(summary) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    for index, stream in enumerate(streams):
+        heatmap = stream.heatmap
+        if heatmap is not None and heatmap.aggregate_frame_count > 0:
+            heatmap_path = args.heatmap
+            if multiple:
+                root, ext = os.path.splitext(args.heatmap)
+                heatmap_path = f"{root}_{index}{ext}"
+            cv2.imwrite(heatmap_path, render_aggregate_heatmap(heatmap.aggregate_accumulator,
+                                                               heatmap.aggregate_frame_count))
+
+    return 0
+
+
+def analysis_range(args, seek_index):
+    """(start frame, end frame or None) of the --start/--end range of a video with a SeekIndex"""
+    if seek_index is None:
+        return 0, None
+    start_frame = seek_index.frame_at(args.start) if args.start is not None else 0
+    end_frame = None
+    if args.end is not None and seek_index.frame_count and args.end <= seek_index.times_ms[-1]:
+        end_frame = seek_index.frame_at(args.end)
+    return start_frame, end_frame
+
+
+def analyze_parallel_main(args, model_path, seek_index=None):
+    """Run ``crowdsense analyze --workers N`` on a single video and write its records and summary"""
+    start_frame, end_frame = analysis_range(args, seek_index)
+    heatmap = HeatmapAccumulator() if args.heatmap else None
+    peaks = PeakTracker()
+    rollups = OccupancyRollups()
+    out = open(args.output, "w") if args.output else sys.stdout
+
+    start_time = time.time()
+    frames = 0
+    try:
+        for record in analyze_video_parallel(args.video[0], model_path, args.workers, args.conf, args.smoothing,
+                                             heatmap, peaks, batch_size=max(1, args.batch), stride=args.stride,
+                                             roi=args.roi, imgsz=args.imgsz, tiling=args.tiling, rollups=rollups,
+                                             start_frame=start_frame, end_frame=end_frame, seek_index=seek_index,
+                                             read_ahead=args.read_ahead):
+            record["type"] = "frame"
+            out.write(json.dumps(record) + "\n")
+            frames += 1
+
+        elapsed = time.time() - start_time
+        summary = {
+            "type": "summary",
+            "video": args.video[0],
+            "model": model_path,
+            "frames": frames,
+            "elapsed_s": round(elapsed, 3),
+            "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+            "peak_count": peaks.peak_count,
+            "peak_time_ms": peaks.peak_time_ms,
+            "offpeak_count": peaks.offpeak_count if peaks.offpeak_count < float('inf') else 0,
+            "offpeak_time_ms": peaks.offpeak_time_ms,
+            "workers": args.workers,
+        }
+        summary.update(busiest_hour_summary(rollups))
+        out.write(json.dumps(summary) + "\n")
+    except IOError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if heatmap is not None and heatmap.aggregate_frame_count > 0:
+        cv2.imwrite(args.heatmap, render_aggregate_heatmap(heatmap.aggregate_accumulator,
+                                                           heatmap.aggregate_frame_count))
+
+    return 0
+
+
+def quantize_main(argv=None):
+    """Entry point for ``crowdsense.py quantize``: build INT8 variants and report their accuracy and speed"""
+    parser = argparse.ArgumentParser(prog="crowdsense quantize",
+                                     description="Build INT8 ONNX variants of YOLO checkpoints for CPU inference")
+    parser.add_argument("models", nargs="+", help="Checkpoints to quantize (looked up in ./models first)")
+    parser.add_argument("--video", required=True, help="Local video to calibrate on and to compare against fp32")
+    parser.add_argument("--calibration-frames", type=int, default=64,
+                        help="Frames sampled from the video for calibration (default: 64)")
+    parser.add_argument("--report-frames", type=int, default=200,
+                        help="Frames compared between the fp32 and INT8 models (default: 200)")
+    parser.add_argument("--conf", type=float, default=0.4, help="Confidence threshold for the comparison (default: 0.4)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.video):
+        print(f"Video not found: {args.video}", file=sys.stderr)
+        return 1
+
+    # Variants go in ./models, where the app offers them, wherever the checkpoint was found
+    models_dir = os.path.join(os.getcwd(), "models")
+    for model in args.models:
+        model_path = resolve_model_path(model, models_dir)
+        try:
+            int8_path = quantize_model(model_path, args.video, args.calibration_frames, output_dir=models_dir)
+            report = compare_models(model_path, int8_path, args.video, args.report_frames, args.conf)
+        except Exception as e:
+            print(f"Error quantizing {model}: {e}", file=sys.stderr)
+            return 1
+
+        # The report sits next to the INT8 model
+        report_path = os.path.splitext(int8_path)[0] + "_report.json"
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"{int8_path}: count MAE {report['count_mae']} vs fp32, "
+              f"{report['candidate']['fps']} fps vs {report['reference']['fps']} fps (report: {report_path})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "analyze":
+        sys.exit(analyze_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "quantize":
+        sys.exit(quantize_main(sys.argv[2:]))
+    print(f"usage: {os.path.basename(sys.argv[0])} {{analyze,quantize}} ...", file=sys.stderr)
+    sys.exit(2)
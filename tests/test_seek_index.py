@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")  # crowdsense_core imports it at module level
+
+from crowdsense_core import SeekIndex, VideoStream, analyze_streams, analyze_video_parallel, load_model
+
+FPS = 25
+FRAME_COUNT = 250
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "yolov8n.pt")
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    """A short MPEG-4 clip whose frames all differ, with a keyframe every 12 frames (the encoder default)"""
+    path = str(tmp_path_factory.mktemp("video") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (160, 120))
+    if not writer.isOpened():
+        pytest.skip("No MPEG-4 encoder available")
+    for index in range(FRAME_COUNT):
+        frame = np.full((120, 160, 3), 40, dtype=np.uint8)
+        cv2.rectangle(frame, (index % 140, 20), (index % 140 + 20, 60), (0, 200, 255), -1)
+        cv2.putText(frame, str(index), (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def decode_all(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def test_seek_matches_sequential_decode(video):
+    frames = decode_all(video)
+    index = SeekIndex.build(video)
+    assert index.frame_count == len(frames)
+
+    # Keyframes themselves, the frames either side of them, and a few others
+    keyframes = index.keyframes.tolist()
+    targets = {1, 5, len(frames) - 1}
+    for keyframe in keyframes:
+        targets.update(target for target in (keyframe - 1, keyframe, keyframe + 1) if 0 <= target < len(frames))
+
+    cap = cv2.VideoCapture(video)
+    try:
+        for target in sorted(targets, reverse=True) + sorted(targets):
+            assert index.seek(cap, target) == target
+            ret, frame = cap.read()
+            assert ret
+            assert np.array_equal(frame, frames[target]), f"seek to {target} read another frame"
+    finally:
+        cap.release()
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="needs models/yolov8n.pt")
+def test_range_parallel_matches_sequential(video):
+    index = SeekIndex.build(video)
+    start_frame, end_frame = index.frame_at(3000), index.frame_at(9000)  # --start 3 --end 9
+
+    stream = VideoStream(video, stride=2, start_frame=start_frame, end_frame=end_frame, seek_index=index)
+    sequential = [record for _, record in analyze_streams([stream], load_model(MODEL_PATH))]
+    parallel = list(analyze_video_parallel(video, MODEL_PATH, workers=3, stride=2, start_frame=start_frame,
+                                           end_frame=end_frame, seek_index=index))
+
+    assert [record["frame"] for record in sequential] == list(range(start_frame, end_frame))
+    for key in ("frame", "time_ms", "count", "detected"):
+        assert [record[key] for record in parallel] == [record[key] for record in sequential], key